@@ -0,0 +1,134 @@
+"""Micro-benchmark for ``images.rewrite_images`` on ``md-samples``.
+
+Compares the single-pass engine with the previous four-pass implementation
+(kept below as a reference) and checks that both produce identical output::
+
+    python benchmarks/bench_images.py [--rounds 20] [--root md-samples/02.ekspluatatsiya]
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from md2pdf import images
+
+
+def legacy_rewrite_images(
+    md_path: Path, text: str, resolver: Callable[[Path, str], Path]
+) -> str:
+    markdown_pattern = re.compile(
+        r"!\[(?P<alt>[^\]]*)\]\((?P<path>[^)\s]+)(?:\s+\"(?P<title>[^\"]*)\")?\)",
+    )
+    html_pattern = re.compile(
+        r"(?P<prefix><img[^>]*?src=[\"'])(?P<src>[^\"']+)(?P<suffix>[\"'][^>]*?>)",
+        flags=re.IGNORECASE,
+    )
+    sign_block_pattern = re.compile(
+        r"::sign-image\s*\n---\s*\n(?P<meta>.+?)\n---\s*\n::",
+        flags=re.DOTALL,
+    )
+    sign_inline_pattern = re.compile(
+        r"::sign-image(?:\s+|\s*\n)src:\s*(?P<sign_src>\S+)(?:\s*\n:::+)?",
+    )
+    transformers = [
+        (sign_block_pattern, images._rewrite_sign_block),
+        (sign_inline_pattern, images._rewrite_sign_inline),
+        (markdown_pattern, images._rewrite_markdown_image),
+        (html_pattern, images._rewrite_html_image),
+    ]
+
+    updated = text
+    for pattern, rewriter in transformers:
+        updated = pattern.sub(
+            lambda m, rewriter=rewriter: rewriter(md_path, m, resolver), updated
+        )
+    return updated
+
+
+def load_corpus(md_root: Path) -> list[tuple[Path, str]]:
+    """Read markdown files, mapping them under ``content/`` for resolution."""
+
+    corpus = []
+    for md_file in sorted(md_root.rglob("*.md")):
+        virtual = Path("content") / md_file.relative_to(md_root.parent)
+        corpus.append((virtual, md_file.read_text(encoding="utf-8")))
+    return corpus
+
+
+def time_rounds(func: Callable[[], object], rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--root", type=Path, default=ROOT / "md-samples" / "02.ekspluatatsiya"
+    )
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.root)
+
+    def default_resolver(md_path: Path, image: str) -> Path:
+        return images.resolve_image_path(md_path, image, Path("public/images"))
+
+    static_target = Path("public/images/static.png")
+
+    def static_resolver(md_path: Path, image: str) -> Path:
+        return static_target
+
+    for md_path, text in corpus:
+        expected = legacy_rewrite_images(md_path, text, default_resolver)
+        actual = images.rewrite_images(md_path, text, resolver=default_resolver)
+        if expected != actual:
+            print(f"Output mismatch for {md_path}", file=sys.stderr)
+            return 1
+
+    total_bytes = sum(len(text.encode("utf-8")) for _, text in corpus)
+    print(f"files: {len(corpus)}, bytes: {total_bytes}")
+
+    # The static resolver isolates scanning/substitution cost; the default one
+    # shows the end-to-end per-file cost including path resolution.
+    image_resolver = images.ImageResolver(
+        Path("public/images"), [md_path for md_path, _ in corpus]
+    )
+
+    for label, resolver in (
+        ("engine only", static_resolver),
+        ("with resolver", default_resolver),
+        ("ImageResolver", image_resolver),
+    ):
+        legacy = time_rounds(
+            lambda resolver=resolver: [
+                legacy_rewrite_images(p, t, resolver) for p, t in corpus
+            ],
+            args.rounds,
+        )
+        engine = time_rounds(
+            lambda resolver=resolver: [
+                images.rewrite_images(p, t, resolver=resolver) for p, t in corpus
+            ],
+            args.rounds,
+        )
+        print(
+            f"{label:14} four-pass {legacy * 1000:7.2f} ms, "
+            f"single-pass {engine * 1000:7.2f} ms, speedup {legacy / engine:5.2f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,248 @@
+"""Pipeline benchmarks on a synthetic documentation tree.
+
+Times every pipeline stage against a tree produced by ``synthetic.py``;
+Pandoc is replaced with a stub on ``PATH`` so no TeX installation is
+needed. Results are written as JSON together with the git revision and the
+tree shape, and can be compared with a previous run to catch regressions::
+
+    python benchmarks/bench_pipeline.py --output after.json --compare before.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from synthetic import TreeSpec, add_arguments, generate_project, spec_from_args
+
+from md2pdf import bundle, images, pipeline, walker
+from md2pdf.reporting import StructureWarning
+
+FAKE_PANDOC = """#!/bin/sh
+out=""
+while [ $# -gt 0 ]; do
+  if [ "$1" = "--output" ]; then out="$2"; shift; fi
+  shift
+done
+printf '%%PDF-1.4\\n%%%%EOF\\n' > "$out"
+"""
+
+
+def install_fake_pandoc(bin_dir: Path) -> None:
+    """Put a ``pandoc`` stub that only writes ``--output`` first on ``PATH``."""
+
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    stub = bin_dir / "pandoc"
+    stub.write_text(FAKE_PANDOC, encoding="utf-8")
+    stub.chmod(0o755)
+    os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+
+
+def measure(
+    func: Callable[[], object],
+    rounds: int,
+    setup: Callable[[], object] | None = None,
+) -> dict[str, float]:
+    """Run ``func`` ``rounds`` times; ``setup`` runs untimed before each round."""
+
+    samples = []
+    for _ in range(rounds):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+    }
+
+
+def git_revision() -> str:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{revision}-dirty" if dirty else revision
+
+
+def run_benchmarks(workdir: Path, spec: TreeSpec, rounds: int) -> dict[str, Any]:
+    config_path = generate_project(workdir / "project", spec)
+    install_fake_pandoc(workdir / "bin")
+    os.environ["TEXMFVAR"] = str(workdir / "texmf-var")
+
+    params = pipeline.prepare_params(
+        pipeline.discover_documents(config_path.parents[1] / "content")[0],
+        config_path,
+    )
+    order, walk_warnings = walker.walk(params.md_root)
+    corpus = [(path, path.read_text(encoding="utf-8")) for path in order]
+    resolver = images.ImageResolver(params.images_root, order)
+
+    # Each file reported by three stages, as when walker, bundle and image
+    # validation warnings are merged for a large tree.
+    warnings = [
+        StructureWarning(code="MISSING_IMAGE", path=path, message="Нет картинки")
+        for path in order
+    ]
+    cache_dir = workdir / "cache"
+
+    def assemble(cache: Path | None) -> None:
+        pipeline.assemble_bundle(
+            order,
+            params.bundle_path,
+            metadata=params.metadata,
+            images_root=params.images_root,
+            cache_dir=cache,
+            lazy_content=True,
+        )
+
+    def clear_cache() -> None:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    results = {
+        "walk": measure(lambda: walker.walk(params.md_root), rounds),
+        "rewrite_images": measure(
+            lambda: [
+                images.rewrite_images(path, text, resolver=resolver)
+                for path, text in corpus
+            ],
+            rounds,
+        ),
+        "bundle_build": measure(
+            lambda: bundle.build(
+                order, images.ImageResolver(params.images_root, order), params.metadata
+            ),
+            rounds,
+        ),
+        "merge_warnings": measure(
+            lambda: pipeline.merge_warnings(
+                walk_warnings, warnings, warnings, warnings
+            ),
+            rounds,
+        ),
+        "assemble_bundle": measure(lambda: assemble(None), rounds),
+        "assemble_bundle_cold_cache": measure(
+            lambda: assemble(cache_dir), rounds, setup=clear_cache
+        ),
+        "assemble_bundle_warm_cache": measure(
+            lambda: assemble(cache_dir), rounds, setup=lambda: assemble(cache_dir)
+        ),
+        "run_document": measure(
+            lambda: pipeline.run_document(params, use_cache=False, force=True), rounds
+        ),
+        "run_document_up_to_date": measure(
+            lambda: pipeline.run_document(params),
+            rounds,
+            setup=lambda: pipeline.run_document(params),
+        ),
+    }
+
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "spec": asdict(spec),
+        "files": len(order),
+        "bundle_bytes": params.bundle_path.stat().st_size,
+        "rounds": rounds,
+        "benchmarks": results,
+    }
+
+
+def compare(
+    current: dict[str, Any], baseline: dict[str, Any], threshold: float
+) -> bool:
+    """Print min-time ratios against ``baseline``; return False on regressions."""
+
+    if current["spec"] != baseline.get("spec"):
+        print("warning: baseline was produced for a different tree spec")
+
+    ok = True
+    print(f"\nvs {baseline.get('revision', 'unknown')}:")
+    for name, stats in current["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if previous is None:
+            print(f"  {name:28} (new)")
+            continue
+        ratio = stats["min"] / previous["min"]
+        regressed = ratio > threshold
+        ok = ok and not regressed
+        marker = "  REGRESSION" if regressed else ""
+        print(f"  {name:28} {ratio:6.2f}x{marker}")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    parser.add_argument("--compare", type=Path, help="Previous results JSON")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.10,
+        help="Slowdown ratio reported as a regression (default: 1.10)",
+    )
+    parser.add_argument("--workdir", type=Path, help="Keep the generated tree here")
+    args = parser.parse_args()
+
+    spec = spec_from_args(args)
+    if args.workdir is not None:
+        report = run_benchmarks(args.workdir, spec, args.rounds)
+    else:
+        with tempfile.TemporaryDirectory(prefix="md2pdf-bench-") as tmp:
+            report = run_benchmarks(Path(tmp), spec, args.rounds)
+
+    print(
+        f"revision {report['revision']}, {report['files']} files, "
+        f"{report['bundle_bytes']} bundle bytes, {args.rounds} rounds"
+    )
+    for name, stats in report["benchmarks"].items():
+        print(
+            f"  {name:28} min {stats['min'] * 1000:9.2f} ms, "
+            f"median {stats['median'] * 1000:9.2f} ms"
+        )
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        if not compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
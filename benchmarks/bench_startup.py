@@ -0,0 +1,168 @@
+"""Startup-time benchmarks for the package and the CLI.
+
+Runs fresh interpreters under ``python -X importtime`` and reports the
+wall time of each command together with the cumulative import time of the
+heaviest modules. Results are written as JSON together with the git
+revision and can be compared with a previous run to catch regressions::
+
+    python benchmarks/bench_startup.py --output after.json --compare before.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from bench_pipeline import git_revision
+
+COMMANDS = {
+    "import_package": ["-c", "import md2pdf"],
+    "import_cli": ["-c", "import md2pdf.cli"],
+    "import_pipeline": ["-c", "import md2pdf.pipeline"],
+    "cli_help": ["-m", "md2pdf.cli", "--help"],
+}
+
+
+def run_once(args: list[str]) -> tuple[float, dict[str, int]]:
+    """Run ``python -X importtime`` once; return wall time and import times.
+
+    Import times are cumulative microseconds per top-level module entry as
+    printed by the interpreter.
+    """
+
+    env = {**os.environ, "PYTHONPATH": str(ROOT / "src")}
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - started
+    return elapsed, parse_importtime(completed.stderr)
+
+
+def parse_importtime(output: str) -> dict[str, int]:
+    """Collect cumulative microseconds per module from ``-X importtime`` output."""
+
+    imports: dict[str, int] = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        imports[name.strip()] = int(cumulative)
+    return imports
+
+
+def measure(args: list[str], rounds: int) -> dict[str, Any]:
+    """Run a command ``rounds`` times; keep imports from the fastest round."""
+
+    samples = []
+    fastest: dict[str, int] = {}
+    for _ in range(rounds):
+        elapsed, imports = run_once(args)
+        if not samples or elapsed < min(samples):
+            fastest = imports
+        samples.append(elapsed)
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "modules": len(fastest),
+        "md2pdf_modules": sorted(
+            name for name in fastest if name.split(".")[0] == "md2pdf"
+        ),
+        "imports_us": fastest,
+    }
+
+
+def run_benchmarks(rounds: int) -> dict[str, Any]:
+    results = {name: measure(args, rounds) for name, args in COMMANDS.items()}
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "rounds": rounds,
+        "benchmarks": results,
+    }
+
+
+def compare(
+    current: dict[str, Any], baseline: dict[str, Any], threshold: float
+) -> bool:
+    """Print min-time ratios against ``baseline``; return False on regressions."""
+
+    ok = True
+    print(f"\nvs {baseline.get('revision', 'unknown')}:")
+    for name, stats in current["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if previous is None:
+            print(f"  {name:18} (new)")
+            continue
+        ratio = stats["min"] / previous["min"]
+        regressed = ratio > threshold
+        ok = ok and not regressed
+        marker = "  REGRESSION" if regressed else ""
+        added = sorted(set(stats["md2pdf_modules"]) - set(previous["md2pdf_modules"]))
+        extra = f"  +{', '.join(added)}" if added else ""
+        print(f"  {name:18} {ratio:6.2f}x{marker}{extra}")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument(
+        "--top", type=int, default=8, help="Slowest imports shown per command"
+    )
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    parser.add_argument("--compare", type=Path, help="Previous results JSON")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.10,
+        help="Slowdown ratio reported as a regression (default: 1.10)",
+    )
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.rounds)
+
+    print(f"revision {report['revision']}, {args.rounds} rounds")
+    for name, stats in report["benchmarks"].items():
+        print(
+            f"  {name:18} min {stats['min'] * 1000:8.2f} ms, "
+            f"median {stats['median'] * 1000:8.2f} ms, "
+            f"{stats['modules']} modules ({len(stats['md2pdf_modules'])} md2pdf)"
+        )
+        slowest = sorted(
+            stats["imports_us"].items(), key=lambda item: item[1], reverse=True
+        )
+        for module, micros in slowest[: args.top]:
+            print(f"      {module:32} {micros / 1000:8.2f} ms")
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        if not compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,259 @@
+"""Synthetic documentation trees for pipeline benchmarks.
+
+Generates a project laid out like a real one (``config/project.yml``,
+``content/<NNN.slug>/...``, ``public/images``, style and template) so the
+whole pipeline can run against it::
+
+    python benchmarks/synthetic.py /tmp/tree --depth 3 --dirs 4 --files 6
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import shutil
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Smallest valid PNG: the bytes only matter for fingerprint hashing.
+_PNG_BYTES = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d00000000"
+    "49454e44ae426082"
+)
+
+_WORDS = (
+    "система",
+    "комплекс",
+    "сервер",
+    "узел",
+    "настройка",
+    "параметр",
+    "пользователь",
+    "доступ",
+    "конфигурация",
+    "журнал",
+    "ресурс",
+    "кластер",
+    "организация",
+    "проект",
+    "резервное",
+    "копирование",
+    "обновление",
+    "мониторинг",
+    "сеть",
+    "хранилище",
+    "политика",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class TreeSpec:
+    """Shape of a generated document tree.
+
+    ``depth`` levels of ``dirs_per_level`` subdirectories each hold an index
+    and ``files_per_dir`` numbered markdown files. Every file gets
+    ``paragraphs`` paragraphs, ``images_per_file`` image references (a
+    ``sign_density`` share of them as ``::sign-image`` blocks, the rest as
+    plain markdown images) and, when ``table_rows`` is positive, one
+    ``table_rows`` x ``table_cols`` pipe table.
+    """
+
+    documents: int = 1
+    depth: int = 3
+    dirs_per_level: int = 3
+    files_per_dir: int = 5
+    paragraphs: int = 8
+    images_per_file: int = 3
+    sign_density: float = 0.5
+    table_rows: int = 10
+    table_cols: int = 4
+    seed: int = 0
+
+    @property
+    def files_per_document(self) -> int:
+        directories = sum(self.dirs_per_level**level for level in range(self.depth))
+        return directories * (self.files_per_dir + 1)
+
+
+def generate_project(root: Path, spec: TreeSpec) -> Path:
+    """Create a synthetic project under ``root`` and return its config path.
+
+    ``root`` is wiped first so repeated runs start from the same state.
+    """
+
+    if root.exists():
+        shutil.rmtree(root)
+    rng = random.Random(spec.seed)
+
+    config_dir = root / "config"
+    config_dir.mkdir(parents=True)
+    (root / "styles").mkdir()
+    (root / "templates").mkdir()
+    shutil.copy(ROOT / "styles" / "style.yaml", root / "styles" / "style.yaml")
+    shutil.copy(ROOT / "templates" / "gost.tex", root / "templates" / "gost.tex")
+
+    config_path = config_dir / "project.yml"
+    config_path.write_text(
+        "content_root: content\n"
+        "images_root: public/images\n"
+        "style: style\n"
+        "template: templates/gost.tex\n"
+        "output: build/document.pdf\n"
+        "metadata:\n"
+        '  title: "Синтетический документ"\n',
+        encoding="utf-8",
+    )
+
+    images_root = root / "public" / "images"
+    images_root.mkdir(parents=True)
+    for number in range(1, spec.documents + 1):
+        slug = f"document-{number}"
+        _generate_directory(
+            root / "content" / f"{number:03d}.{slug}",
+            images_root / slug,
+            spec,
+            rng,
+            level=0,
+        )
+    return config_path
+
+
+def _generate_directory(
+    directory: Path,
+    image_dir: Path,
+    spec: TreeSpec,
+    rng: random.Random,
+    *,
+    level: int,
+) -> None:
+    directory.mkdir(parents=True)
+    image_dir.mkdir(parents=True, exist_ok=True)
+
+    _write_markdown(directory / "0.index.md", image_dir, spec, rng)
+    for number in range(1, spec.files_per_dir + 1):
+        name = f"{number:02d}0000.section-{number}"
+        _write_markdown(
+            directory / f"{name}.md", image_dir / f"section-{number}", spec, rng
+        )
+
+    if level + 1 >= spec.depth:
+        return
+    for number in range(1, spec.dirs_per_level + 1):
+        _generate_directory(
+            directory / f"{number:02d}.chapter-{number}",
+            image_dir / f"chapter-{number}",
+            spec,
+            rng,
+            level=level + 1,
+        )
+
+
+def _write_markdown(
+    path: Path, image_dir: Path, spec: TreeSpec, rng: random.Random
+) -> None:
+    image_dir.mkdir(parents=True, exist_ok=True)
+    blocks = [f"# {_sentence(rng, 3).rstrip('.')}"]
+
+    image_slots = set(
+        rng.sample(range(spec.paragraphs), min(spec.images_per_file, spec.paragraphs))
+    )
+    extra_images = max(0, spec.images_per_file - spec.paragraphs)
+    image_number = 0
+
+    for paragraph in range(spec.paragraphs):
+        blocks.append(" ".join(_sentence(rng, 12) for _ in range(4)))
+        if paragraph in image_slots:
+            image_number += 1
+            blocks.append(_image_block(image_dir, image_number, spec, rng))
+        if paragraph == spec.paragraphs // 2 and spec.table_rows > 0:
+            blocks.append(_table(spec, rng))
+
+    for _ in range(extra_images):
+        image_number += 1
+        blocks.append(_image_block(image_dir, image_number, spec, rng))
+
+    path.write_text("\n\n".join(blocks) + "\n", encoding="utf-8")
+
+
+def _image_block(
+    image_dir: Path, number: int, spec: TreeSpec, rng: random.Random
+) -> str:
+    name = f"image{number}.png"
+    (image_dir / name).write_bytes(_PNG_BYTES)
+    caption = f"Рисунок {number} — {_sentence(rng, 4).rstrip('.')}"
+    if rng.random() < spec.sign_density:
+        return f"::sign-image\n---\nsrc: /{name}\nsign: {caption}\n---\n::"
+    return f"![{caption}](/{name})"
+
+
+def _table(spec: TreeSpec, rng: random.Random) -> str:
+    header = (
+        "| " + " | ".join(f"Колонка {col + 1}" for col in range(spec.table_cols)) + " |"
+    )
+    separator = "|" + "---|" * spec.table_cols
+    rows = [
+        "| "
+        + " | ".join(_sentence(rng, 3).rstrip(".") for _ in range(spec.table_cols))
+        + " |"
+        for _ in range(spec.table_rows)
+    ]
+    return "\n".join([header, separator, *rows])
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(_WORDS) for _ in range(words))
+    return text[:1].upper() + text[1:] + "."
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Register ``TreeSpec`` fields as command line options."""
+
+    defaults = TreeSpec()
+    parser.add_argument("--documents", type=int, default=defaults.documents)
+    parser.add_argument("--depth", type=int, default=defaults.depth)
+    parser.add_argument("--dirs", type=int, default=defaults.dirs_per_level)
+    parser.add_argument("--files", type=int, default=defaults.files_per_dir)
+    parser.add_argument("--paragraphs", type=int, default=defaults.paragraphs)
+    parser.add_argument("--images", type=int, default=defaults.images_per_file)
+    parser.add_argument("--sign-density", type=float, default=defaults.sign_density)
+    parser.add_argument("--table-rows", type=int, default=defaults.table_rows)
+    parser.add_argument("--table-cols", type=int, default=defaults.table_cols)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def spec_from_args(args: argparse.Namespace) -> TreeSpec:
+    """Build a ``TreeSpec`` from options registered by :func:`add_arguments`."""
+
+    return TreeSpec(
+        documents=args.documents,
+        depth=args.depth,
+        dirs_per_level=args.dirs,
+        files_per_dir=args.files,
+        paragraphs=args.paragraphs,
+        images_per_file=args.images,
+        sign_density=args.sign_density,
+        table_rows=args.table_rows,
+        table_cols=args.table_cols,
+        seed=args.seed,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root", type=Path)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    spec = spec_from_args(args)
+    config_path = generate_project(args.root, spec)
+    print(f"config: {config_path}")
+    print(f"spec: {asdict(spec)}")
+    print(f"markdown files: {spec.files_per_document * spec.documents}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,46 +1,182 @@
-"""md2pdf package."""
-
-from .bundle import DEFAULT_BUNDLE_METADATA, build, write_bundle
-from .config import ProjectConfig, load_config
-from .images import resolve_image_path, rewrite_images, strip_numeric
-from .pandoc_runner import render
-from .pipeline import (
-    BundleArtifacts,
-    MarkdownCollection,
-    PipelineParams,
-    PipelineResult,
-    aggregate_result,
-    assemble_bundle,
-    collect_markdown,
-    merge_warnings,
-    prepare_params,
-    render_pdf,
-)
-from .reporting import StructureWarning, format_warnings, write_warnings
-from .walker import walk
+"""md2pdf package.
+
+The public API is loaded lazily: ``import md2pdf`` imports no submodules,
+and every name in ``__all__`` is imported from its module on first access.
+Short CLI runs (``--help``, hooks) therefore do not load the pipeline.
+"""
+
+from __future__ import annotations
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .artifacts import BlobStore, DirectoryStore, artifact_key
+    from .astcache import SectionAstCache, build_ast
+    from .bundle import (
+        DEFAULT_BUNDLE_METADATA,
+        build,
+        iter_sections,
+        write_bundle,
+        write_sections,
+    )
+    from .cache import SectionCache
+    from .config import ProjectConfig, load_config
+    from .imageprep import ImagePrepSettings
+    from .images import (
+        ImageResolver,
+        resolve_image_path,
+        rewrite_images,
+        strip_numeric,
+    )
+    from .metrics import Metrics, StageMetrics
+    from .pandoc_runner import RenderJob, render, render_async, render_many
+    from .pipeline import (
+        BatchReport,
+        BundleArtifacts,
+        MarkdownCollection,
+        PipelineParams,
+        PipelineResult,
+        aggregate_result,
+        assemble_bundle,
+        collect_markdown,
+        discover_documents,
+        merge_warnings,
+        params_from_config,
+        prepare_batch_params,
+        prepare_params,
+        render_pdf,
+        render_pdf_incremental,
+        run_batch,
+        run_document,
+        run_preview,
+        select_preview,
+        split_top_level_sections,
+    )
+    from .reporting import StructureWarning, format_warnings, write_warnings
+    from .server import RenderServer, submit_render
+    from .transforms import apply_transforms, load_transform
+    from .walker import DirectoryListing, WalkManifest, walk
+    from .watch import DocumentWatcher
+
+_MODULE_EXPORTS: dict[str, tuple[str, ...]] = {
+    "artifacts": ("BlobStore", "DirectoryStore", "artifact_key"),
+    "astcache": ("SectionAstCache", "build_ast"),
+    "bundle": (
+        "DEFAULT_BUNDLE_METADATA",
+        "build",
+        "iter_sections",
+        "write_bundle",
+        "write_sections",
+    ),
+    "cache": ("SectionCache",),
+    "config": ("ProjectConfig", "load_config"),
+    "imageprep": ("ImagePrepSettings",),
+    "images": (
+        "ImageResolver",
+        "resolve_image_path",
+        "rewrite_images",
+        "strip_numeric",
+    ),
+    "metrics": ("Metrics", "StageMetrics"),
+    "pandoc_runner": ("RenderJob", "render", "render_async", "render_many"),
+    "pipeline": (
+        "BatchReport",
+        "BundleArtifacts",
+        "MarkdownCollection",
+        "PipelineParams",
+        "PipelineResult",
+        "aggregate_result",
+        "assemble_bundle",
+        "collect_markdown",
+        "discover_documents",
+        "merge_warnings",
+        "params_from_config",
+        "prepare_batch_params",
+        "prepare_params",
+        "render_pdf",
+        "render_pdf_incremental",
+        "run_batch",
+        "run_document",
+        "run_preview",
+        "select_preview",
+        "split_top_level_sections",
+    ),
+    "reporting": ("StructureWarning", "format_warnings", "write_warnings"),
+    "server": ("RenderServer", "submit_render"),
+    "transforms": ("apply_transforms", "load_transform"),
+    "walker": ("DirectoryListing", "WalkManifest", "walk"),
+    "watch": ("DocumentWatcher",),
+}
+_EXPORTS = {name: module for module, names in _MODULE_EXPORTS.items() for name in names}
 
 __all__ = [
+    "artifact_key",
+    "BlobStore",
+    "DirectoryStore",
+    "SectionAstCache",
+    "build_ast",
     "aggregate_result",
+    "BatchReport",
     "BundleArtifacts",
     "DEFAULT_BUNDLE_METADATA",
     "PipelineResult",
     "ProjectConfig",
+    "SectionCache",
     "StructureWarning",
     "format_warnings",
+    "ImageResolver",
+    "ImagePrepSettings",
     "assemble_bundle",
     "MarkdownCollection",
+    "Metrics",
+    "StageMetrics",
     "collect_markdown",
+    "discover_documents",
     "prepare_params",
     "PipelineParams",
+    "params_from_config",
+    "prepare_batch_params",
     "merge_warnings",
     "build",
     "write_bundle",
+    "write_sections",
+    "iter_sections",
     "load_config",
     "render",
+    "render_async",
+    "render_many",
+    "RenderJob",
+    "RenderServer",
+    "submit_render",
     "render_pdf",
+    "render_pdf_incremental",
+    "run_batch",
+    "run_document",
+    "run_preview",
+    "select_preview",
+    "split_top_level_sections",
     "resolve_image_path",
     "rewrite_images",
     "strip_numeric",
     "walk",
+    "DirectoryListing",
+    "WalkManifest",
+    "DocumentWatcher",
+    "apply_transforms",
+    "load_transform",
     "write_warnings",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
@@ -0,0 +1,161 @@
+"""Общий кэш готовых PDF, адресуемый по содержимому входов рендера.
+
+Ключ (:func:`artifact_key`) зависит только от содержимого бандла, стиля,
+шаблона, фильтров и картинок, а также от версий Pandoc и xelatex, но не от
+путей на конкретной машине. Поэтому каталог хранилища можно разделить между
+агентами сборки (например, по сетевой ФС): PDF, отрендеренный одним
+агентом, забирают остальные.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Protocol
+
+from .images import iter_text_blocks, referenced_images, replace_image_targets
+from .texformat import tool_versions
+
+ARTIFACT_KEY_VERSION = 2
+
+
+class BlobStore(Protocol):
+    """Хранилище артефактов рендера по ключу."""
+
+    def get(self, key: str, destination: Path) -> bool:
+        """Скопировать артефакт ``key`` в ``destination``; False, если его нет."""
+
+    def put(self, key: str, source: Path) -> None:
+        """Сохранить файл ``source`` под ключом ``key``."""
+
+
+class DirectoryStore:
+    """:class:`BlobStore` в локальном (или смонтированном) каталоге.
+
+    Артефакты лежат в ``root/<key[:2]>/<key>`` и пишутся атомарно, так что
+    каталог безопасно делить между процессами и машинами. При заданном
+    ``max_bytes`` после записи удаляются давно не использованные артефакты:
+    чтение обновляет mtime, и вытесняются файлы с самым старым mtime.
+    ``hits``, ``misses`` и ``evictions`` считают обращения этого процесса.
+    """
+
+    def __init__(self, root: Path, max_bytes: int | None = None) -> None:
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("max_bytes must be a positive integer")
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str, destination: Path) -> bool:
+        blob = self._blob_path(key)
+        try:
+            os.utime(blob)
+            _copy_atomic(blob, destination)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def put(self, key: str, source: Path) -> None:
+        _copy_atomic(source, self._blob_path(key))
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes)
+
+    def evict(self, max_bytes: int) -> int:
+        """Удалять самые давние артефакты, пока общий размер больше ``max_bytes``.
+
+        Возвращает число удалённых артефактов.
+        """
+
+        blobs = []
+        total = 0
+        for blob in self.root.glob("??/*"):
+            if blob.name.endswith(".tmp"):
+                continue
+            try:
+                stat = blob.stat()
+            except FileNotFoundError:
+                continue
+            blobs.append((stat.st_mtime_ns, stat.st_size, blob))
+            total += stat.st_size
+
+        removed = 0
+        for _, size, blob in sorted(blobs):
+            if total <= max_bytes:
+                break
+            blob.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        self.evictions += removed
+        return removed
+
+    def _blob_path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+
+def artifact_key(
+    bundle: Path,
+    style: Path,
+    template: Path,
+    filters: Sequence[Path] = (),
+    *,
+    toc: bool = True,
+    transforms: str = "",
+) -> str:
+    """Посчитать ключ PDF по содержимому всех входов рендера.
+
+    Пути картинок в бандле заменяются хэшами их содержимого, поэтому ключ
+    не зависит от расположения рабочей копии. Отсутствующая картинка
+    учитывается по пути, как и в :func:`md2pdf.fingerprint.render_fingerprint`.
+    ``transforms`` — ключ Python-преобразований AST. Бандл читается и
+    хэшируется по частям, целиком в памяти не держится.
+    """
+
+    images: dict[str, str] = {}
+    bundle_digest = hashlib.sha256()
+    for block in iter_text_blocks(bundle):
+        for target in referenced_images(block):
+            if target not in images:
+                images[target] = _image_digest(Path(target))
+        bundle_digest.update(replace_image_targets(block, images).encode("utf-8"))
+
+    digest = hashlib.sha256(f"v{ARTIFACT_KEY_VERSION}:toc={int(toc)}".encode())
+    for version in tool_versions():
+        _update(digest, "tool", version.encode("utf-8"))
+    _update(digest, "bundle", bundle_digest.digest())
+    _update(digest, "style", style.read_bytes())
+    _update(digest, "template", template.read_bytes())
+    for lua_filter in filters:
+        _update(digest, "filter", lua_filter.read_bytes())
+    if transforms:
+        _update(digest, "transforms", transforms.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _image_digest(path: Path) -> str:
+    try:
+        with path.open("rb") as handle:
+            return "sha256:" + hashlib.file_digest(handle, "sha256").hexdigest()
+    except OSError:
+        return f"missing:{path}"
+
+
+def _update(digest: "hashlib._Hash", kind: str, data: bytes) -> None:
+    digest.update(f"\0{kind}\0{len(data)}\0".encode("utf-8"))
+    digest.update(data)
+
+
+def _copy_atomic(source: Path, destination: Path) -> None:
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = destination.with_name(f"{destination.name}.{os.getpid()}.tmp")
+    try:
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, destination)
+    finally:
+        tmp_path.unlink(missing_ok=True)
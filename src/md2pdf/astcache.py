@@ -0,0 +1,233 @@
+"""Кэш Pandoc JSON AST отдельных секций бандла.
+
+Без кэша Pandoc при каждой сборке заново разбирает markdown всего бандла.
+Здесь бандл режется на части по границам секций (фронтматтер и по секции
+на markdown-файл, см. ``BundleArtifacts.section_lines``), каждая часть
+один раз переводится в JSON AST (``pandoc --to json``) и кэшируется по
+хэшу своего текста. Готовые AST склеиваются в один документ, который
+затем отдаётся LaTeX-писателю Pandoc (см.
+:func:`md2pdf.pandoc_runner.build_command`). Разбор при пересборке стоит
+пропорционально изменённым секциям.
+
+Секции разбираются независимо, поэтому сноски и определения ссылок
+видны только внутри своего файла, а совпадающие идентификаторы
+заголовков разных секций получают суффиксы ``-1``, ``-2`` при склейке.
+
+Python-преобразования (:mod:`md2pdf.transforms`) применяются к AST
+секции сразу после разбора, в том же пуле, и в кэш попадает уже
+преобразованный AST.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import os
+import subprocess
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from itertools import pairwise
+from pathlib import Path
+from typing import Any
+
+from .pandoc_runner import PANDOC_MARKDOWN_FORMAT
+from .texformat import tool_versions
+from .transforms import Transform, apply_transforms, transforms_key
+
+AST_CACHE_VERSION = 1
+AST_DIRNAME = "ast"
+
+
+class SectionAstCache:
+    """JSON AST секций в ``root/<key[:2]>/<key>.json``.
+
+    Ключ зависит от текста секции, формата чтения markdown, версии Pandoc
+    и цепочки ``transforms``, которые :func:`build_ast` применяет к AST
+    перед сохранением. ``hits`` и ``misses`` считают обращения текущего
+    процесса.
+    """
+
+    def __init__(self, root: Path, transforms: Sequence[Transform] = ()) -> None:
+        self.root = root
+        self.transforms = tuple(transforms)
+        self.transforms_key = transforms_key(self.transforms)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        prefix = (
+            f"v{AST_CACHE_VERSION}\0{tool_versions()[0]}\0{PANDOC_MARKDOWN_FORMAT}\0"
+        )
+        if self.transforms_key:
+            prefix += f"transforms={self.transforms_key}\0"
+        digest = hashlib.sha256(prefix.encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        try:
+            document = json.loads(self._path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return document if isinstance(document, dict) else None
+
+    def put(self, key: str, document: Mapping[str, Any]) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(document, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+
+def build_ast(
+    bundle: Path,
+    destination: Path,
+    cache: SectionAstCache,
+    *,
+    section_lines: Sequence[int] = (),
+    env: Mapping[str, str] | None = None,
+    jobs: int | None = None,
+) -> Path:
+    """Записать в ``destination`` JSON AST бандла, собранный из AST секций.
+
+    ``section_lines`` — номера строк бандла (с нуля), с которых начинаются
+    его части; без них бандл разбирается целиком, но тоже через кэш.
+    Недостающие секции разбираются и преобразуются (``cache.transforms``)
+    параллельно, не больше ``jobs`` секций сразу (по умолчанию по числу CPU).
+
+    Raises:
+        RuntimeError: Если Pandoc не смог разобрать секцию.
+    """
+
+    chunks = split_sections(bundle.read_text(encoding="utf-8"), section_lines)
+    keys = [cache.key(chunk) for chunk in chunks]
+    documents: dict[str, dict[str, Any]] = {}
+    missing: dict[str, str] = {}
+    for key, chunk in zip(keys, chunks):
+        if key in documents or key in missing:
+            continue
+        cached = cache.get(key)
+        if cached is None:
+            missing[key] = chunk
+        else:
+            documents[key] = cached
+    cache.hits += len(documents)
+    cache.misses += len(missing)
+
+    if missing:
+        process_env = {**os.environ, **env} if env is not None else None
+        workers = min(len(missing), jobs or os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            parsed = executor.map(
+                lambda text: apply_transforms(
+                    parse_markdown(text, process_env), cache.transforms
+                ),
+                missing.values(),
+            )
+            for key, document in zip(missing, parsed):
+                cache.put(key, document)
+                documents[key] = document
+
+    # При склейке идентификаторы заголовков правятся на месте, поэтому
+    # повторяющаяся секция получает свою копию AST.
+    seen: set[str] = set()
+    ordered = []
+    for key in keys:
+        ordered.append(copy.deepcopy(documents[key]) if key in seen else documents[key])
+        seen.add(key)
+    merged = merge_documents(ordered)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = destination.with_name(destination.name + ".tmp")
+    tmp_path.write_text(json.dumps(merged, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, destination)
+    return destination
+
+
+def split_sections(text: str, section_lines: Sequence[int]) -> list[str]:
+    """Разрезать текст бандла на части, начинающиеся со строк ``section_lines``."""
+
+    if not section_lines:
+        return [text]
+    lines = text.split("\n")
+    bounds = [*section_lines, len(lines)]
+    return [
+        "\n".join(lines[start:end]).strip("\n") + "\n"
+        for start, end in pairwise(bounds)
+    ]
+
+
+def parse_markdown(text: str, env: Mapping[str, str] | None = None) -> dict[str, Any]:
+    """Разобрать markdown в Pandoc JSON AST.
+
+    Raises:
+        RuntimeError: Если Pandoc завершился с ошибкой.
+    """
+
+    command = ["pandoc", "--from", PANDOC_MARKDOWN_FORMAT, "--to", "json"]
+    completed = subprocess.run(
+        command,
+        input=text,
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        env=dict(env) if env is not None else None,
+        check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(
+            f"Pandoc failed with code {completed.returncode}: "
+            f"{completed.stderr.strip()}\nCommand: {' '.join(command)}"
+        )
+    document: dict[str, Any] = json.loads(completed.stdout)
+    return document
+
+
+def merge_documents(documents: Sequence[Mapping[str, Any]]) -> dict[str, Any]:
+    """Склеить документы Pandoc JSON в один.
+
+    Метаданные объединяются по порядку (как несколько YAML-блоков в одном
+    файле: значение из более позднего блока побеждает), блоки идут подряд.
+    Повторяющиеся идентификаторы заголовков получают суффиксы ``-N``.
+    """
+
+    if not documents:
+        raise ValueError("No documents to merge")
+
+    meta: dict[str, Any] = {}
+    blocks: list[Any] = []
+    for document in documents:
+        meta.update(document.get("meta", {}))
+        blocks.extend(document.get("blocks", ()))
+    _dedupe_identifiers(blocks, set())
+    return {
+        "pandoc-api-version": documents[0]["pandoc-api-version"],
+        "meta": meta,
+        "blocks": blocks,
+    }
+
+
+def _dedupe_identifiers(node: Any, used: set[str]) -> None:
+    if isinstance(node, list):
+        for item in node:
+            _dedupe_identifiers(item, used)
+        return
+    if not isinstance(node, dict):
+        return
+    if node.get("t") == "Header":
+        attributes = node["c"][1]
+        identifier = attributes[0]
+        if identifier:
+            unique = identifier
+            suffix = 0
+            while unique in used:
+                suffix += 1
+                unique = f"{identifier}-{suffix}"
+            attributes[0] = unique
+            used.add(unique)
+    content = node.get("c")
+    if isinstance(content, (list, dict)):
+        _dedupe_identifiers(content, used)
@@ -1,11 +1,24 @@
 from __future__ import annotations
 
-from collections.abc import Callable, Mapping, Sequence
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
 import re
+from functools import partial
 from pathlib import Path
 from typing import Any
 
-from .images import rewrite_images
+from .cache import SectionCache
+from .images import referenced_images, rewrite_images
+from .metrics import Metrics
+from .tables import convert_collapsible_tables
+
+# Заголовки из одних строк ``ключ: значение`` разбираются построчно; YAML
+# (C-загрузчик, если он собран) нужен только для вложенных значений,
+# списков, блочных скаляров, якорей и комментариев и импортируется лишь
+# тогда.
+# Значения, открывающие блочный скаляр или flow-коллекцию YAML.
+_STRUCTURED_VALUE_START = frozenset("|>[{")
 
 DEFAULT_BUNDLE_METADATA: Mapping[str, str] = {
     "title": "Документ",
@@ -18,6 +31,12 @@ def build(
     order: Sequence[Path],
     image_resolver: Callable[[Path, str], Path],
     metadata: Mapping[str, Any] | None = None,
+    *,
+    section_cache: SectionCache | None = None,
+    metrics: Metrics | None = None,
+    base_root: Path | None = None,
+    jobs: int = 1,
+    image_targets: dict[Path, list[str]] | None = None,
 ) -> str:
     """Собрать итоговый markdown-бандл.
 
@@ -25,33 +44,99 @@ def build(
         order: Упорядоченный список markdown-файлов.
         image_resolver: Колбэк резолва пути картинки относительно markdown.
         metadata: Дополнительные значения для фронтматтера бандла.
+        section_cache: Кэш уже отрендеренных секций; неизменённые файлы
+            берутся из него без повторной обработки.
+        metrics: Сборщик метрик; время переписывания картинок копится
+            в стадии ``image_rewriting``.
+        base_root: Корень документа, от которого считаются уровни
+            заголовков. По умолчанию каталог первого файла ``order``;
+            задаётся явно, когда собирается лишь часть документа.
+        jobs: Число потоков для чтения и обработки файлов. Результат
+            не зависит от ``jobs`` и совпадает с последовательной сборкой.
+        image_targets: Словарь, в который для каждого файла записываются
+            пути картинок его секции (уже после резолва, в том числе для
+            секций из кэша), чтобы проверить их одним проходом.
 
     Returns:
         Текст бандла с фронтматтером и проставленными заголовками.
     """
 
+    parts = iter_sections(
+        order,
+        image_resolver,
+        metadata,
+        section_cache=section_cache,
+        metrics=metrics,
+        base_root=base_root,
+        jobs=jobs,
+        image_targets=image_targets,
+    )
+    return "\n\n".join(parts) + "\n"
+
+
+def iter_sections(
+    order: Sequence[Path],
+    image_resolver: Callable[[Path, str], Path],
+    metadata: Mapping[str, Any] | None = None,
+    *,
+    section_cache: SectionCache | None = None,
+    metrics: Metrics | None = None,
+    base_root: Path | None = None,
+    jobs: int = 1,
+    image_targets: dict[Path, list[str]] | None = None,
+) -> Iterator[str]:
+    """Лениво выдавать части бандла: фронтматтер, затем секции по порядку.
+
+    Каждый файл читается и обрабатывается только при запросе следующей
+    части, поэтому потребитель может писать бандл на диск по мере сборки.
+    Пустые части пропускаются. Аргументы совпадают с :func:`build`.
+
+    При ``jobs > 1`` файлы читаются и рендерятся в пуле потоков, что
+    перекрывает задержки ввода-вывода; вперёд обрабатывается не больше
+    ``4 * jobs`` файлов, а секции выдаются строго в порядке ``order``.
+    """
+
+    if jobs < 1:
+        raise ValueError("jobs must be a positive integer")
+
     merged_metadata: dict[str, Any] = {**DEFAULT_BUNDLE_METADATA}
     if metadata:
         merged_metadata.update(metadata)
 
-    bundle_parts: list[str] = [_render_front_matter(merged_metadata)]
+    yield _render_front_matter(merged_metadata)
 
     if not order:
-        return "\n".join(bundle_parts) + "\n"
-
-    base_root = order[0].parent
-
-    for md_path in order:
-        raw = md_path.read_text(encoding="utf-8")
-        metadata, body = _split_front_matter(raw)
-        rewritten_body = rewrite_images(md_path, body, resolver=image_resolver)
-        heading_level = _heading_level(base_root, md_path)
-        heading_title, body_without_heading = _extract_heading(rewritten_body)
-        title = metadata.get("title") or heading_title or _derive_title(md_path)
-        section = _render_section(title, body_without_heading, heading_level)
-        bundle_parts.append(section)
-
-    return "\n\n".join(part for part in bundle_parts if part.strip()) + "\n"
+        return
+
+    root = base_root if base_root is not None else order[0].parent
+
+    def render(md_path: Path) -> str:
+        section = render_section(md_path)
+        if image_targets is not None:
+            image_targets[md_path] = referenced_images(section)
+        return section
+
+    def render_section(md_path: Path) -> str:
+        heading_level = _heading_level(root, md_path)
+        if section_cache is None:
+            raw = md_path.read_text(encoding="utf-8")
+            return _render_file(md_path, raw, image_resolver, heading_level, metrics)
+        return section_cache.get_or_render(
+            md_path,
+            heading_level,
+            partial(
+                _render_file,
+                md_path,
+                image_resolver=image_resolver,
+                heading_level=heading_level,
+                metrics=metrics,
+            ),
+        )
+
+    sections = map(render, order) if jobs == 1 else _map_ordered(render, order, jobs)
+    for section in sections:
+        if section.strip():
+            yield section
 
 
 def write_bundle(text: str, path: Path | str) -> Path:
@@ -63,6 +148,57 @@ def write_bundle(text: str, path: Path | str) -> Path:
     return bundle_path
 
 
+def write_sections(sections: Iterable[str], path: Path | str) -> Path:
+    """Потоково записать части бандла в файл по мере их появления.
+
+    Результат побайтно совпадает с записью текста из :func:`build`, но в
+    памяти одновременно держится только одна секция.
+    """
+
+    bundle_path = Path(path)
+    bundle_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(bundle_path, "w", encoding="utf-8") as handle:
+        for index, section in enumerate(sections):
+            if index:
+                handle.write("\n\n")
+            handle.write(section)
+        handle.write("\n")
+    return bundle_path
+
+
+def _map_ordered(
+    func: Callable[[Path], str], items: Sequence[Path], jobs: int
+) -> Iterator[str]:
+    window: deque[Future[str]] = deque()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for item in items:
+            window.append(executor.submit(func, item))
+            if len(window) >= 4 * jobs:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+
+def _render_file(
+    md_path: Path,
+    raw: str,
+    image_resolver: Callable[[Path, str], Path],
+    heading_level: int,
+    metrics: Metrics | None = None,
+) -> str:
+    metadata, body = _split_front_matter(raw)
+    if metrics is None:
+        rewritten_body = rewrite_images(md_path, body, resolver=image_resolver)
+    else:
+        with metrics.accumulate("image_rewriting"):
+            rewritten_body = rewrite_images(md_path, body, resolver=image_resolver)
+    heading_title, body_without_heading = _extract_heading(
+        convert_collapsible_tables(rewritten_body)
+    )
+    title = metadata.get("title") or heading_title or _derive_title(md_path)
+    return _render_section(title, body_without_heading, heading_level)
+
+
 def _render_front_matter(metadata: Mapping[str, Any]) -> str:
     lines = ["---"]
     for key, value in metadata.items():
@@ -75,26 +211,62 @@ def _split_front_matter(text: str) -> tuple[Mapping[str, str], str]:
     if not text.startswith("---"):
         return {}, text
 
-    lines = text.splitlines()
-    if not lines or lines[0].strip() != "---":
+    header_start = text.find("\n") + 1
+    if not header_start or text[3:header_start].strip():
         return {}, text
 
-    end_index: int | None = None
-    for idx, line in enumerate(lines[1:], start=1):
-        if line.strip() == "---":
-            end_index = idx
+    # Закрывающий ``---`` ищется по смещениям в исходной строке, чтобы не
+    # разбивать на строки и не склеивать заново весь файл.
+    position = header_start
+    while True:
+        found = text.find("---", position)
+        if found < 0:
+            return {}, text
+        line_start = text.rfind("\n", 0, found) + 1
+        line_end = text.find("\n", found)
+        if line_end < 0:
+            line_end = len(text)
+        if text[line_start:line_end].strip() == "---":
             break
+        position = line_end + 1
 
-    if end_index is None:
-        return {}, text
-
-    meta_lines = lines[1:end_index]
-    body_lines = lines[end_index + 1 :]
-    metadata = _parse_simple_yaml(meta_lines)
-    body = "\n".join(body_lines).lstrip("\n")
+    metadata = _parse_front_matter(text[header_start:line_start])
+    body = text[line_end + 1 :].lstrip("\n")
     return metadata, body
 
 
+def _parse_front_matter(header: str) -> Mapping[str, str]:
+    lines = header.splitlines()
+    if all(_is_flat_field(line) for line in lines):
+        return _parse_simple_yaml(lines)
+
+    import yaml  # type: ignore[import-untyped]
+
+    try:
+        data = yaml.load(header, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+    except yaml.YAMLError:
+        return _parse_simple_yaml(lines)
+    if not isinstance(data, Mapping):
+        return _parse_simple_yaml(lines)
+    return {
+        str(key): str(value).strip()
+        for key, value in data.items()
+        if value is not None and not isinstance(value, (Mapping, list))
+    }
+
+
+def _is_flat_field(line: str) -> bool:
+    # Плоские строки ``ключ: значение`` разбираются построчно, как раньше:
+    # ``#`` в значении остаётся текстом, а не комментарием YAML. В YAML
+    # уходят только вложенность, списки и блочные скаляры.
+    if not line.strip():
+        return True
+    if line[0] in " \t" or line.startswith("- ") or line.rstrip() == "-":
+        return False
+    value = line.partition(":")[2].strip()
+    return not (value and value[0] in _STRUCTURED_VALUE_START)
+
+
 def _parse_simple_yaml(lines: Sequence[str]) -> Mapping[str, str]:
     metadata: dict[str, str] = {}
     for line in lines:
@@ -0,0 +1,161 @@
+"""Persistent on-disk cache of rendered bundle sections."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections.abc import Callable, Mapping
+from pathlib import Path
+from typing import Any
+
+SECTION_CACHE_VERSION = 4
+
+
+class SectionCache:
+    """Кэш отрендеренных секций бандла между запусками CLI.
+
+    Запись привязана к пути markdown-файла и уровню заголовка. Если
+    ``mtime``/размер файла не изменились, секция отдаётся без чтения файла;
+    иначе файл читается и сверяется по sha256 содержимого. Настройки
+    резолва картинок (``settings``) входят в ключ всего кэша: при их
+    смене кэш считается пустым.
+
+    В JSON-индексе ``path`` лежат только метаданные записей, а тексты
+    секций хранятся отдельными файлами в каталоге рядом с ним
+    (``<path без .json>/<sha256 текста>.md``) и читаются по одному при
+    попадании: в памяти не держится весь бандл.
+
+    ``get_or_render`` можно вызывать из нескольких потоков: учёт записей
+    защищён блокировкой, а рендер секций выполняется вне её.
+    """
+
+    def __init__(self, path: Path, settings: Mapping[str, str]) -> None:
+        self.path = path
+        self.bodies_dir = path.with_suffix("")
+        self.settings = {"version": str(SECTION_CACHE_VERSION), **settings}
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._used: set[str] = set()
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def get_or_render(
+        self, md_path: Path, level: int, render: Callable[[str], str]
+    ) -> str:
+        """Вернуть секцию из кэша или отрендерить её через ``render(raw)``."""
+
+        key = str(md_path)
+        stat = md_path.stat()
+        with self._lock:
+            self._used.add(key)
+            entry = self._entries.get(key)
+
+        if (
+            entry is not None
+            and entry["level"] == level
+            and entry["mtime_ns"] == stat.st_mtime_ns
+            and entry["size"] == stat.st_size
+        ):
+            text = self._read_body(entry["body"])
+            if text is not None:
+                with self._lock:
+                    self.hits += 1
+                return text
+
+        raw = md_path.read_text(encoding="utf-8")
+        digest = _digest(raw)
+
+        text = None
+        if entry is not None and entry["level"] == level and entry["digest"] == digest:
+            text = self._read_body(entry["body"])
+        hit = text is not None
+        if entry is not None and text is not None:
+            body = str(entry["body"])
+        else:
+            text = render(raw)
+            body = _digest(text)
+            self._write_body(body, text)
+
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._entries[key] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "digest": digest,
+                "level": level,
+                "body": body,
+            }
+            self._dirty = True
+        return text
+
+    def save(self) -> None:
+        """Атомарно записать кэш на диск, если он менялся.
+
+        Записи файлов, не запрошенных в текущем запуске, отбрасываются
+        вместе с текстами, на которые больше никто не ссылается.
+        """
+
+        stale = self._entries.keys() - self._used
+        if not self._dirty and not stale:
+            return
+        for key in stale:
+            del self._entries[key]
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"settings": self.settings, "entries": self._entries}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+        used = {f"{entry['body']}.md" for entry in self._entries.values()}
+        for body_path in self.bodies_dir.glob("*.md"):
+            if body_path.name not in used:
+                body_path.unlink(missing_ok=True)
+
+    def _load(self) -> None:
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+
+        if not isinstance(payload, dict) or payload.get("settings") != self.settings:
+            return
+        entries = payload.get("entries")
+        if isinstance(entries, dict):
+            self._entries = entries
+
+    def _read_body(self, body: str) -> str | None:
+        try:
+            # Байты, а не read_text: перевод строк не должен менять секцию.
+            return (self.bodies_dir / f"{body}.md").read_bytes().decode("utf-8")
+        except OSError:
+            return None
+
+    def _write_body(self, body: str, text: str) -> None:
+        path = self.bodies_dir / f"{body}.md"
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(
+            f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        tmp_path.write_bytes(text.encode("utf-8"))
+        os.replace(tmp_path, path)
+
+
+def section_cache_path(cache_dir: Path, bundle_path: Path) -> Path:
+    """Путь файла кэша секций для конкретного бандла."""
+
+    return cache_dir / f"{bundle_path.stem}.sections.json"
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -3,20 +3,36 @@
 from __future__ import annotations
 
 import argparse
+import os
 import sys
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import replace
 from pathlib import Path
-from typing import IO, Mapping, Sequence
+from typing import IO, TYPE_CHECKING, Mapping, Sequence
 
-from . import pipeline
+from .metrics import Metrics
 from .reporting import write_warnings
 
+if TYPE_CHECKING:
+    from . import pipeline
+    from .artifacts import DirectoryStore
+
+# Модули конвейера, сервера и watch импортируются внутри команд, которым
+# они нужны: ``--help`` и отказ на проверке аргументов их не грузят.
+
 
 class ProgressReporter:
-    """Управляет выводом прогресса и дублирует его в лог."""
+    """Управляет выводом прогресса и дублирует его в лог.
+
+    Кроме текстовых сообщений собирает метрики стадий (время, CPU, пиковый
+    RSS) и счётчики в ``metrics``.
+    """
 
     def __init__(self, verbose: bool, log_file: Path | None) -> None:
         self.verbose = verbose
         self.log_file = log_file
+        self.metrics = Metrics()
         self._log_handle: IO[str] | None = None
 
     def __enter__(self) -> "ProgressReporter":
@@ -37,6 +53,14 @@ class ProgressReporter:
             self._log_handle.write(line + "\n")
             self._log_handle.flush()
 
+    @contextmanager
+    def measure(self, name: str, message: str) -> Iterator[None]:
+        """Вывести сообщение стадии и замерить её выполнение."""
+
+        self.stage(message)
+        with self.metrics.stage(name):
+            yield
+
 
 def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
@@ -75,13 +99,146 @@ def _build_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--log-file",
         type=Path,
-        help="Write verbose output and Pandoc logs into a file.",
+        help=(
+            "Write verbose output and Pandoc logs into a file; with --all each "
+            "document's Pandoc log goes to <log stem>.<pdf stem>.log."
+        ),
     )
     parser.add_argument(
         "--quiet",
         action="store_true",
         help="Suppress progress output (Pandoc still emits errors).",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Rebuild every bundle section instead of reusing the on-disk cache.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Run Pandoc even if the PDF is up to date with its inputs.",
+    )
+    parser.add_argument(
+        "--all",
+        dest="batch",
+        action="store_true",
+        help="Render every document root found under content_root from the config.",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=os.cpu_count() or 1,
+        help=(
+            "Number of documents rendered in parallel with --all, or threads "
+            "reading sections of a single document (default: CPU count)."
+        ),
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        help="Directory for PDFs in --all mode (default: directory of config output).",
+    )
+    parser.add_argument(
+        "--prepare-images",
+        action="store_true",
+        help=(
+            "Downscale and recompress images before rendering (requires Pillow); "
+            "uses image_prep from the config or defaults."
+        ),
+    )
+    parser.add_argument(
+        "--fail-on-missing-images",
+        action="store_true",
+        help="Stop before rendering if the bundle references images that do not exist.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Rebuild the PDF whenever markdown, images, style, template or filters change.",
+    )
+    parser.add_argument(
+        "--preview",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help=(
+            "Render only files matching PATTERN (path or glob relative to the "
+            "markdown directory) into <output>.preview.pdf without TOC; repeatable."
+        ),
+    )
+    parser.add_argument(
+        "--split",
+        action="store_true",
+        help="Render each top-level section into <output>.parts/ in parallel (--jobs).",
+    )
+    parser.add_argument(
+        "--keep-tex",
+        action="store_true",
+        help=(
+            "Emit LaTeX into .md2pdf-cache/latex/<name>/ and run xelatex there, "
+            "reusing .aux/.toc between builds to save passes."
+        ),
+    )
+    parser.add_argument(
+        "--ast-cache",
+        action="store_true",
+        help=(
+            "Parse each section into Pandoc JSON once, cache it in "
+            ".md2pdf-cache/ast/ and render the merged AST."
+        ),
+    )
+    parser.add_argument(
+        "--artifact-cache",
+        type=Path,
+        metavar="DIR",
+        help=(
+            "Fetch ready PDFs from and store rendered PDFs in a content-addressed "
+            "directory that build agents can share."
+        ),
+    )
+    parser.add_argument(
+        "--artifact-cache-max-mb",
+        type=int,
+        metavar="MB",
+        help="Evict least recently used PDFs when --artifact-cache exceeds MB.",
+    )
+    parser.add_argument(
+        "--server",
+        metavar="URL",
+        help="Submit renders to a running render server, e.g. http://127.0.0.1:8765.",
+    )
+    parser.add_argument(
+        "--serve",
+        nargs="?",
+        const="",
+        metavar="HOST:PORT",
+        help=(
+            "Run a render server with warm TeX state; --jobs limits concurrent "
+            "renders (default: md2pdf.server.DEFAULT_ADDRESS on loopback)."
+        ),
+    )
+    parser.add_argument(
+        "--serve-root",
+        action="append",
+        type=Path,
+        metavar="DIR",
+        help=(
+            "Directory the render server may read and write; repeatable "
+            "(default: current directory)."
+        ),
+    )
+    parser.add_argument(
+        "--serve-allow-remote",
+        action="store_true",
+        help="Allow --serve to listen on a non-loopback address.",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=Path,
+        help="Append per-stage timings and counters as JSON lines to this file.",
+    )
     parser.add_argument(
         "output",
         nargs="?",
@@ -109,6 +266,34 @@ def main(argv: Sequence[str] | None = None) -> int:
     parser = _build_parser()
     args = parser.parse_args(argv)
 
+    if args.batch and (args.watch or args.preview or args.split):
+        print(
+            "--watch, --preview and --split work with a single document, not --all",
+            file=sys.stderr,
+        )
+        return 1
+    if args.watch and (args.preview or args.split):
+        print("--watch cannot be combined with --preview or --split", file=sys.stderr)
+        return 1
+    if args.serve is not None:
+        return _run_server(args)
+    if (args.server or args.keep_tex or args.artifact_cache or args.ast_cache) and (
+        args.preview or args.split
+    ):
+        print(
+            "--server, --keep-tex, --artifact-cache and --ast-cache cannot be "
+            "combined with --preview or --split",
+            file=sys.stderr,
+        )
+        return 1
+    if args.server and args.keep_tex:
+        print("--keep-tex cannot be combined with --server", file=sys.stderr)
+        return 1
+    if args.batch:
+        return _run_batch(args)
+
+    from . import pipeline
+
     try:
         md_dir = args.md_dir or args.md_dir_flag
         if md_dir is None:
@@ -125,38 +310,81 @@ def main(argv: Sequence[str] | None = None) -> int:
             output_override=args.output,
             metadata_overrides=metadata_overrides,
         )
+        params = _with_image_prep(params, args.prepare_images)
+        artifacts = _artifact_store(args)
 
         verbose = not args.quiet
+        if args.watch:
+            return _run_watch(args, params, verbose)
+        if args.preview or args.split:
+            return _run_preview(args, params, verbose)
+
         with ProgressReporter(verbose=verbose, log_file=args.log_file) as progress:
-            progress.stage(f"Collecting markdown from {params.md_root}")
-            collection = pipeline.collect_markdown(params.md_root)
-
-            progress.stage(f"Building bundle -> {params.bundle_path}")
-            bundle = pipeline.assemble_bundle(
-                collection.order,
-                params.bundle_path,
-                metadata=params.metadata,
-                images_root=params.images_root,
-            )
+            with progress.measure("walk", f"Collecting markdown from {params.md_root}"):
+                collection = pipeline.collect_markdown(
+                    params.md_root,
+                    cache_dir=None if args.no_cache else params.cache_dir,
+                )
 
-            progress.stage(
-                f"Rendering PDF to {params.output_pdf} (style: {params.style.name})"
-            )
-            output_pdf = pipeline.render_pdf(
-                bundle.path,
-                style=params.style,
-                template=params.template,
-                output=params.output_pdf,
-                filters=params.filters,
-                verbose=verbose,
-                log_file=args.log_file,
-            )
+            with progress.measure("bundle", f"Building bundle -> {params.bundle_path}"):
+                bundle = pipeline.assemble_bundle(
+                    collection.order,
+                    params.bundle_path,
+                    metadata=params.metadata,
+                    images_root=params.images_root,
+                    cache_dir=None if args.no_cache else params.cache_dir,
+                    lazy_content=True,
+                    metrics=progress.metrics,
+                    image_prep=params.image_prep,
+                    jobs=args.jobs,
+                    fail_on_missing_images=args.fail_on_missing_images,
+                )
+
+            with progress.measure(
+                "render",
+                f"Rendering PDF to {params.output_pdf} (style: {params.style.name})",
+            ):
+                output_pdf, rendered = pipeline.render_pdf_incremental(
+                    bundle.path,
+                    style=params.style,
+                    template=params.template,
+                    output=params.output_pdf,
+                    filters=params.filters,
+                    verbose=verbose,
+                    log_file=args.log_file,
+                    force=args.force,
+                    server=args.server,
+                    build_dir=(
+                        pipeline.latex_build_dir(params) if args.keep_tex else None
+                    ),
+                    artifacts=artifacts,
+                    metrics=progress.metrics,
+                    ast_cache=pipeline.section_ast_cache(
+                        params, enabled=args.ast_cache
+                    ),
+                    section_lines=bundle.section_lines,
+                )
+            if progress.metrics.counters.get("artifact_cache_hits"):
+                progress.stage(f"Fetched PDF from artifact cache: {output_pdf}")
+            elif not rendered:
+                progress.stage(f"PDF is up to date: {output_pdf}")
             progress.stage("Done")
 
+            if args.metrics_file:
+                progress.metrics.write_jsonl(
+                    args.metrics_file,
+                    {
+                        "document": str(params.md_root),
+                        "output": str(output_pdf),
+                        "rendered": rendered,
+                    },
+                )
+
             result = pipeline.aggregate_result(
                 bundle.path,
                 output_pdf,
                 collection.warnings,
+                bundle.warnings,
             )
     except ValueError as exc:  # noqa: PERF203
         print(exc, file=sys.stderr)
@@ -166,5 +394,168 @@ def main(argv: Sequence[str] | None = None) -> int:
     return 0
 
 
+def _artifact_store(args: argparse.Namespace) -> DirectoryStore | None:
+    if args.artifact_cache is None:
+        if args.artifact_cache_max_mb is not None:
+            raise ValueError("--artifact-cache-max-mb requires --artifact-cache")
+        return None
+    from .artifacts import DirectoryStore
+
+    max_bytes = None
+    if args.artifact_cache_max_mb is not None:
+        if args.artifact_cache_max_mb <= 0:
+            raise ValueError("--artifact-cache-max-mb must be a positive integer")
+        max_bytes = args.artifact_cache_max_mb * 1024 * 1024
+    return DirectoryStore(args.artifact_cache, max_bytes=max_bytes)
+
+
+def _run_server(args: argparse.Namespace) -> int:
+    from . import server
+
+    with ProgressReporter(verbose=not args.quiet, log_file=args.log_file) as progress:
+        try:
+            server.serve(
+                args.serve or server.DEFAULT_ADDRESS,
+                concurrency=args.jobs,
+                roots=args.serve_root or (),
+                allow_remote=args.serve_allow_remote,
+                report=progress.stage,
+            )
+        except ValueError as exc:
+            print(exc, file=sys.stderr)
+            return 1
+        except KeyboardInterrupt:
+            progress.stage("Render server stopped")
+    return 0
+
+
+def _with_image_prep(
+    params: pipeline.PipelineParams, enabled: bool
+) -> pipeline.PipelineParams:
+    if not enabled or params.image_prep is not None:
+        return params
+    from .imageprep import ImagePrepSettings
+
+    return replace(params, image_prep=ImagePrepSettings())
+
+
+def _run_watch(
+    args: argparse.Namespace, params: pipeline.PipelineParams, verbose: bool
+) -> int:
+    from . import watch
+
+    with ProgressReporter(verbose=verbose, log_file=args.log_file) as progress:
+        watcher = watch.DocumentWatcher(
+            params,
+            use_cache=not args.no_cache,
+            verbose=verbose,
+            log_file=args.log_file,
+            metrics_file=args.metrics_file,
+            report=progress.stage,
+            server=args.server,
+            keep_tex=args.keep_tex,
+            artifacts=_artifact_store(args),
+            fail_on_missing_images=args.fail_on_missing_images,
+            ast_cache=args.ast_cache,
+        )
+        progress.stage(f"Watching {params.md_root} (Ctrl+C to stop)")
+        try:
+            watcher.run(
+                force=args.force,
+                on_result=lambda result: write_warnings(result.warnings),
+                on_error=lambda error: print(error, file=sys.stderr),
+            )
+        except KeyboardInterrupt:
+            progress.stage("Stopped watching")
+    return 0
+
+
+def _run_preview(
+    args: argparse.Namespace, params: pipeline.PipelineParams, verbose: bool
+) -> int:
+    from . import pipeline
+
+    with ProgressReporter(verbose=verbose, log_file=args.log_file) as progress:
+        selection = ", ".join(args.preview) or str(params.md_root)
+        progress.stage(f"Rendering preview of {selection}")
+        report = pipeline.run_preview(
+            params,
+            args.preview,
+            split=args.split,
+            jobs=args.jobs,
+            use_cache=not args.no_cache,
+            force=args.force,
+            log_file=args.log_file,
+            fail_on_missing_images=args.fail_on_missing_images,
+            metrics=progress.metrics,
+        )
+        for result in report.results:
+            progress.stage(f"Done: {result.output_pdf}")
+
+        if args.metrics_file:
+            progress.metrics.write_jsonl(
+                args.metrics_file,
+                {
+                    "document": str(params.md_root),
+                    "outputs": [str(result.output_pdf) for result in report.results],
+                },
+            )
+
+    write_warnings(report.warnings)
+    for output, message in report.failures:
+        print(f"Failed to render {output}: {message}", file=sys.stderr)
+    return 1 if report.failures else 0
+
+
+def _run_batch(args: argparse.Namespace) -> int:
+    from . import pipeline
+
+    try:
+        if args.md_dir or args.md_dir_flag or args.output:
+            raise ValueError(
+                "--all renders every document root; use --output-dir instead of paths"
+            )
+
+        if args.log_file:
+            args.log_file.unlink(missing_ok=True)
+
+        metadata_overrides = _parse_metadata(args.metadata)
+        batch = pipeline.prepare_batch_params(
+            args.config,
+            style_override=args.style,
+            output_dir=args.output_dir,
+            metadata_overrides=metadata_overrides,
+        )
+        batch = [_with_image_prep(params, args.prepare_images) for params in batch]
+
+        with ProgressReporter(
+            verbose=not args.quiet, log_file=args.log_file
+        ) as progress:
+            progress.stage(f"Rendering {len(batch)} documents with {args.jobs} jobs")
+            report = pipeline.run_batch(
+                batch,
+                jobs=args.jobs,
+                use_cache=not args.no_cache,
+                force=args.force,
+                log_file=args.log_file,
+                metrics_file=args.metrics_file,
+                server=args.server,
+                keep_tex=args.keep_tex,
+                artifacts=_artifact_store(args),
+                fail_on_missing_images=args.fail_on_missing_images,
+                ast_cache=args.ast_cache,
+            )
+            for result in report.results:
+                progress.stage(f"Done: {result.output_pdf}")
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+
+    write_warnings(report.warnings)
+    for md_root, message in report.failures:
+        print(f"Failed to render {md_root}: {message}", file=sys.stderr)
+    return 1 if report.failures else 0
+
+
 if __name__ == "__main__":  # pragma: no cover - convenience entrypoint
     raise SystemExit(main())
@@ -8,6 +8,9 @@ from typing import Any, Mapping, Sequence
 
 import yaml
 
+from .imageprep import ImagePrepSettings, settings_from_mapping
+from .transforms import resolve_transform_spec
+
 
 @dataclass(frozen=True, slots=True)
 class ProjectConfig:
@@ -20,6 +23,8 @@ class ProjectConfig:
     filters: tuple[Path, ...]
     metadata: Mapping[str, Any]
     output: Path | None
+    image_prep: ImagePrepSettings | None = None
+    transforms: tuple[str, ...] = ()
 
 
 def load_config(config_path: Path) -> ProjectConfig:
@@ -49,6 +54,7 @@ def load_config(config_path: Path) -> ProjectConfig:
 
     filters_raw = data.get("filters", [])
     filters = _validate_filters(base_dir, filters_raw)
+    transforms = _validate_transforms(base_dir, data.get("transforms"))
 
     metadata = data.get("metadata", {})
     if not isinstance(metadata, Mapping):
@@ -57,6 +63,8 @@ def load_config(config_path: Path) -> ProjectConfig:
     output_value = data.get("output")
     output_path = _resolve_output(base_dir, output_value)
 
+    image_prep = settings_from_mapping(data.get("image_prep"))
+
     return ProjectConfig(
         content_root=content_root,
         images_root=images_root,
@@ -65,6 +73,8 @@ def load_config(config_path: Path) -> ProjectConfig:
         filters=filters,
         metadata=metadata,
         output=output_path,
+        image_prep=image_prep,
+        transforms=transforms,
     )
 
 
@@ -115,6 +125,22 @@ def _validate_filters(base_dir: Path, raw_filters: Any) -> tuple[Path, ...]:
     return tuple(validated)
 
 
+def _validate_transforms(base_dir: Path, raw_transforms: Any) -> tuple[str, ...]:
+    if raw_transforms is None:
+        return ()
+    if not isinstance(raw_transforms, Sequence) or isinstance(
+        raw_transforms, (str, bytes)
+    ):
+        raise ValueError("transforms must be a list of transform names")
+
+    validated = []
+    for spec in raw_transforms:
+        if not isinstance(spec, str):
+            raise ValueError("transforms must contain only strings")
+        validated.append(resolve_transform_spec(spec, base_dir))
+    return tuple(validated)
+
+
 def _resolve_output(base_dir: Path, output_value: Any) -> Path | None:
     if output_value is None:
         return None
@@ -0,0 +1,81 @@
+"""Render fingerprints used to skip Pandoc when inputs are unchanged."""
+
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Sequence
+from pathlib import Path
+
+from .images import referenced_images_in_file
+
+FINGERPRINT_SUFFIX = ".fingerprint"
+
+
+def render_fingerprint(
+    bundle: Path,
+    style: Path,
+    template: Path,
+    filters: Sequence[Path],
+    command: Sequence[str],
+    *,
+    transforms: str = "",
+) -> str:
+    """Посчитать отпечаток всех входов рендера.
+
+    В отпечаток входят содержимое бандла, стиля, шаблона, lua-фильтров,
+    всех картинок, на которые ссылается бандл, и командная строка Pandoc.
+    Отсутствующие картинки учитываются по пути, чтобы их появление
+    инвалидировало отпечаток. ``transforms`` — ключ Python-преобразований
+    AST (см. :func:`md2pdf.transforms.transforms_key`).
+    """
+
+    digest = hashlib.sha256()
+    digest.update("\0".join(command).encode("utf-8"))
+    if transforms:
+        digest.update(f"\0transforms\0{transforms}".encode())
+
+    _update_file(digest, "bundle", bundle)
+    _update_file(digest, "style", style)
+    _update_file(digest, "template", template)
+    for lua_filter in filters:
+        _update_file(digest, "filter", lua_filter)
+
+    # Файлы хэшируются и сканируются по частям, а не читаются целиком.
+    for image in referenced_images_in_file(bundle):
+        _update_file(digest, "image", Path(image))
+
+    return digest.hexdigest()
+
+
+def fingerprint_path(output: Path) -> Path:
+    """Файл с отпечатком рядом с итоговым PDF."""
+
+    return output.with_name(output.name + FINGERPRINT_SUFFIX)
+
+
+def is_up_to_date(output: Path, fingerprint: str) -> bool:
+    """Проверить, что PDF существует и собран из тех же входов."""
+
+    stamp = fingerprint_path(output)
+    if not output.is_file() or not stamp.is_file():
+        return False
+    return stamp.read_text(encoding="utf-8").strip() == fingerprint
+
+
+def write_fingerprint(output: Path, fingerprint: str) -> Path:
+    """Сохранить отпечаток рядом с PDF."""
+
+    stamp = fingerprint_path(output)
+    stamp.write_text(fingerprint + "\n", encoding="utf-8")
+    return stamp
+
+
+def _update_file(digest: "hashlib._Hash", kind: str, path: Path) -> None:
+    digest.update(f"\0{kind}\0{path}\0".encode("utf-8"))
+    try:
+        with path.open("rb") as handle:
+            file_digest = hashlib.file_digest(handle, "sha256")
+    except OSError:
+        digest.update(b"<missing>")
+        return
+    digest.update(file_digest.digest())
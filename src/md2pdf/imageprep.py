@@ -0,0 +1,295 @@
+"""Downscale and recompress bundle images before they reach xelatex."""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future, ProcessPoolExecutor
+
+# Pillow is imported on first use (see ``_pillow``) so that runs without
+# image preprocessing do not pay for it; ``None`` means it is not installed.
+_NOT_LOADED: Any = object()
+Image: Any = _NOT_LOADED
+
+IMAGE_PREP_VERSION = 2
+IMAGE_CACHE_DIRNAME = "images"
+
+_RASTER_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tif", ".tiff"}
+# Images with more distinct colors than this are treated as photos.
+_PHOTO_COLORS = 16384
+# xelatex sizes PNG/JPEG files without resolution metadata at 72 dpi.
+_DEFAULT_SOURCE_DPI = 72.0
+
+
+@dataclass(frozen=True, slots=True)
+class ImagePrepSettings:
+    """Target quality of preprocessed images.
+
+    Images are downscaled to ``dpi`` pixels per inch at the size they are
+    shown on the page, which is never wider than ``text_width_mm``. The
+    physical size stays the same because the resolution metadata is scaled
+    along with the pixels. With ``convert_photos`` opaque images with many
+    colors are re-encoded as JPEG at ``jpeg_quality``; screenshots stay PNG.
+    """
+
+    dpi: int = 150
+    text_width_mm: float = 165.0
+    jpeg_quality: int = 85
+    convert_photos: bool = True
+
+    def cache_key(self) -> str:
+        return (
+            f"v{IMAGE_PREP_VERSION}:{self.dpi}:{self.text_width_mm}:"
+            f"{self.jpeg_quality}:{int(self.convert_photos)}"
+        )
+
+
+def settings_from_mapping(raw: Any) -> ImagePrepSettings | None:
+    """Parse the ``image_prep`` config value.
+
+    ``false``/missing disables the stage, ``true`` enables it with
+    defaults, a mapping overrides individual fields.
+    """
+
+    if raw is None or raw is False:
+        return None
+    if raw is True:
+        return ImagePrepSettings()
+    if not isinstance(raw, Mapping):
+        raise ValueError("image_prep must be a boolean or a mapping")
+
+    defaults = ImagePrepSettings()
+    unknown = set(raw) - {"dpi", "text_width_mm", "jpeg_quality", "convert_photos"}
+    if unknown:
+        raise ValueError(f"Unknown image_prep keys: {', '.join(sorted(unknown))}")
+
+    dpi = raw.get("dpi", defaults.dpi)
+    text_width = raw.get("text_width_mm", defaults.text_width_mm)
+    quality = raw.get("jpeg_quality", defaults.jpeg_quality)
+    convert = raw.get("convert_photos", defaults.convert_photos)
+    if not isinstance(dpi, int) or isinstance(dpi, bool) or dpi <= 0:
+        raise ValueError("image_prep.dpi must be a positive integer")
+    if not isinstance(text_width, (int, float)) or text_width <= 0:
+        raise ValueError("image_prep.text_width_mm must be a positive number")
+    if not isinstance(quality, int) or isinstance(quality, bool):
+        raise ValueError("image_prep.jpeg_quality must be an integer from 1 to 95")
+    if not 1 <= quality <= 95:
+        raise ValueError("image_prep.jpeg_quality must be an integer from 1 to 95")
+    if not isinstance(convert, bool):
+        raise ValueError("image_prep.convert_photos must be a boolean")
+
+    return ImagePrepSettings(
+        dpi=dpi,
+        text_width_mm=float(text_width),
+        jpeg_quality=quality,
+        convert_photos=convert,
+    )
+
+
+def require_pillow() -> None:
+    """Raise ``ValueError`` if Pillow is not installed."""
+
+    if _pillow() is None:
+        raise ValueError(
+            "Image preprocessing requires Pillow: pip install 'gostpdf[images]'"
+        )
+
+
+def prepare_image(source: Path, cache_dir: Path, settings: ImagePrepSettings) -> Path:
+    """Return a preprocessed copy of ``source`` from the content-addressed cache.
+
+    The cache key is a hash of the image bytes and ``settings``, so an
+    edited image gets a new copy while unchanged ones are reused across
+    documents and runs. Non-raster and unreadable files are returned as is.
+    When processing would not make an image smaller, the original bytes are
+    cached instead.
+    """
+
+    if source.suffix.lower() not in _RASTER_SUFFIXES:
+        return source
+    try:
+        data = source.read_bytes()
+    except OSError:
+        return source
+
+    digest = hashlib.sha256(settings.cache_key().encode("utf-8") + b"\0" + data)
+    key = digest.hexdigest()
+    bucket = cache_dir / key[:2]
+    for cached in bucket.glob(f"{key}.*"):
+        if cached.suffix != ".tmp":
+            return cached
+
+    require_pillow()
+    payload, suffix = _process(data, source.suffix.lower(), settings)
+
+    bucket.mkdir(parents=True, exist_ok=True)
+    target = bucket / f"{key}{suffix}"
+    # The temp name must not match the lookup glob above, or a concurrent
+    # process could return a file that is about to be renamed away.
+    tmp_path = bucket / f".{key}.{os.getpid()}.tmp"
+    tmp_path.write_bytes(payload)
+    os.replace(tmp_path, target)
+    return target
+
+
+class ImagePreparer:
+    """Preprocess images in a process pool while the caller keeps working.
+
+    :meth:`submit` schedules an image once, :meth:`result` waits for its
+    copy, so a bundle can be streamed section by section while earlier
+    images are still being processed. Non-raster and missing files map to
+    themselves. ``jobs`` defaults to the CPU count; a single job runs
+    in-process. Use as a context manager to shut the pool down.
+    """
+
+    def __init__(
+        self, cache_dir: Path, settings: ImagePrepSettings, *, jobs: int | None = None
+    ) -> None:
+        require_pillow()
+        self._prepare = partial(prepare_image, cache_dir=cache_dir, settings=settings)
+        self._workers = jobs or os.cpu_count() or 1
+        self._executor: ProcessPoolExecutor | None = None
+        self._copies: dict[Path, Future[Path] | Path] = {}
+
+    def __enter__(self) -> ImagePreparer:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def submit(self, source: Path) -> None:
+        """Start preparing ``source`` unless it was submitted before."""
+
+        if source in self._copies:
+            return
+        if source.suffix.lower() not in _RASTER_SUFFIXES or not source.is_file():
+            self._copies[source] = source
+        elif self._workers == 1:
+            self._copies[source] = self._prepare(source)
+        else:
+            if self._executor is None:
+                from concurrent.futures import ProcessPoolExecutor
+
+                self._executor = ProcessPoolExecutor(max_workers=self._workers)
+            self._copies[source] = self._executor.submit(self._prepare, source)
+
+    def result(self, source: Path) -> Path:
+        """Return the prepared copy of ``source``, waiting for it if needed."""
+
+        self.submit(source)
+        copy = self._copies[source]
+        if not isinstance(copy, Path):
+            copy = self._copies[source] = copy.result()
+        return copy
+
+    def prepared(self) -> dict[Path, Path]:
+        """Wait for all submitted images; map those with a new copy to it."""
+
+        copies = {source: self.result(source) for source in list(self._copies)}
+        return {source: copy for source, copy in copies.items() if copy != source}
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+def preprocess_images(
+    sources: Iterable[Path],
+    cache_dir: Path,
+    settings: ImagePrepSettings,
+    *,
+    jobs: int | None = None,
+) -> dict[Path, Path]:
+    """Preprocess ``sources`` in a process pool; map each one to its copy.
+
+    Only images whose copy differs from the source path are reported.
+    ``jobs`` defaults to the CPU count; a single job runs in-process.
+    """
+
+    with ImagePreparer(cache_dir, settings, jobs=jobs) as preparer:
+        for source in sources:
+            preparer.submit(source)
+        return preparer.prepared()
+
+
+def _pillow() -> Any:
+    """Return ``PIL.Image``, importing it on first call; ``None`` without Pillow."""
+
+    global Image
+    if Image is _NOT_LOADED:
+        try:
+            from PIL import Image as pillow
+        except ImportError:  # pragma: no cover - exercised when Pillow is absent
+            Image = None
+        else:
+            Image = pillow
+    return Image
+
+
+def _process(
+    data: bytes, suffix: str, settings: ImagePrepSettings
+) -> tuple[bytes, str]:
+    pillow = _pillow()
+    assert pillow is not None  # guarded by require_pillow()
+    with pillow.open(io.BytesIO(data)) as opened:
+        opened.load()
+        image = opened.copy()
+        source_dpi = _source_dpi(opened.info.get("dpi"))
+
+    width, height = image.size
+    shown_inches = min(width / source_dpi, settings.text_width_mm / 25.4)
+    target_width = max(1, round(shown_inches * settings.dpi))
+    resized = target_width < width
+    dpi = source_dpi
+    if resized:
+        target_height = max(1, round(height * target_width / width))
+        image = image.resize((target_width, target_height), pillow.Resampling.LANCZOS)
+        dpi = source_dpi * target_width / width
+
+    buffer = io.BytesIO()
+    if settings.convert_photos and not _has_alpha(image) and _is_photo(image):
+        image.convert("RGB").save(
+            buffer,
+            "JPEG",
+            quality=settings.jpeg_quality,
+            optimize=True,
+            dpi=(dpi, dpi),
+        )
+        out_suffix = ".jpg"
+    else:
+        image.save(buffer, "PNG", optimize=True, dpi=(dpi, dpi))
+        out_suffix = ".png"
+
+    payload = buffer.getvalue()
+    if not resized and len(payload) >= len(data):
+        return data, suffix
+    return payload, out_suffix
+
+
+def _source_dpi(raw: Any) -> float:
+    try:
+        dpi = float(raw[0])
+    except (TypeError, ValueError, IndexError):
+        return _DEFAULT_SOURCE_DPI
+    return dpi if dpi > 1 else _DEFAULT_SOURCE_DPI
+
+
+def _has_alpha(image: Any) -> bool:
+    return image.mode in ("RGBA", "LA", "PA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+
+
+def _is_photo(image: Any) -> bool:
+    if image.mode in ("1", "L", "P"):
+        return False
+    return image.getcolors(maxcolors=_PHOTO_COLORS) is None
@@ -2,9 +2,40 @@
 
 from __future__ import annotations
 
+import os
 import re
+from collections import defaultdict
+from functools import lru_cache
 from pathlib import Path
-from typing import Callable
+from typing import Any, Callable, Iterable, Iterator, Mapping
+
+_MARKDOWN_IMAGE_SOURCE = (
+    r"!\[(?P<alt>[^\]]*)\]\((?P<path>[^)\s]+)(?:\s+\"(?P<title>[^\"]*)\")?\)"
+)
+_HTML_IMAGE_SOURCE = (
+    r"(?P<prefix><img[^>]*?src=[\"'])(?P<src>[^\"']+)(?P<suffix>[\"'][^>]*?>)"
+)
+
+_MARKDOWN_IMAGE_PATTERN = re.compile(_MARKDOWN_IMAGE_SOURCE)
+_HTML_IMAGE_PATTERN = re.compile(_HTML_IMAGE_SOURCE, flags=re.IGNORECASE)
+
+# All image forms in one alternation; the branch is identified by its
+# distinctive inner group. Every branch starts with a fixed marker, so the
+# pattern is only anchored at marker positions found by substring search
+# (see ``_iter_image_matches``), which is cheaper than letting the regex
+# engine probe the alternation at every character.
+_IMAGE_PATTERN = re.compile(
+    r"::sign-image(?:"
+    r"\s*\n---\s*\n(?P<meta>.+?)\n---\s*\n::"
+    r"|(?:\s+|\s*\n)src:\s*(?P<sign_src>\S+)(?:\s*\n:::+)?"
+    r")"
+    rf"|{_MARKDOWN_IMAGE_SOURCE}"
+    r"|<[iI][mM][gG][^>]*?[sS][rR][cC]=[\"'](?P<src>[^\"']+)(?P<suffix>[\"'][^>]*?>)",
+    flags=re.DOTALL,
+)
+_SIGN_MARKER = "::sign-image"
+_MARKDOWN_MARKER = "!["
+_HTML_MARKER = re.compile(r"<img", flags=re.IGNORECASE)
 
 
 def strip_numeric(stem: str) -> str:
@@ -45,7 +76,10 @@ def resolve_image_path(
         prefix = "/" if str(base).startswith("/") else ""
         return Path(prefix + normalized)
 
-    image = normalized
+    return _image_directory(md_path, base) / normalized
+
+
+def _image_directory(md_path: Path, base: Path) -> Path:
     parts = list(md_path.with_suffix("").parts)
 
     try:
@@ -63,7 +97,60 @@ def resolve_image_path(
     doc_slug = stripped[1]
     relative = stripped[2:]
 
-    return base / doc_slug / Path(*relative) / image
+    return base / doc_slug / Path(*relative)
+
+
+class ImageResolver:
+    """Memoized equivalent of :func:`resolve_image_path` for one pipeline run.
+
+    The stripped image directory of every markdown file in ``md_files`` is
+    computed once up front (other files are added on first use), and
+    resolved paths are kept in an LRU cache bounded by ``maxsize`` entries.
+    Instances are callables with the ``(md_path, image_name)`` resolver
+    signature expected by :func:`rewrite_images`.
+    """
+
+    def __init__(
+        self,
+        images_root: Path | str = Path("/images"),
+        md_files: Iterable[Path] = (),
+        *,
+        maxsize: int = 4096,
+    ) -> None:
+        self.images_root = Path(images_root)
+        self._base_prefix = self.images_root.as_posix().lstrip("/")
+        self._rooted_prefix = "/" if str(self.images_root).startswith("/") else ""
+        self._directories: dict[Path, Path] = {}
+        for md_path in md_files:
+            try:
+                self._directories[md_path] = _image_directory(
+                    md_path, self.images_root
+                )
+            except ValueError:
+                continue
+        self._resolve = lru_cache(maxsize=maxsize)(self._resolve_uncached)
+
+    def __call__(self, md_path: Path, image_name: str) -> Path:
+        return self._resolve(md_path, image_name)
+
+    def cache_info(self) -> Any:
+        """Statistics of the resolution cache (see :func:`functools.lru_cache`)."""
+
+        return self._resolve.cache_info()
+
+    def _resolve_uncached(self, md_path: Path, image_name: str) -> Path:
+        if image_name.startswith("/"):
+            return Path(image_name)
+
+        prefix = self._base_prefix
+        if prefix and (image_name == prefix or image_name.startswith(f"{prefix}/")):
+            return Path(self._rooted_prefix + image_name)
+
+        directory = self._directories.get(md_path)
+        if directory is None:
+            directory = _image_directory(md_path, self.images_root)
+            self._directories[md_path] = directory
+        return directory / image_name
 
 
 def _rewrite_markdown_image(
@@ -84,7 +171,7 @@ def _rewrite_markdown_image(
 def _rewrite_html_image(
     md_path: Path, match: re.Match[str], resolver: Callable[[Path, str], Path]
 ) -> str:
-    prefix = match.group("prefix")
+    prefix = match.string[match.start() : match.start("src")]
     src = match.group("src")
     suffix = match.group("suffix")
 
@@ -127,11 +214,23 @@ def _rewrite_sign_block(
 def _rewrite_sign_inline(
     md_path: Path, match: re.Match[str], resolver: Callable[[Path, str], Path]
 ) -> str:
-    src = match.group("src")
+    src = match.group("sign_src")
     resolved = resolver(md_path, src.lstrip("/"))
     return _render_sign_image(resolved, "", match.group(0).endswith("\n"))
 
 
+def _rewrite_match(
+    md_path: Path, match: re.Match[str], resolver: Callable[[Path, str], Path]
+) -> str:
+    if match.group("meta") is not None:
+        return _rewrite_sign_block(md_path, match, resolver)
+    if match.group("sign_src") is not None:
+        return _rewrite_sign_inline(md_path, match, resolver)
+    if match.group("path") is not None:
+        return _rewrite_markdown_image(md_path, match, resolver)
+    return _rewrite_html_image(md_path, match, resolver)
+
+
 def rewrite_images(
     md_path: Path,
     text: str,
@@ -146,36 +245,134 @@ def rewrite_images(
 
     image_resolver = resolver or resolve_image_path
 
-    markdown_pattern = re.compile(
-        r"!\[(?P<alt>[^\]]*)\]\((?P<path>[^)\s]+)(?:\s+\"(?P<title>[^\"]*)\")?\)",
-    )
-    html_pattern = re.compile(
-        r"(?P<prefix><img[^>]*?src=[\"'])(?P<src>[^\"']+)(?P<suffix>[\"'][^>]*?>)",
-        flags=re.IGNORECASE,
-    )
-    sign_block_pattern = re.compile(
-        r"::sign-image\s*\n---\s*\n(?P<meta>.+?)\n---\s*\n::",
-        flags=re.DOTALL,
-    )
-    sign_inline_pattern = re.compile(
-        r"::sign-image(?:\s+|\s*\n)src:\s*(?P<src>\S+)(?:\s*\n:::+)?",
-    )
-
-    transformers: list[tuple[re.Pattern[str], Callable[[Path, re.Match[str]], str]]] = [
-        (sign_block_pattern, lambda md, m: _rewrite_sign_block(md, m, image_resolver)),
-        (
-            sign_inline_pattern,
-            lambda md, m: _rewrite_sign_inline(md, m, image_resolver),
-        ),
-        (
-            markdown_pattern,
-            lambda md, m: _rewrite_markdown_image(md, m, image_resolver),
-        ),
-        (html_pattern, lambda md, m: _rewrite_html_image(md, m, image_resolver)),
-    ]
-
-    updated = text
-    for pattern, replacer in transformers:
-        updated = pattern.sub(lambda m: replacer(md_path, m), updated)
-
-    return updated
+    pieces: list[str] = []
+    last = 0
+    for match in _iter_image_matches(text):
+        pieces.append(text[last : match.start()])
+        pieces.append(_rewrite_match(md_path, match, image_resolver))
+        last = match.end()
+
+    if not pieces:
+        return text
+    pieces.append(text[last:])
+    return "".join(pieces)
+
+
+def _iter_image_matches(text: str) -> Iterator[re.Match[str]]:
+    sign = text.find(_SIGN_MARKER)
+    markdown = text.find(_MARKDOWN_MARKER)
+    html = _find_html_marker(text, 0)
+    pos = 0
+
+    while True:
+        start = min((c for c in (sign, markdown, html) if c >= pos), default=-1)
+        if start < 0:
+            return
+
+        match = _IMAGE_PATTERN.match(text, start)
+        if match is None:
+            pos = start + 1
+        else:
+            yield match
+            pos = match.end()
+
+        if 0 <= sign < pos:
+            sign = text.find(_SIGN_MARKER, pos)
+        if 0 <= markdown < pos:
+            markdown = text.find(_MARKDOWN_MARKER, pos)
+        if 0 <= html < pos:
+            html = _find_html_marker(text, pos)
+
+
+def _find_html_marker(text: str, pos: int) -> int:
+    found = _HTML_MARKER.search(text, pos)
+    return found.start() if found else -1
+
+
+def referenced_images(text: str) -> list[str]:
+    """Return image targets referenced by markdown and ``<img>`` tags in order.
+
+    Remote ``http(s)`` targets are skipped; duplicates are reported once.
+    """
+
+    targets = [match.group("path") for match in _MARKDOWN_IMAGE_PATTERN.finditer(text)]
+    targets.extend(match.group("src") for match in _HTML_IMAGE_PATTERN.finditer(text))
+    remote = ("http://", "https://")
+    return list(dict.fromkeys(t for t in targets if not t.startswith(remote)))
+
+
+def iter_text_blocks(path: Path) -> Iterator[str]:
+    """Yield the text of ``path`` in chunks that end after a blank line.
+
+    Joining the chunks gives the file text back. Image syntax never spans a
+    blank line, so images can be scanned and rewritten chunk by chunk
+    without loading the whole file.
+    """
+
+    block: list[str] = []
+    with path.open(encoding="utf-8") as handle:
+        for line in handle:
+            block.append(line)
+            if not line.strip():
+                yield "".join(block)
+                block = []
+    if block:
+        yield "".join(block)
+
+
+def referenced_images_in_file(path: Path) -> list[str]:
+    """Like :func:`referenced_images` for a file read chunk by chunk."""
+
+    targets: dict[str, None] = {}
+    for block in iter_text_blocks(path):
+        targets.update(dict.fromkeys(referenced_images(block)))
+    return list(targets)
+
+
+def replace_image_targets(text: str, replacements: Mapping[str, str]) -> str:
+    """Replace targets of markdown images and ``<img>`` tags via ``replacements``.
+
+    Only exact target matches are replaced; everything else in the image
+    syntax (alt text, titles, attributes) is preserved.
+    """
+
+    if not replacements:
+        return text
+
+    def substitute(match: re.Match[str], group: str) -> str:
+        target = match.group(group)
+        replacement = replacements.get(target)
+        if replacement is None:
+            return match.group(0)
+        start, end = match.span(group)
+        whole = match.group(0)
+        offset = match.start()
+        return whole[: start - offset] + replacement + whole[end - offset :]
+
+    text = _MARKDOWN_IMAGE_PATTERN.sub(lambda m: substitute(m, "path"), text)
+    return _HTML_IMAGE_PATTERN.sub(lambda m: substitute(m, "src"), text)
+
+
+def find_missing_images(paths: Iterable[Path]) -> set[Path]:
+    """Return the paths from ``paths`` that do not point at an existing file.
+
+    Paths are grouped by directory and every directory is listed once, so
+    a bundle referencing many images in a few folders costs a handful of
+    ``scandir`` calls instead of a ``stat`` per reference. Duplicate paths
+    are checked once. Relative paths are resolved against the working
+    directory, as Pandoc does.
+    """
+
+    by_directory: defaultdict[Path, set[str]] = defaultdict(set)
+    for path in paths:
+        by_directory[path.parent].add(path.name)
+
+    missing: set[Path] = set()
+    for directory, names in by_directory.items():
+        try:
+            with os.scandir(directory) as entries:
+                files = {entry.name for entry in entries if entry.is_file()}
+        except OSError:
+            files = set()
+        missing.update(directory / name for name in names - files)
+    return missing
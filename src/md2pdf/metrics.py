@@ -0,0 +1,139 @@
+"""Per-stage timing, resource and counter instrumentation."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None  # type: ignore[assignment]
+
+
+@dataclass(frozen=True, slots=True)
+class StageMetrics:
+    """Measurements of a single pipeline stage.
+
+    ``cpu_seconds`` includes CPU time of child processes (Pandoc, xelatex)
+    finished during the stage. ``peak_rss_kb`` is the high-water mark of
+    this process or its children at the end of the stage, as reported by
+    ``getrusage``; it is ``None`` where ``resource`` is unavailable.
+    """
+
+    name: str
+    wall_seconds: float
+    cpu_seconds: float
+    peak_rss_kb: int | None
+
+
+class Metrics:
+    """Collects stage measurements and counters for one pipeline run.
+
+    Counters and accumulated stages may be updated from worker threads.
+    """
+
+    def __init__(self) -> None:
+        self.stages: list[StageMetrics] = []
+        self.counters: dict[str, int] = {}
+        self._accumulated: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Measure wall time, CPU time and peak RSS of the wrapped block."""
+
+        wall_start = time.perf_counter()
+        cpu_start = _cpu_seconds()
+        try:
+            yield
+        finally:
+            self.stages.append(
+                StageMetrics(
+                    name=name,
+                    wall_seconds=time.perf_counter() - wall_start,
+                    cpu_seconds=_cpu_seconds() - cpu_start,
+                    peak_rss_kb=_peak_rss_kb(),
+                )
+            )
+
+    @contextmanager
+    def accumulate(self, name: str) -> Iterator[None]:
+        """Add the duration of the block to a stage measured in many pieces.
+
+        Accumulated stages (e.g. image rewriting inside bundle assembly) are
+        reported by :meth:`records` after the regular stages. When the block
+        runs in several threads at once, the wall times of overlapping pieces
+        are summed and the CPU time is that of the whole process.
+        """
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            with self._lock:
+                totals = self._accumulated.setdefault(name, [0.0, 0.0])
+                totals[0] += wall
+                totals[1] += cpu
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Increase counter ``name`` by ``value``."""
+
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def all_stages(self) -> list[StageMetrics]:
+        """Regular stages followed by accumulated ones."""
+
+        accumulated = [
+            StageMetrics(
+                name=name, wall_seconds=wall, cpu_seconds=cpu, peak_rss_kb=None
+            )
+            for name, (wall, cpu) in self._accumulated.items()
+        ]
+        return [*self.stages, *accumulated]
+
+    def records(self, context: Mapping[str, Any] | None = None) -> list[dict[str, Any]]:
+        """Serializable records: one per stage plus one with all counters."""
+
+        base = {"timestamp": time.time(), **(context or {})}
+        records: list[dict[str, Any]] = [
+            {**base, "type": "stage", **asdict(stage)} for stage in self.all_stages()
+        ]
+        records.append({**base, "type": "counters", "counters": dict(self.counters)})
+        return records
+
+    def write_jsonl(self, path: Path, context: Mapping[str, Any] | None = None) -> Path:
+        """Append records to a JSONL file, one JSON object per line."""
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lines = "".join(
+            json.dumps(record, ensure_ascii=False, default=str) + "\n"
+            for record in self.records(context)
+        )
+        with open(path, "a", encoding="utf-8") as handle:
+            handle.write(lines)
+        return path
+
+
+def _cpu_seconds() -> float:
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _peak_rss_kb() -> int | None:
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children)
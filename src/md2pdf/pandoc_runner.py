@@ -1,16 +1,58 @@
 from __future__ import annotations
 
+import codecs
+import hashlib
 import os
-from collections.abc import Sequence
+import shutil
+import signal
+import sys
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass
 from pathlib import Path
 import subprocess
 from contextlib import nullcontext
-from typing import IO
+from typing import IO, TYPE_CHECKING, NoReturn
+
+from .texformat import (
+    FORMAT_DIRNAME,
+    discard_format,
+    ensure_format,
+    format_command,
+    format_env,
+    is_format_error,
+)
+
+# asyncio нужен только асинхронному рендеру и импортируется в нём: синхронный
+# путь и проверка структуры обходятся без загрузки event loop.
+if TYPE_CHECKING:
+    import asyncio
+
+    from .metrics import Metrics
 
 PANDOC_MARKDOWN_FORMAT = (
     "markdown+yaml_metadata_block-tex_math_dollars-tex_math_single_backslash"
 )
 
+_READ_CHUNK_SIZE = 64 * 1024
+
+# Файлы, по которым xelatex передаёт данные между проходами.
+LATEX_AUX_SUFFIXES = (".aux", ".toc", ".out", ".lof", ".lot")
+MAX_LATEX_PASSES = 4
+_ERROR_TAIL_LINES = 40
+
+
+@dataclass(frozen=True, slots=True)
+class RenderJob:
+    """Аргументы одного рендера для :func:`render_many`."""
+
+    bundle: Path
+    style: Path
+    template: Path
+    output: Path
+    filters: tuple[Path, ...] = ()
+    log_file: Path | None = None
+    toc: bool = True
+
 
 def render(
     bundle: Path,
@@ -21,6 +63,9 @@ def render(
     *,
     verbose: bool = False,
     log_file: Path | None = None,
+    toc: bool = True,
+    env: Mapping[str, str] | None = None,
+    precompiled: bool = True,
 ) -> None:
     """Запустить Pandoc для рендера PDF.
 
@@ -32,16 +77,240 @@ def render(
         filters: Необязательные lua-фильтры.
         verbose: Если True, поток Pandoc выводится в stdout по мере выполнения.
         log_file: Файл для записи полного вывода Pandoc.
+        toc: Строить ли оглавление (``--toc``).
+        env: Переменные окружения поверх текущих, например общий
+            ``TEXMFVAR`` сервера рендера.
+        precompiled: Запускать xelatex с предкомпилированным форматом
+            преамбулы, если его удалось собрать (см. :mod:`md2pdf.texformat`).
+            Если xelatex отверг формат, рендер повторяется без него.
 
     Raises:
         RuntimeError: Если Pandoc завершился с ошибкой.
     """
 
+    command = build_command(bundle, style, template, output, filters, toc=toc)
+    process_env = _build_env(env)
+    fmt = _precompiled_format(template, style, process_env) if precompiled else None
+
+    with _open_log(log_file) if log_file else nullcontext() as handle:
+        if fmt is not None:
+            used_command = format_command(command, fmt)
+            return_code, combined_output = _run_process(
+                used_command, format_env(process_env, fmt), verbose, handle
+            )
+            if return_code != 0 and is_format_error(combined_output):
+                discard_format(fmt, combined_output)
+                fmt = None
+        if fmt is None:
+            used_command = command
+            return_code, combined_output = _run_process(
+                command, process_env, verbose, handle
+            )
+
+    if return_code != 0:
+        stderr = combined_output.strip()
+        joined_command = " ".join(used_command)
+        raise RuntimeError(
+            f"Pandoc failed with code {return_code}: {stderr}\nCommand: {joined_command}"
+        )
+
+
+def render_latex(
+    bundle: Path,
+    style: Path,
+    template: Path,
+    output: Path,
+    filters: Sequence[Path] = (),
+    *,
+    build_dir: Path,
+    verbose: bool = False,
+    log_file: Path | None = None,
+    toc: bool = True,
+    env: Mapping[str, str] | None = None,
+    precompiled: bool = True,
+    max_passes: int = MAX_LATEX_PASSES,
+    metrics: Metrics | None = None,
+) -> int:
+    """Отрендерить PDF через ``.tex`` в постоянном каталоге ``build_dir``.
+
+    Pandoc выдаёт только LaTeX, а проходы xelatex запускаются здесь же.
+    Вспомогательные файлы (``.aux``, ``.toc`` и т. п.) остаются в
+    ``build_dir`` между сборками; проходы повторяются, пока их контрольные
+    суммы меняются, но не больше ``max_passes``. При пересборке документа
+    с неизменной структурой обычно хватает одного прохода. В ``metrics``
+    проходы xelatex пишутся отдельной стадией ``xelatex`` и счётчиком
+    ``xelatex_passes``. Остальные аргументы совпадают с :func:`render`.
+
+    Returns:
+        Число выполненных проходов xelatex.
+
+    Raises:
+        RuntimeError: Если Pandoc или xelatex завершились с ошибкой.
+    """
+
+    if max_passes < 1:
+        raise ValueError("max_passes must be a positive integer")
+
+    build_dir.mkdir(parents=True, exist_ok=True)
+    tex_path = build_dir / f"{output.stem}.tex"
+    command = build_latex_command(bundle, style, template, tex_path, filters, toc=toc)
+    process_env = _build_env(env)
+    fmt = _precompiled_format(template, style, process_env) if precompiled else None
+
+    with _open_log(log_file) if log_file else nullcontext() as handle:
+        return_code, combined_output = _run_process(
+            command, process_env, verbose, handle
+        )
+        if return_code != 0:
+            raise RuntimeError(
+                f"Pandoc failed with code {return_code}: {combined_output.strip()}"
+                f"\nCommand: {' '.join(command)}"
+            )
+
+        passes = 0
+        previous = _aux_checksums(build_dir, tex_path.stem)
+        with metrics.stage("xelatex") if metrics is not None else nullcontext():
+            while True:
+                passes += 1
+                fmt = _run_xelatex(tex_path, process_env, fmt, verbose, handle)
+                current = _aux_checksums(build_dir, tex_path.stem)
+                if current == previous or passes >= max_passes:
+                    break
+                previous = current
+        if metrics is not None:
+            metrics.count("xelatex_passes", passes)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(tex_path.with_suffix(".pdf"), output)
+    return passes
+
+
+async def render_async(
+    bundle: Path,
+    style: Path,
+    template: Path,
+    output: Path,
+    filters: Sequence[Path] = (),
+    *,
+    verbose: bool = False,
+    log_file: Path | None = None,
+    timeout: float | None = None,
+    toc: bool = True,
+    precompiled: bool = True,
+) -> None:
+    """Асинхронный вариант :func:`render` для запуска из event loop.
+
+    Вывод Pandoc читается блоками и пишется в лог через буферизованный
+    файл, без flush на каждой строке; лог открывается и закрывается в
+    отдельном потоке. Pandoc запускается в отдельной группе процессов: при
+    превышении ``timeout`` (секунды, общий на первый запуск и повтор без
+    формата) или отмене задачи убивается вся группа, включая дочерний
+    xelatex. Формат преамбулы (``precompiled``) используется так же, как в
+    :func:`render`.
+
+    Raises:
+        RuntimeError: Если Pandoc завершился с ошибкой или по таймауту.
+    """
+
+    import asyncio
+
+    command = build_command(bundle, style, template, output, filters, toc=toc)
+    env = _build_env()
+    fmt = None
+    if precompiled:
+        fmt = await asyncio.to_thread(_precompiled_format, template, style, env)
+
+    deadline = None
+    if timeout is not None:
+        deadline = asyncio.get_running_loop().time() + timeout
+
+    handle = await asyncio.to_thread(_open_log, log_file) if log_file else None
+    try:
+        if fmt is not None:
+            used_command = format_command(command, fmt)
+            return_code, combined_output = await _run_process_async(
+                used_command, format_env(env, fmt), verbose, handle, timeout, deadline
+            )
+            if return_code != 0 and is_format_error(combined_output):
+                await asyncio.to_thread(discard_format, fmt, combined_output)
+                fmt = None
+        if fmt is None:
+            used_command = command
+            return_code, combined_output = await _run_process_async(
+                command, env, verbose, handle, timeout, deadline
+            )
+    finally:
+        if handle is not None:
+            await asyncio.to_thread(handle.close)
+
+    if return_code != 0:
+        stderr = combined_output.strip()
+        joined_command = " ".join(used_command)
+        raise RuntimeError(
+            f"Pandoc failed with code {return_code}: {stderr}\nCommand: {joined_command}"
+        )
+
+
+async def render_many(
+    jobs: Iterable[RenderJob],
+    *,
+    concurrency: int = 2,
+    timeout: float | None = None,
+) -> list[BaseException | None]:
+    """Запустить несколько рендеров конкурентно, не более ``concurrency`` сразу.
+
+    Возвращает по элементу на задачу в исходном порядке: ``None`` при успехе
+    или исключение, если рендер упал; ошибка одной задачи не отменяет
+    остальные.
+    """
+
+    if concurrency < 1:
+        raise ValueError("concurrency must be a positive integer")
+
+    import asyncio
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(job: RenderJob) -> None:
+        async with semaphore:
+            await render_async(
+                job.bundle,
+                job.style,
+                job.template,
+                job.output,
+                job.filters,
+                log_file=job.log_file,
+                timeout=timeout,
+                toc=job.toc,
+            )
+
+    results = await asyncio.gather(
+        *(run(job) for job in jobs), return_exceptions=True
+    )
+    return [result if isinstance(result, BaseException) else None for result in results]
+
+
+def build_command(
+    bundle: Path,
+    style: Path,
+    template: Path,
+    output: Path,
+    filters: Sequence[Path] = (),
+    *,
+    toc: bool = True,
+) -> list[str]:
+    """Собрать командную строку Pandoc для рендера PDF.
+
+    Без ``toc`` оглавление не строится, что экономит проходы xelatex при
+    предпросмотре. Бандл с расширением ``.json`` читается как Pandoc JSON
+    AST (см. :mod:`md2pdf.astcache`).
+    """
+
     command = [
         "pandoc",
         str(bundle),
         "--from",
-        PANDOC_MARKDOWN_FORMAT,
+        "json" if bundle.suffix == ".json" else PANDOC_MARKDOWN_FORMAT,
         "--template",
         str(template),
         "--pdf-engine",
@@ -52,40 +321,152 @@ def render(
         "--output",
         str(output),
     ]
+    if not toc:
+        command.remove("--toc")
 
     for lua_filter in filters:
         command.extend(["--lua-filter", str(lua_filter)])
 
-    env = _build_env()
+    return command
 
-    log_handle: IO[str] | None
-    if log_file is not None:
-        log_file.parent.mkdir(parents=True, exist_ok=True)
-        log_handle = open(log_file, "a", encoding="utf-8")
-    else:
-        log_handle = None
-
-    with log_handle or nullcontext() as handle:
-        combined_output: list[str] = []
-        process = subprocess.Popen(  # noqa: S603
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            env=env,
-        )
 
-        assert process.stdout is not None  # for mypy
-        _pipe_output(process.stdout, combined_output, verbose, handle)
-        process.wait()
-        return_code = process.returncode
+def build_latex_command(
+    bundle: Path,
+    style: Path,
+    template: Path,
+    output: Path,
+    filters: Sequence[Path] = (),
+    *,
+    toc: bool = True,
+) -> list[str]:
+    """Собрать командную строку Pandoc, выдающую ``.tex`` вместо PDF."""
+
+    command = build_command(bundle, style, template, output, filters, toc=toc)
+    engine = command.index("--pdf-engine")
+    command[engine : engine + 2] = ["--to", "latex"]
+    return command
+
 
+def _run_xelatex(
+    tex_path: Path,
+    env: Mapping[str, str],
+    fmt: Path | None,
+    verbose: bool,
+    log_handle: IO[str] | None,
+) -> Path | None:
+    command = [
+        "xelatex",
+        "-interaction=nonstopmode",
+        "-halt-on-error",
+        f"-output-directory={tex_path.parent}",
+        str(tex_path),
+    ]
+    if fmt is not None:
+        return_code, combined_output = _run_process(
+            [*command[:1], f"-fmt={fmt.stem}", *command[1:]],
+            format_env(env, fmt),
+            verbose,
+            log_handle,
+        )
+        if return_code == 0:
+            return fmt
+        if not is_format_error(combined_output):
+            _raise_xelatex_error(return_code, combined_output, command)
+        discard_format(fmt, combined_output)
+
+    return_code, combined_output = _run_process(command, env, verbose, log_handle)
     if return_code != 0:
-        stderr = "".join(combined_output).strip()
+        _raise_xelatex_error(return_code, combined_output, command)
+    return None
+
+
+def _raise_xelatex_error(
+    return_code: int, output: str, command: Sequence[str]
+) -> NoReturn:
+    tail = "\n".join(output.strip().splitlines()[-_ERROR_TAIL_LINES:])
+    raise RuntimeError(
+        f"xelatex failed with code {return_code}: {tail}\nCommand: {' '.join(command)}"
+    )
+
+
+def _aux_checksums(build_dir: Path, stem: str) -> dict[str, str]:
+    checksums = {}
+    for suffix in LATEX_AUX_SUFFIXES:
+        try:
+            data = (build_dir / f"{stem}{suffix}").read_bytes()
+        except FileNotFoundError:
+            continue
+        checksums[suffix] = hashlib.sha256(data).hexdigest()
+    return checksums
+
+
+def _run_process(
+    command: Sequence[str],
+    env: Mapping[str, str],
+    verbose: bool,
+    log_handle: IO[str] | None,
+) -> tuple[int, str]:
+    combined_output: list[str] = []
+    process = subprocess.Popen(  # noqa: S603
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        env=env,
+    )
+
+    assert process.stdout is not None  # for mypy
+    _pipe_output(process.stdout, combined_output, verbose, log_handle)
+    process.wait()
+    return process.returncode, "".join(combined_output)
+
+
+async def _run_process_async(
+    command: Sequence[str],
+    env: Mapping[str, str],
+    verbose: bool,
+    log_handle: IO[str] | None,
+    timeout: float | None,
+    deadline: float | None,
+) -> tuple[int, str]:
+    import asyncio
+
+    combined_output: list[str] = []
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        env=env,
+        start_new_session=True,
+    )
+
+    try:
+        async with asyncio.timeout_at(deadline):
+            await _stream_output(process, combined_output, verbose, log_handle)
+    except TimeoutError:
+        await _kill_process_group(process)
         joined_command = " ".join(command)
         raise RuntimeError(
-            f"Pandoc failed with code {return_code}: {stderr}\nCommand: {joined_command}"
-        )
+            f"Pandoc timed out after {timeout} s\nCommand: {joined_command}"
+        ) from None
+    except asyncio.CancelledError:
+        await _kill_process_group(process)
+        raise
+    assert process.returncode is not None  # for mypy
+    return process.returncode, "".join(combined_output)
+
+
+def _open_log(log_file: Path) -> IO[str]:
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    return open(log_file, "a", encoding="utf-8")
+
+
+def _precompiled_format(
+    template: Path, style: Path, env: Mapping[str, str]
+) -> Path | None:
+    return ensure_format(
+        template, style, Path(env["TEXMFVAR"]) / FORMAT_DIRNAME, env=env
+    )
 
 
 def _pipe_output(
@@ -103,8 +484,42 @@ def _pipe_output(
             log_handle.flush()
 
 
-def _build_env() -> dict[str, str]:
+async def _stream_output(
+    process: asyncio.subprocess.Process,
+    buffer: list[str],
+    verbose: bool,
+    log_handle: IO[str] | None,
+) -> None:
+    assert process.stdout is not None  # for mypy
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while chunk := await process.stdout.read(_READ_CHUNK_SIZE):
+        text = decoder.decode(chunk)
+        buffer.append(text)
+        if verbose:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        if log_handle is not None:
+            log_handle.write(text)
+    tail = decoder.decode(b"", final=True)
+    buffer.append(tail)
+    if log_handle is not None:
+        log_handle.write(tail)
+    await process.wait()
+
+
+async def _kill_process_group(process: asyncio.subprocess.Process) -> None:
+    if process.returncode is None:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    await process.wait()
+
+
+def _build_env(overrides: Mapping[str, str] | None = None) -> dict[str, str]:
     env = dict(os.environ)
+    if overrides:
+        env.update(overrides)
     texmfvar = env.get("TEXMFVAR")
     if texmfvar is None:
         texmfvar_path = Path.cwd() / ".texmf-var"
@@ -2,18 +2,50 @@
 
 from __future__ import annotations
 
+from collections import deque
+from contextlib import ExitStack, nullcontext
 from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
 from itertools import chain
 from pathlib import Path
-from typing import Any, Callable, Iterable, Mapping, Sequence, Tuple
+from typing import Any, Callable, Iterable, Iterator, Mapping, Sequence, Tuple
 
-from .bundle import build as build_bundle_text
-from .bundle import write_bundle
+from .artifacts import BlobStore, artifact_key
+from .astcache import AST_DIRNAME, SectionAstCache, build_ast
+from .bundle import iter_sections, write_bundle, write_sections
+from .cache import SectionCache, section_cache_path
 from .config import ProjectConfig, load_config
-from .images import resolve_image_path
+from .fingerprint import (
+    fingerprint_path,
+    is_up_to_date,
+    render_fingerprint,
+    write_fingerprint,
+)
+from .imageprep import (
+    IMAGE_CACHE_DIRNAME,
+    ImagePreparer,
+    ImagePrepSettings,
+    require_pillow,
+)
+from .images import (
+    ImageResolver,
+    find_missing_images,
+    referenced_images,
+    replace_image_targets,
+    strip_numeric,
+)
+from .metrics import Metrics
+from .pandoc_runner import RenderJob, build_command, render_many
 from .pandoc_runner import render as _render
-from .reporting import StructureWarning
-from .walker import walk
+from .pandoc_runner import render_latex as _render_latex
+from .reporting import StructureWarning, format_warnings
+from .transforms import load_transforms
+from .walker import WalkManifest, manifest_path, walk
+
+CACHE_DIRNAME = ".md2pdf-cache"
+LATEX_DIRNAME = "latex"
+# Сколько секций бандла ждут подготовки своих картинок одновременно.
+_IMAGE_PREP_WINDOW = 32
 
 
 @dataclass(frozen=True, slots=True)
@@ -28,6 +60,9 @@ class PipelineParams:
     metadata: Mapping[str, Any]
     bundle_path: Path
     output_pdf: Path
+    cache_dir: Path | None = None
+    image_prep: ImagePrepSettings | None = None
+    transforms: tuple[str, ...] = ()
 
 
 @dataclass(frozen=True, slots=True)
@@ -38,12 +73,41 @@ class MarkdownCollection:
     warnings: list[StructureWarning] = field(default_factory=list)
 
 
-@dataclass(frozen=True, slots=True)
+@dataclass(frozen=True, slots=True, init=False)
 class BundleArtifacts:
-    """Container for a rendered bundle and its location on disk."""
+    """Container for a rendered bundle and its location on disk.
+
+    When the bundle was streamed to disk, the text is not kept in memory and
+    :attr:`content` reads it back from ``path`` on every access.
+    :attr:`warnings` holds problems found while assembling, such as
+    references to missing images. :attr:`section_lines` are the zero-based
+    lines where the front matter and every section start in the bundle.
+    """
 
     path: Path
-    content: str
+    _content: str | None = field(default=None, repr=False)
+    warnings: tuple[StructureWarning, ...] = ()
+    section_lines: tuple[int, ...] = field(default=(), compare=False)
+
+    def __init__(
+        self,
+        path: Path,
+        content: str | None = None,
+        warnings: Iterable[StructureWarning] = (),
+        section_lines: Iterable[int] = (),
+    ) -> None:
+        object.__setattr__(self, "path", path)
+        object.__setattr__(self, "_content", content)
+        object.__setattr__(self, "warnings", tuple(warnings))
+        object.__setattr__(self, "section_lines", tuple(section_lines))
+
+    @property
+    def content(self) -> str:
+        """Bundle text, loaded from disk for lazily assembled bundles."""
+
+        if self._content is not None:
+            return self._content
+        return self.path.read_text(encoding="utf-8")
 
 
 @dataclass(frozen=True, slots=True)
@@ -55,6 +119,15 @@ class PipelineResult:
     warnings: tuple[StructureWarning, ...]
 
 
+@dataclass(frozen=True, slots=True)
+class BatchReport:
+    """Aggregated outcome of rendering several document roots."""
+
+    results: tuple[PipelineResult, ...]
+    failures: tuple[tuple[Path, str], ...]
+    warnings: tuple[StructureWarning, ...]
+
+
 def prepare_params(
     md_dir: Path,
     config_path: Path,
@@ -67,6 +140,27 @@ def prepare_params(
     """Validate inputs and merge configuration with CLI overrides."""
 
     config = load_config(config_path)
+    return params_from_config(
+        config,
+        md_dir,
+        style_override=style_override,
+        output_override=output_override,
+        metadata_overrides=metadata_overrides,
+        bundle_path=bundle_path,
+    )
+
+
+def params_from_config(
+    config: ProjectConfig,
+    md_dir: Path,
+    *,
+    style_override: str | None = None,
+    output_override: Path | None = None,
+    metadata_overrides: Mapping[str, Any] | None = None,
+    bundle_path: Path | None = None,
+) -> PipelineParams:
+    """Merge an already loaded configuration with CLI overrides."""
+
     _ensure_directory(md_dir)
 
     style_path = _resolve_style(config, style_override)
@@ -83,16 +177,485 @@ def prepare_params(
         metadata=merged_metadata,
         bundle_path=resolved_bundle,
         output_pdf=output_pdf,
+        cache_dir=output_pdf.parent / CACHE_DIRNAME,
+        image_prep=config.image_prep,
+        transforms=config.transforms,
+    )
+
+
+def discover_documents(content_root: Path) -> list[Path]:
+    """Return document roots (``content/<NNN.slug>``) under ``content_root``.
+
+    Hidden directories are ignored; roots are ordered by name.
+    """
+
+    _ensure_directory(content_root)
+    return sorted(
+        entry
+        for entry in content_root.iterdir()
+        if entry.is_dir() and not entry.name.startswith(".")
+    )
+
+
+def prepare_batch_params(
+    config_path: Path,
+    *,
+    style_override: str | None = None,
+    output_dir: Path | None = None,
+    metadata_overrides: Mapping[str, Any] | None = None,
+) -> list[PipelineParams]:
+    """Prepare parameters for every document root of the project.
+
+    The configuration is loaded once. Each document renders into
+    ``<output_dir>/<slug>.pdf`` where ``slug`` is the root name without its
+    numeric prefix; ``output_dir`` defaults to the directory of the
+    configured ``output``.
+    """
+
+    config = load_config(config_path)
+    target_dir = output_dir or (config.output.parent if config.output else None)
+    if target_dir is None:
+        raise ValueError("Output directory must be provided via CLI or config")
+
+    return [
+        params_from_config(
+            config,
+            md_root,
+            style_override=style_override,
+            output_override=target_dir / f"{strip_numeric(md_root.name)}.pdf",
+            metadata_overrides=metadata_overrides,
+        )
+        for md_root in discover_documents(config.content_root)
+    ]
+
+
+def run_document(
+    params: PipelineParams,
+    *,
+    use_cache: bool = True,
+    force: bool = False,
+    log_file: Path | None = None,
+    metrics_file: Path | None = None,
+    server: str | None = None,
+    keep_tex: bool = False,
+    artifacts: BlobStore | None = None,
+    fail_on_missing_images: bool = False,
+    ast_cache: bool = False,
+) -> PipelineResult:
+    """Run collect, assemble and render for a single document root.
+
+    With ``metrics_file`` stage measurements and counters are appended to it
+    as JSON lines (see :class:`md2pdf.metrics.Metrics`). With ``server`` the
+    PDF is rendered by the render server at that URL. With ``keep_tex`` the
+    LaTeX and its auxiliary files are kept in :func:`latex_build_dir`.
+    ``artifacts`` is a shared PDF cache (see :mod:`md2pdf.artifacts`).
+    With ``fail_on_missing_images`` a reference to a missing image raises
+    ``ValueError`` before Pandoc runs; otherwise it is reported as a
+    ``MISSING_IMAGE`` warning. With ``ast_cache`` sections are parsed into
+    Pandoc JSON once and kept in :func:`ast_cache_dir`; configured
+    ``transforms`` always go through that cache (see
+    :func:`section_ast_cache`).
+    """
+
+    metrics = Metrics()
+    with metrics.stage("walk"):
+        collection = collect_markdown(
+            params.md_root, cache_dir=params.cache_dir if use_cache else None
+        )
+    with metrics.stage("bundle"):
+        bundle = assemble_bundle(
+            collection.order,
+            params.bundle_path,
+            metadata=params.metadata,
+            images_root=params.images_root,
+            cache_dir=params.cache_dir if use_cache else None,
+            lazy_content=True,
+            metrics=metrics,
+            image_prep=params.image_prep,
+            fail_on_missing_images=fail_on_missing_images,
+        )
+    with metrics.stage("render"):
+        output_pdf, rendered = render_pdf_incremental(
+            bundle.path,
+            style=params.style,
+            template=params.template,
+            output=params.output_pdf,
+            filters=params.filters,
+            log_file=log_file,
+            force=force,
+            server=server,
+            build_dir=latex_build_dir(params) if keep_tex else None,
+            artifacts=artifacts,
+            metrics=metrics,
+            ast_cache=section_ast_cache(params, enabled=ast_cache),
+            section_lines=bundle.section_lines,
+        )
+
+    if metrics_file is not None:
+        metrics.write_jsonl(
+            metrics_file,
+            {
+                "document": str(params.md_root),
+                "output": str(output_pdf),
+                "rendered": rendered,
+            },
+        )
+    return aggregate_result(
+        bundle.path, output_pdf, collection.warnings, bundle.warnings
+    )
+
+
+def latex_build_dir(params: PipelineParams) -> Path:
+    """Persistent LaTeX build directory of a document.
+
+    Lives next to the section cache and is named after the output PDF, so
+    documents of one batch do not share auxiliary files.
+    """
+
+    cache_dir = params.cache_dir or params.output_pdf.parent / CACHE_DIRNAME
+    return cache_dir / LATEX_DIRNAME / params.output_pdf.stem
+
+
+def ast_cache_dir(params: PipelineParams) -> Path:
+    """Directory of cached section ASTs, shared by the documents of a batch."""
+
+    cache_dir = params.cache_dir or params.output_pdf.parent / CACHE_DIRNAME
+    return cache_dir / AST_DIRNAME
+
+
+def section_ast_cache(
+    params: PipelineParams, *, enabled: bool = False
+) -> SectionAstCache | None:
+    """Section AST cache for a render, or ``None`` when the AST stage is off.
+
+    Configured ``transforms`` run on the JSON AST only, so they turn the
+    stage on even when ``enabled`` is false.
+    """
+
+    if not (enabled or params.transforms):
+        return None
+    return SectionAstCache(ast_cache_dir(params), load_transforms(params.transforms))
+
+
+def run_batch(
+    batch: Sequence[PipelineParams],
+    *,
+    jobs: int = 1,
+    use_cache: bool = True,
+    force: bool = False,
+    log_file: Path | None = None,
+    metrics_file: Path | None = None,
+    server: str | None = None,
+    keep_tex: bool = False,
+    artifacts: BlobStore | None = None,
+    fail_on_missing_images: bool = False,
+    ast_cache: bool = False,
+) -> BatchReport:
+    """Render several documents, in a process pool when ``jobs > 1``.
+
+    A failure of one document does not stop the others; failures are
+    collected into the report together with their error messages. With
+    ``server`` the workers only assemble bundles and the render server
+    limits how many Pandoc runs happen at once. Each document writes its
+    Pandoc output to its own log next to ``log_file`` (see
+    :func:`document_log_file`), so parallel renders do not interleave.
+    """
+
+    if jobs < 1:
+        raise ValueError("jobs must be a positive integer")
+
+    options: dict[str, Any] = {
+        "use_cache": use_cache,
+        "force": force,
+        "metrics_file": metrics_file,
+        "server": server,
+        "keep_tex": keep_tex,
+        "artifacts": artifacts,
+        "fail_on_missing_images": fail_on_missing_images,
+        "ast_cache": ast_cache,
+    }
+    log_files: dict[Path, Path | None] = {}
+    for params in batch:
+        document_log = None
+        if log_file is not None:
+            document_log = document_log_file(log_file, params)
+            document_log.unlink(missing_ok=True)
+        log_files[params.md_root] = document_log
+    results: list[PipelineResult] = []
+    failures: list[tuple[Path, str]] = []
+
+    # Ошибка любого типа (OSError, BrokenProcessPool, ошибки преобразований
+    # AST и т. п.) относится к своему документу и не должна прерывать
+    # остальные, поэтому здесь намеренно ловится любое Exception.
+    if jobs == 1 or len(batch) <= 1:
+        for params in batch:
+            try:
+                results.append(
+                    run_document(params, log_file=log_files[params.md_root], **options)
+                )
+            except Exception as exc:  # noqa: BLE001
+                failures.append((params.md_root, str(exc) or type(exc).__name__))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(jobs, len(batch))) as executor:
+            futures = [
+                (
+                    params,
+                    executor.submit(
+                        run_document,
+                        params,
+                        log_file=log_files[params.md_root],
+                        **options,
+                    ),
+                )
+                for params in batch
+            ]
+            for params, future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as exc:  # noqa: BLE001
+                    failures.append((params.md_root, str(exc) or type(exc).__name__))
+
+    return BatchReport(
+        results=tuple(results),
+        failures=tuple(failures),
+        warnings=merge_warnings(*(result.warnings for result in results)),
+    )
+
+
+def document_log_file(log_file: Path, params: PipelineParams) -> Path:
+    """Return the per-document log used by :func:`run_batch`.
+
+    ``render.log`` becomes ``render.<pdf stem>.log`` next to it.
+    """
+
+    return _sibling_log_file(log_file, params.output_pdf)
+
+
+def _sibling_log_file(log_file: Path, output: Path) -> Path:
+    suffix = log_file.suffix or ".log"
+    return log_file.with_name(f"{log_file.stem}.{output.stem}{suffix}")
+
+
+def select_preview(
+    order: Sequence[Path], md_root: Path, patterns: Sequence[str]
+) -> list[Path]:
+    """Отобрать из ``order`` файлы для предпросмотра.
+
+    Шаблон — путь до файла или поддерева (относительно ``md_root`` либо
+    существующий путь внутри него) или glob по относительному пути,
+    например ``02.*/*.md``. Порядок ``order`` сохраняется.
+    """
+
+    normalized = [_normalize_preview_pattern(pattern, md_root) for pattern in patterns]
+    selected = [
+        md_path
+        for md_path in order
+        if any(
+            _matches_preview(md_path.relative_to(md_root).as_posix(), pattern)
+            for pattern in normalized
+        )
+    ]
+    if not selected:
+        raise ValueError(
+            f"No markdown files match preview selection: {', '.join(patterns)}"
+        )
+    return selected
+
+
+def split_top_level_sections(
+    order: Sequence[Path], md_root: Path
+) -> list[tuple[str, list[Path]]]:
+    """Разбить ``order`` на разделы верхнего уровня документа.
+
+    Раздел — файл в корне ``md_root`` или каталог первого уровня со всем
+    содержимым. Возвращает пары ``(slug, файлы)`` в порядке обхода.
+    """
+
+    groups: dict[str, list[Path]] = {}
+    for md_path in order:
+        parts = md_path.relative_to(md_root).parts
+        key = parts[0] if len(parts) > 1 else Path(parts[0]).stem
+        groups.setdefault(key, []).append(md_path)
+    return [(strip_numeric(key), files) for key, files in groups.items()]
+
+
+def run_preview(
+    params: PipelineParams,
+    patterns: Sequence[str] = (),
+    *,
+    split: bool = False,
+    jobs: int = 1,
+    use_cache: bool = True,
+    force: bool = False,
+    log_file: Path | None = None,
+    toc: bool = False,
+    fail_on_missing_images: bool = False,
+    metrics: Metrics | None = None,
+) -> BatchReport:
+    """Быстро отрендерить часть документа.
+
+    Собирается только срез порядка обхода, отобранный ``patterns`` (см.
+    :func:`select_preview`; без шаблонов — весь документ), с уровнями
+    заголовков как в полном документе. Результат пишется в
+    ``<output>.preview.pdf``. С ``split=True`` каждый раздел верхнего
+    уровня среза рендерится в свой PDF ``<output>.parts/NN.<slug>.pdf``,
+    до ``jobs`` рендеров параллельно. По умолчанию оглавление не
+    строится. Неизменённые части пропускаются по отпечатку входов.
+
+    В ``failures`` отчёта попадают пути PDF, рендер которых упал.
+    ``fail_on_missing_images`` передаётся в :func:`assemble_bundle`.
+    При заданных ``transforms`` Pandoc рендерит JSON AST бандла, собранный
+    через :func:`section_ast_cache`. Каждая часть пишет вывод Pandoc в свой
+    лог рядом с ``log_file`` (``render.<имя PDF>.log``), чтобы параллельные
+    рендеры не перемешивались. В ``metrics`` пишутся стадии ``walk``,
+    ``bundle`` и ``render``, счётчики :func:`assemble_bundle` и
+    ``ast_cache_hits``/``ast_cache_misses``.
+    """
+
+    if jobs < 1:
+        raise ValueError("jobs must be a positive integer")
+
+    with metrics.stage("walk") if metrics else nullcontext():
+        collection = collect_markdown(
+            params.md_root, cache_dir=params.cache_dir if use_cache else None
+        )
+    if not collection.order:
+        raise ValueError(f"No markdown files found in {params.md_root}")
+    base_root = collection.order[0].parent
+    order = (
+        select_preview(collection.order, params.md_root, patterns)
+        if patterns
+        else collection.order
+    )
+
+    stem = params.output_pdf.stem
+    if split:
+        parts_dir = params.output_pdf.with_name(f"{stem}.parts")
+        slices = [
+            (parts_dir / f"{index:02d}.{slug}.pdf", files)
+            for index, (slug, files) in enumerate(
+                split_top_level_sections(order, params.md_root), start=1
+            )
+        ]
+    else:
+        slices = [(params.output_pdf.with_name(f"{stem}.preview.pdf"), order)]
+
+    ast_cache = section_ast_cache(params)
+    built: list[tuple[Path, Path]] = []
+    bundle_warnings: list[StructureWarning] = []
+    pending: list[tuple[RenderJob, str]] = []
+    with metrics.stage("bundle") if metrics else nullcontext():
+        for output, files in slices:
+            bundle = assemble_bundle(
+                files,
+                output.with_suffix(".bundle.md"),
+                metadata=params.metadata,
+                images_root=params.images_root,
+                cache_dir=params.cache_dir if use_cache else None,
+                lazy_content=True,
+                base_root=base_root,
+                metrics=metrics,
+                image_prep=params.image_prep,
+                fail_on_missing_images=fail_on_missing_images,
+            )
+            built.append((bundle.path, output))
+            bundle_warnings.extend(bundle.warnings)
+
+            # Отпечаток считается по markdown-бандлу: в JSON AST не видно
+            # картинок, а преобразования учитываются ключом ``transforms``.
+            source = bundle.path
+            transforms = ""
+            if ast_cache is not None:
+                source = bundle.path.with_suffix(".json")
+                transforms = ast_cache.transforms_key
+            command = build_command(
+                source, params.style, params.template, output, params.filters, toc=toc
+            )
+            fingerprint = render_fingerprint(
+                bundle.path,
+                params.style,
+                params.template,
+                params.filters,
+                command,
+                transforms=transforms,
+            )
+            if force or not is_up_to_date(output, fingerprint):
+                fingerprint_path(output).unlink(missing_ok=True)
+                output.parent.mkdir(parents=True, exist_ok=True)
+                part_log = None
+                if log_file is not None:
+                    part_log = _sibling_log_file(log_file, output)
+                    part_log.unlink(missing_ok=True)
+                if ast_cache is not None:
+                    build_ast(
+                        bundle.path,
+                        source,
+                        ast_cache,
+                        section_lines=bundle.section_lines,
+                    )
+                job = RenderJob(
+                    bundle=source,
+                    style=params.style,
+                    template=params.template,
+                    output=output,
+                    filters=params.filters,
+                    log_file=part_log,
+                    toc=toc,
+                )
+                pending.append((job, fingerprint))
+
+    if metrics is not None and ast_cache is not None:
+        metrics.count("ast_cache_hits", ast_cache.hits)
+        metrics.count("ast_cache_misses", ast_cache.misses)
+
+    import asyncio
+
+    with metrics.stage("render") if metrics else nullcontext():
+        outcomes = (
+            asyncio.run(render_many([job for job, _ in pending], concurrency=jobs))
+            if pending
+            else []
+        )
+    failed: dict[Path, str] = {}
+    for (job, fingerprint), outcome in zip(pending, outcomes):
+        if outcome is None:
+            write_fingerprint(job.output, fingerprint)
+        else:
+            failed[job.output] = str(outcome)
+
+    return BatchReport(
+        results=tuple(
+            aggregate_result(bundle_path, output, collection.warnings)
+            for bundle_path, output in built
+            if output not in failed
+        ),
+        failures=tuple(failed.items()),
+        warnings=merge_warnings(collection.warnings, bundle_warnings),
     )
 
 
 def collect_markdown(
-    md_root: Path, warnings: Iterable[StructureWarning] | None = None
+    md_root: Path,
+    warnings: Iterable[StructureWarning] | None = None,
+    *,
+    cache_dir: Path | None = None,
 ) -> MarkdownCollection:
-    """Walk the markdown tree, preserving incoming warnings."""
+    """Walk the markdown tree, preserving incoming warnings.
+
+    With ``cache_dir`` the walk reuses listings of unchanged directories
+    from the manifest of a previous run (see :class:`md2pdf.walker.WalkManifest`)
+    and updates it.
+    """
 
     accumulated_warnings = list(warnings or [])
-    ordered, walker_warnings = walk(md_root)
+    if cache_dir is None:
+        ordered, walker_warnings = walk(md_root)
+    else:
+        manifest = WalkManifest(manifest_path(cache_dir, md_root))
+        ordered, walker_warnings = walk(md_root, manifest=manifest)
+        manifest.save()
     accumulated_warnings.extend(walker_warnings)
 
     return MarkdownCollection(order=ordered, warnings=accumulated_warnings)
@@ -106,22 +669,123 @@ def assemble_bundle(
     image_resolver: Callable[[Path, str], Path] | None = None,
     images_root: Path | str | None = None,
     params: PipelineParams | None = None,
+    cache_dir: Path | None = None,
+    lazy_content: bool = False,
+    metrics: Metrics | None = None,
+    base_root: Path | None = None,
+    image_prep: ImagePrepSettings | None = None,
+    jobs: int = 1,
+    check_images: bool = True,
+    fail_on_missing_images: bool = False,
 ) -> BundleArtifacts:
     """Собрать и записать итоговый markdown-бандл.
 
-    Если ``image_resolver`` не указан, используется :func:`resolve_image_path`
+    Если ``image_resolver`` не указан, используется :class:`ImageResolver`
+    (мемоизированный :func:`resolve_image_path`), построенный по ``order``
     с базой ``images_root`` (по умолчанию значение из конфига или ``/images``).
+    При заданном ``cache_dir`` отрендеренные секции кэшируются на диске и
+    переиспользуются для неизменённых файлов. Кэш работает только со
+    штатным резолвером: поведение пользовательского колбэка нельзя учесть
+    в ключе кэша.
+
+    С ``lazy_content=True`` секции пишутся в файл по мере сборки, текст
+    бандла целиком в памяти не держится, а ``BundleArtifacts.content``
+    читается с диска по требованию.
+
+    В ``metrics`` пишутся счётчики ``files_processed``, ``images_rewritten``,
+    ``bundle_bytes`` и попадания/промахи кэша секций.
+
+    ``base_root`` задаёт корень для уровней заголовков при сборке части
+    документа (см. :func:`md2pdf.bundle.build`).
+
+    С ``image_prep`` картинки бандла ужимаются под разрешение страницы
+    (см. :mod:`md2pdf.imageprep`) по ходу сборки, а ссылки в секциях
+    переводятся на копии из ``<cache_dir>/images`` до записи в бандл. Кэш
+    секций хранит исходные ссылки, поэтому правка картинки подхватывается
+    без правки markdown.
+
+    ``jobs`` задаёт число потоков для чтения и рендера секций; порядок и
+    текст бандла от него не зависят.
+
+    С ``check_images`` пути картинок всех секций собираются при сборке и
+    проверяются одним проходом (см. :func:`md2pdf.images.find_missing_images`):
+    на каждую отсутствующую картинку в ``BundleArtifacts.warnings``
+    попадает предупреждение ``MISSING_IMAGE``, а в ``metrics`` — счётчик
+    ``images_missing``. С ``fail_on_missing_images`` вместо этого
+    выбрасывается ``ValueError`` ещё до рендера.
     """
 
+    if image_prep is not None:
+        require_pillow()
+
     resolved_images_root = _resolve_images_root(images_root, params)
-    resolver = image_resolver or (
-        lambda md_path, image: resolve_image_path(
-            md_path, image, resolved_images_root
+    resolver = image_resolver or ImageResolver(resolved_images_root, order)
+
+    section_cache: SectionCache | None = None
+    if cache_dir is not None and image_resolver is None:
+        section_cache = SectionCache(
+            section_cache_path(cache_dir, destination),
+            {"images_root": str(resolved_images_root)},
         )
+
+    image_targets: dict[Path, list[str]] | None = {} if check_images else None
+    section_lines: list[int] = []
+    sections: Iterable[str] = iter_sections(
+        order,
+        resolver,
+        metadata,
+        section_cache=section_cache,
+        metrics=metrics,
+        base_root=base_root,
+        jobs=jobs,
+        image_targets=image_targets,
+    )
+    if metrics is not None:
+        sections = _count_section_images(sections, metrics)
+    with ExitStack() as stack:
+        if image_prep is not None:
+            preparer = stack.enter_context(
+                ImagePreparer(
+                    (cache_dir or destination.parent / CACHE_DIRNAME)
+                    / IMAGE_CACHE_DIRNAME,
+                    image_prep,
+                )
+            )
+            sections = _prepare_section_images(sections, preparer, metrics)
+        sections = _track_section_lines(sections, section_lines)
+        content: str | None = None
+        if lazy_content:
+            bundle_path = write_sections(sections, destination)
+        else:
+            content = "\n\n".join(sections) + "\n"
+            bundle_path = write_bundle(content, destination)
+        if image_prep is not None and metrics is not None:
+            metrics.count("images_prepared", len(preparer.prepared()))
+
+    if section_cache is not None:
+        section_cache.save()
+    warnings: list[StructureWarning] = []
+    if image_targets is not None:
+        warnings = _missing_image_warnings(order, image_targets)
+        if metrics is not None:
+            metrics.count("images_missing", len(warnings))
+        if warnings and fail_on_missing_images:
+            raise ValueError(
+                "Bundle references missing images:\n"
+                + "\n".join(format_warnings(warnings))
+            )
+    if metrics is not None:
+        metrics.count("files_processed", len(order))
+        metrics.count("bundle_bytes", bundle_path.stat().st_size)
+        if section_cache is not None:
+            metrics.count("section_cache_hits", section_cache.hits)
+            metrics.count("section_cache_misses", section_cache.misses)
+    return BundleArtifacts(
+        path=bundle_path,
+        content=content,
+        warnings=warnings,
+        section_lines=section_lines,
     )
-    content = build_bundle_text(order, resolver, metadata)
-    bundle_path = write_bundle(content, destination)
-    return BundleArtifacts(path=bundle_path, content=content)
 
 
 def render_pdf(
@@ -133,15 +797,68 @@ def render_pdf(
     filters: Sequence[Path] = (),
     verbose: bool = False,
     log_file: Path | None = None,
+    toc: bool = True,
+    server: str | None = None,
+    build_dir: Path | None = None,
+    ast_cache: SectionAstCache | None = None,
+    section_lines: Sequence[int] = (),
+    metrics: Metrics | None = None,
 ) -> Path:
-    """Подготовить и вызвать рендер PDF через Pandoc."""
+    """Подготовить и вызвать рендер PDF через Pandoc.
 
-    if not bundle.exists():
-        raise ValueError(f"Missing bundle file: {bundle}")
-    if not bundle.is_file():
-        raise ValueError(f"Expected file, got directory: {bundle}")
+    С ``server`` (URL из :mod:`md2pdf.server`) рендер выполняет сервер с
+    прогретым состоянием TeX; вывод Pandoc тогда попадает только в
+    ``log_file``. С ``build_dir`` Pandoc выдаёт ``.tex`` в этот каталог,
+    а xelatex запускается напрямую с сохранением ``.aux``/``.toc`` между
+    сборками (см. :func:`md2pdf.pandoc_runner.render_latex`); его время
+    попадает в ``metrics`` отдельной стадией ``xelatex``.
 
+    С ``ast_cache`` бандл сначала собирается в ``<bundle>.json`` из
+    закэшированных JSON AST секций (границы секций — ``section_lines``,
+    см. :mod:`md2pdf.astcache`), и Pandoc рендерит уже его.
+    """
+
+    _ensure_bundle_file(bundle)
+    if server is not None and build_dir is not None:
+        raise ValueError("LaTeX build directories are not supported by the server")
+
+    if ast_cache is not None:
+        bundle = build_ast(
+            bundle,
+            bundle.with_suffix(".json"),
+            ast_cache,
+            section_lines=section_lines,
+        )
     output.parent.mkdir(parents=True, exist_ok=True)
+    if build_dir is not None:
+        _render_latex(
+            bundle,
+            style,
+            template,
+            output,
+            filters,
+            build_dir=build_dir,
+            verbose=verbose,
+            log_file=log_file,
+            toc=toc,
+            metrics=metrics,
+        )
+        return output
+    if server is not None:
+        # HTTP-клиент нужен только рендеру через сервер.
+        from .server import submit_render
+
+        job = RenderJob(
+            bundle=bundle,
+            style=style,
+            template=template,
+            output=output,
+            filters=tuple(filters),
+            log_file=log_file,
+            toc=toc,
+        )
+        submit_render(server, job)
+        return output
     _render(
         bundle,
         style,
@@ -150,10 +867,189 @@ def render_pdf(
         filters,
         verbose=verbose,
         log_file=log_file,
+        toc=toc,
     )
     return output
 
 
+def render_pdf_incremental(
+    bundle: Path,
+    *,
+    style: Path,
+    template: Path,
+    output: Path,
+    filters: Sequence[Path] = (),
+    verbose: bool = False,
+    log_file: Path | None = None,
+    force: bool = False,
+    toc: bool = True,
+    server: str | None = None,
+    build_dir: Path | None = None,
+    artifacts: BlobStore | None = None,
+    metrics: Metrics | None = None,
+    ast_cache: SectionAstCache | None = None,
+    section_lines: Sequence[int] = (),
+) -> Tuple[Path, bool]:
+    """Отрендерить PDF, только если входы рендера изменились.
+
+    Отпечаток входов (см. :func:`md2pdf.fingerprint.render_fingerprint`)
+    хранится рядом с PDF. Возвращает путь до PDF и признак того, был ли
+    действительно запущен Pandoc. ``server``, ``build_dir``, ``ast_cache``
+    и ``section_lines`` передаются в :func:`render_pdf`.
+
+    С ``artifacts`` PDF сначала ищется в общем кэше по
+    :func:`md2pdf.artifacts.artifact_key`, а свежеотрендеренный PDF
+    сохраняется туда (``force`` пропускает только поиск). В ``metrics``
+    пишутся счётчики ``artifact_cache_hits``/``artifact_cache_misses`` и
+    ``ast_cache_hits``/``ast_cache_misses``. Преобразования ``ast_cache``
+    входят и в отпечаток, и в ключ общего кэша.
+    """
+
+    _ensure_bundle_file(bundle)
+
+    transforms = ast_cache.transforms_key if ast_cache is not None else ""
+    command = build_command(bundle, style, template, output, filters, toc=toc)
+    fingerprint = render_fingerprint(
+        bundle, style, template, filters, command, transforms=transforms
+    )
+    if not force and is_up_to_date(output, fingerprint):
+        return output, False
+
+    fingerprint_path(output).unlink(missing_ok=True)
+    key: str | None = None
+    if artifacts is not None:
+        key = artifact_key(
+            bundle, style, template, filters, toc=toc, transforms=transforms
+        )
+        if not force:
+            hit = artifacts.get(key, output)
+            if metrics is not None:
+                metrics.count("artifact_cache_hits" if hit else "artifact_cache_misses")
+            if hit:
+                write_fingerprint(output, fingerprint)
+                return output, False
+
+    rendered = render_pdf(
+        bundle,
+        style=style,
+        template=template,
+        output=output,
+        filters=filters,
+        verbose=verbose,
+        log_file=log_file,
+        toc=toc,
+        server=server,
+        build_dir=build_dir,
+        ast_cache=ast_cache,
+        section_lines=section_lines,
+        metrics=metrics,
+    )
+    if metrics is not None and ast_cache is not None:
+        metrics.count("ast_cache_hits", ast_cache.hits)
+        metrics.count("ast_cache_misses", ast_cache.misses)
+    if artifacts is not None and key is not None:
+        artifacts.put(key, rendered)
+    write_fingerprint(rendered, fingerprint)
+    return rendered, True
+
+
+def _prepare_section_images(
+    sections: Iterable[str], preparer: ImagePreparer, metrics: Metrics | None
+) -> Iterator[str]:
+    # Картинки секции отправляются в пул сразу, а сама секция отдаётся на
+    # запись, когда готовы её копии и до _IMAGE_PREP_WINDOW следующих секций
+    # уже в работе: пул занят, а в памяти лишь окно секций, а не весь бандл.
+    window: deque[tuple[str, list[str]]] = deque()
+
+    def release() -> str:
+        section, targets = window.popleft()
+        with metrics.accumulate("image_prep") if metrics else nullcontext():
+            copies = {target: preparer.result(Path(target)) for target in targets}
+        replacements = {
+            target: str(copy) for target, copy in copies.items() if copy != Path(target)
+        }
+        return replace_image_targets(section, replacements) if replacements else section
+
+    for section in sections:
+        targets = referenced_images(section)
+        for target in targets:
+            preparer.submit(Path(target))
+        window.append((section, targets))
+        if len(window) > _IMAGE_PREP_WINDOW:
+            yield release()
+    while window:
+        yield release()
+
+
+def _track_section_lines(
+    sections: Iterable[str], section_lines: list[int]
+) -> Iterator[str]:
+    # Части бандла разделяются пустой строкой (см. write_sections), а
+    # картинки переписываются без изменения числа строк, поэтому номера
+    # строк остаются верными и после подготовки картинок.
+    line = 0
+    for section in sections:
+        section_lines.append(line)
+        line += section.count("\n") + 2
+        yield section
+
+
+def _missing_image_warnings(
+    order: Sequence[Path], image_targets: Mapping[Path, Sequence[str]]
+) -> list[StructureWarning]:
+    missing = find_missing_images(
+        Path(target) for targets in image_targets.values() for target in targets
+    )
+    if not missing:
+        return []
+    return [
+        StructureWarning(
+            code="MISSING_IMAGE",
+            path=md_path,
+            message=f"Нет картинки {target}",
+        )
+        for md_path in order
+        for target in image_targets.get(md_path, ())
+        if Path(target) in missing
+    ]
+
+
+def _count_section_images(sections: Iterable[str], metrics: Metrics) -> Iterator[str]:
+    # Считаются картинки в готовых секциях, а не вызовы резолвера: при
+    # попадании в кэш секций резолвер не вызывается.
+    for section in sections:
+        metrics.count("images_rewritten", len(referenced_images(section)))
+        yield section
+
+
+def _normalize_preview_pattern(pattern: str, md_root: Path) -> str:
+    # Относительный путь ищется сначала от md_root; путь от текущего
+    # каталога принимается, только если он ведёт внутрь md_root, иначе
+    # одноимённая папка рядом с проектом уводила бы предпросмотр наружу.
+    root = md_root.resolve()
+    candidate = Path(pattern)
+    if not candidate.is_absolute() and (md_root / candidate).exists():
+        candidate = md_root / candidate
+    elif not candidate.exists() or (
+        not candidate.is_absolute() and not candidate.resolve().is_relative_to(root)
+    ):
+        return pattern.strip("/")
+    try:
+        return candidate.resolve().relative_to(root).as_posix()
+    except ValueError as error:
+        raise ValueError(f"Preview path is outside of {md_root}: {pattern}") from error
+
+
+def _matches_preview(relative: str, pattern: str) -> bool:
+    if pattern in ("", "."):
+        return True
+    return (
+        relative == pattern
+        or relative.startswith(pattern + "/")
+        or fnmatchcase(relative, pattern)
+    )
+
+
 def _ensure_directory(path: Path) -> None:
     if not path.exists():
         raise ValueError(f"Missing directory: {path}")
@@ -161,6 +1057,13 @@ def _ensure_directory(path: Path) -> None:
         raise ValueError(f"Expected directory, got file: {path}")
 
 
+def _ensure_bundle_file(bundle: Path) -> None:
+    if not bundle.exists():
+        raise ValueError(f"Missing bundle file: {bundle}")
+    if not bundle.is_file():
+        raise ValueError(f"Expected file, got directory: {bundle}")
+
+
 def _resolve_style(config: ProjectConfig, override: str | None) -> Path:
     if not override:
         return config.style
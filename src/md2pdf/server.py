@@ -0,0 +1,440 @@
+"""Долгоживущий локальный сервер рендера PDF.
+
+Сервер принимает задания рендера бандлов по HTTP на localhost и запускает
+Pandoc с общим для всех заданий состоянием TeX: ``TEXMFVAR`` и кэш
+fontconfig лежат в ``state_dir`` и прогреваются один раз, а не при каждом
+запуске CLI. Число одновременных рендеров ограничено ``concurrency``,
+остальные задания ждут в очереди длиной не больше ``max_queue``.
+
+Протокол:
+
+* ``POST /render`` — JSON (``Content-Type: application/json``) с полями
+  :class:`md2pdf.pandoc_runner.RenderJob`; пути абсолютные и лежат внутри
+  ``roots`` сервера (сервер и клиент работают на одной машине). Ответ
+  ``200 {"output": ...}`` после завершения рендера, ``422 {"error": ...}``
+  при ошибке Pandoc, ``503`` при переполненной очереди.
+* ``GET /status`` — счётчики заданий.
+
+Запросы подписываются токеном из ``<state_dir>/token`` (заголовок
+``Authorization: Bearer ...``): без него любая страница в браузере могла бы
+отправить задание на localhost, а фильтры Lua — это произвольный код.
+Сервер слушает только loopback-адреса, если явно не передан
+``allow_remote``.
+"""
+
+from __future__ import annotations
+
+import hmac
+import ipaddress
+import json
+import os
+import secrets
+import threading
+import urllib.error
+import urllib.request
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+from .pandoc_runner import RenderJob, render
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+DEFAULT_STATE_DIRNAME = ".md2pdf-server"
+TOKEN_FILENAME = "token"
+TOKEN_ENV = "MD2PDF_SERVER_TOKEN"
+# Сколько клиент по умолчанию ждёт ответа на задание, секунды.
+DEFAULT_SUBMIT_TIMEOUT = 1800.0
+
+Renderer = Callable[..., None]
+
+
+@dataclass(frozen=True, slots=True)
+class ServerStats:
+    """Счётчики заданий сервера рендера."""
+
+    queued: int = 0
+    running: int = 0
+    completed: int = 0
+    failed: int = 0
+    rejected: int = 0
+
+
+class RenderServer(ThreadingHTTPServer):
+    """HTTP-сервер с очередью заданий рендера.
+
+    Каждый запрос обслуживается своим потоком, который ждёт свободного
+    слота и запускает ``renderer`` (по умолчанию
+    :func:`md2pdf.pandoc_runner.render`) с окружением из ``state_dir``.
+    Все пути задания должны лежать внутри ``roots`` (по умолчанию текущий
+    каталог); токен запросов хранится в ``state_dir``.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        *,
+        concurrency: int = 2,
+        max_queue: int = 64,
+        state_dir: Path | None = None,
+        roots: Sequence[Path] = (),
+        allow_remote: bool = False,
+        renderer: Renderer = render,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be a positive integer")
+        if max_queue < 0:
+            raise ValueError("max_queue must not be negative")
+        if not allow_remote and not _is_loopback(address[0]):
+            raise ValueError(
+                f"Refusing to listen on non-loopback address {address[0]}: "
+                "render jobs run arbitrary Lua filters; pass --serve-allow-remote "
+                "to override"
+            )
+
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.state_dir = (state_dir or Path.cwd() / DEFAULT_STATE_DIRNAME).resolve()
+        self.roots = tuple(root.resolve() for root in roots or (Path.cwd(),))
+        self.env = _state_env(self.state_dir)
+        self.token = ensure_token(self.state_dir)
+        self.renderer = renderer
+        self._slots = threading.Semaphore(concurrency)
+        self._lock = threading.Lock()
+        self._stats = ServerStats()
+        super().__init__(address, _RenderHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def stats(self) -> ServerStats:
+        with self._lock:
+            return self._stats
+
+    def check_job(self, job: RenderJob) -> None:
+        """Проверить, что все пути задания лежат внутри ``roots``.
+
+        Raises:
+            PermissionError: Если путь выходит за пределы ``roots``.
+        """
+
+        paths = [job.bundle, job.style, job.template, job.output, *job.filters]
+        if job.log_file is not None:
+            paths.append(job.log_file)
+        for path in paths:
+            resolved = path.resolve()
+            if not any(resolved.is_relative_to(root) for root in self.roots):
+                raise PermissionError(f"Path is outside of the server roots: {path}")
+
+    def run_job(self, job: RenderJob) -> Path:
+        """Дождаться слота и отрендерить ``job``.
+
+        Raises:
+            OverflowError: Если очередь заполнена.
+            RuntimeError: Если рендер завершился с ошибкой.
+        """
+
+        with self._lock:
+            stats = self._stats
+            if stats.queued >= self.max_queue and stats.running >= self.concurrency:
+                self._update(rejected=1)
+                raise OverflowError("Render queue is full")
+            self._update(queued=1)
+
+        with self._slots:
+            with self._lock:
+                self._update(queued=-1, running=1)
+            succeeded = False
+            try:
+                self.renderer(
+                    job.bundle,
+                    job.style,
+                    job.template,
+                    job.output,
+                    job.filters,
+                    log_file=job.log_file,
+                    toc=job.toc,
+                    env=self.env,
+                )
+                succeeded = True
+            finally:
+                with self._lock:
+                    if succeeded:
+                        self._update(running=-1, completed=1)
+                    else:
+                        self._update(running=-1, failed=1)
+        return job.output
+
+    def _update(self, **deltas: int) -> None:
+        current = asdict(self._stats)
+        for name, delta in deltas.items():
+            current[name] += delta
+        self._stats = ServerStats(**current)
+
+
+class _RenderHandler(BaseHTTPRequestHandler):
+    server: RenderServer
+
+    def do_GET(self) -> None:
+        if self.path != "/status":
+            self._reply(404, {"error": f"Unknown path: {self.path}"})
+            return
+        self._reply(200, asdict(self.server.stats()))
+
+    def do_POST(self) -> None:
+        if self.path != "/render":
+            self._reply(404, {"error": f"Unknown path: {self.path}"})
+            return
+        # Без токена и JSON отказываем до чтения тела: так браузер не может
+        # отправить задание "простым" кросс-доменным запросом.
+        if not self._authorized():
+            self._reply(401, {"error": "Missing or invalid render server token"})
+            return
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.split(";")[0].strip().lower() != "application/json":
+            self._reply(415, {"error": "Render jobs must be application/json"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+            job = job_from_payload(json.loads(self.rfile.read(length)))
+        except (ValueError, TypeError, KeyError) as exc:
+            self._reply(400, {"error": f"Invalid render job: {exc}"})
+            return
+        try:
+            self.server.check_job(job)
+        except PermissionError as exc:
+            self._reply(403, {"error": str(exc)})
+            return
+
+        try:
+            output = self.server.run_job(job)
+        except OverflowError as exc:
+            self._reply(503, {"error": str(exc)})
+        except (RuntimeError, OSError, ValueError) as exc:
+            self._reply(422, {"error": str(exc)})
+        # Любая другая ошибка рендерера должна дойти до клиента ответом 500,
+        # а не оборвать соединение без ответа.
+        except Exception as exc:  # noqa: BLE001
+            self._reply(500, {"error": f"Render failed: {exc}"})
+        else:
+            self._reply(200, {"output": str(output)})
+
+    def log_message(self, format: str, *args: Any) -> None:
+        return
+
+    def _authorized(self) -> bool:
+        scheme, _, token = self.headers.get("Authorization", "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(
+            token.strip().encode("utf-8"), self.server.token.encode("utf-8")
+        )
+
+    def _reply(self, status: int, payload: Mapping[str, Any]) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(
+    address: str = DEFAULT_ADDRESS,
+    *,
+    concurrency: int = 2,
+    max_queue: int = 64,
+    state_dir: Path | None = None,
+    roots: Sequence[Path] = (),
+    allow_remote: bool = False,
+    report: Callable[[str], None] = lambda message: None,
+) -> None:
+    """Запустить сервер рендера и обслуживать задания до прерывания."""
+
+    with RenderServer(
+        parse_address(address),
+        concurrency=concurrency,
+        max_queue=max_queue,
+        state_dir=state_dir,
+        roots=roots,
+        allow_remote=allow_remote,
+    ) as server:
+        report(
+            f"Render server listening on {server.url} "
+            f"({concurrency} concurrent renders, state in {server.state_dir}, "
+            f"roots: {', '.join(str(root) for root in server.roots)})"
+        )
+        server.serve_forever()
+
+
+def submit_render(
+    url: str,
+    job: RenderJob,
+    *,
+    token: str | None = None,
+    timeout: float = DEFAULT_SUBMIT_TIMEOUT,
+) -> Path:
+    """Отправить задание на сервер рендера и дождаться PDF.
+
+    Без ``token`` используется :func:`read_token`. ``timeout`` (секунды)
+    ограничивает ожидание соединения и ответа, включая время в очереди.
+
+    Raises:
+        RuntimeError: Если сервер недоступен, не ответил за ``timeout`` или
+            рендер завершился с ошибкой.
+    """
+
+    if token is None:
+        token = read_token()
+    request = urllib.request.Request(
+        f"{url.rstrip('/')}/render",
+        data=json.dumps(job_to_payload(job)).encode("utf-8"),
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {token}",
+        },
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            payload = json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        raise RuntimeError(_error_message(exc)) from None
+    except urllib.error.URLError as exc:
+        raise RuntimeError(
+            f"Render server is unavailable at {url}: {exc.reason}"
+        ) from None
+    except TimeoutError:
+        raise RuntimeError(
+            f"Render server at {url} did not answer within {timeout} s"
+        ) from None
+    return Path(payload["output"])
+
+
+def job_to_payload(job: RenderJob) -> dict[str, Any]:
+    """Сериализовать задание в JSON-совместимый словарь с абсолютными путями."""
+
+    return {
+        "bundle": str(job.bundle.resolve()),
+        "style": str(job.style.resolve()),
+        "template": str(job.template.resolve()),
+        "output": str(job.output.resolve()),
+        "filters": [str(path.resolve()) for path in job.filters],
+        "log_file": str(job.log_file.resolve()) if job.log_file else None,
+        "toc": job.toc,
+    }
+
+
+def job_from_payload(payload: Any) -> RenderJob:
+    """Разобрать задание, присланное клиентом.
+
+    Все пути, включая фильтры и лог, должны быть абсолютными: относительные
+    разрешались бы от рабочего каталога сервера, а не клиента.
+    """
+
+    if not isinstance(payload, Mapping):
+        raise ValueError("render job must be a JSON object")
+    paths = {name: Path(payload[name]) for name in ("bundle", "style", "template")}
+    output = Path(payload["output"])
+    filters = tuple(Path(path) for path in payload.get("filters", ()))
+    log_file = Path(payload["log_file"]) if payload.get("log_file") else None
+    checked = [*paths.values(), output, *filters]
+    if log_file is not None:
+        checked.append(log_file)
+    for path in checked:
+        if not path.is_absolute():
+            raise ValueError(f"path must be absolute: {path}")
+    toc = payload.get("toc", True)
+    if not isinstance(toc, bool):
+        raise ValueError("toc must be a boolean")
+    return RenderJob(
+        output=output,
+        filters=filters,
+        log_file=log_file,
+        toc=toc,
+        **paths,
+    )
+
+
+def ensure_token(state_dir: Path) -> str:
+    """Вернуть токен сервера из ``state_dir``, создав его при первом запуске.
+
+    Файл токена доступен только владельцу.
+    """
+
+    path = state_dir / TOKEN_FILENAME
+    try:
+        token = path.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        token = ""
+    if token:
+        return token
+    state_dir.mkdir(parents=True, exist_ok=True)
+    token = secrets.token_urlsafe(32)
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, "w", encoding="utf-8") as handle:
+        handle.write(token + "\n")
+    return token
+
+
+def read_token(state_dir: Path | None = None) -> str:
+    """Найти токен для запросов к серверу.
+
+    Берётся из переменной окружения ``MD2PDF_SERVER_TOKEN`` или из файла
+    ``token`` в ``state_dir`` (по умолчанию ``.md2pdf-server`` текущего
+    каталога, как у :func:`serve`).
+
+    Raises:
+        RuntimeError: Если токен не найден.
+    """
+
+    token = os.environ.get(TOKEN_ENV, "").strip()
+    if token:
+        return token
+    path = (state_dir or Path.cwd() / DEFAULT_STATE_DIRNAME) / TOKEN_FILENAME
+    try:
+        token = path.read_text(encoding="utf-8").strip()
+    except OSError:
+        token = ""
+    if not token:
+        raise RuntimeError(
+            f"Render server token not found: set {TOKEN_ENV} or run the client "
+            f"next to the server state directory ({path})"
+        )
+    return token
+
+
+def parse_address(address: str) -> tuple[str, int]:
+    """Разобрать ``HOST:PORT``."""
+
+    host, separator, port = address.rpartition(":")
+    if not separator or not host or not port.isdigit():
+        raise ValueError(f"Server address must be HOST:PORT, got {address!r}")
+    return host, int(port)
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _state_env(state_dir: Path) -> dict[str, str]:
+    texmfvar = state_dir / "texmf-var"
+    cache = state_dir / "cache"
+    texmfvar.mkdir(parents=True, exist_ok=True)
+    cache.mkdir(parents=True, exist_ok=True)
+    return {"TEXMFVAR": str(texmfvar), "XDG_CACHE_HOME": str(cache)}
+
+
+def _error_message(error: urllib.error.HTTPError) -> str:
+    try:
+        return str(json.loads(error.read())["error"])
+    except (ValueError, KeyError, TypeError):
+        return f"Render server returned HTTP {error.code}"
@@ -0,0 +1,401 @@
+"""Преобразование блоков ``::app-collapsible`` в таблицы Pandoc.
+
+В исходниках таблицы лежат в блоках вида::
+
+    ::app-collapsible
+    ---
+    label: "Таблица 12 - Типовые ошибки"
+    ---
+
+    #content
+    <table>...</table>
+    ::
+
+Pandoc не понимает ни обёртку, ни HTML-таблицу внутри неё, и в PDF
+попадает сырой текст. Здесь таблица переводится в grid table с подписью.
+Ширины столбцов считаются заранее по длинам содержимого ячеек (как
+автоматическая раскладка HTML-таблиц) и задаются числом дефисов в
+разделителях, то есть явными относительными ширинами. Pandoc тогда
+выдаёт столбцы фиксированной ширины, и longtable не нужны лишние проходы
+xelatex, чтобы подобрать ширины по ``.aux``.
+"""
+
+from __future__ import annotations
+
+import re
+import textwrap
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+
+# Ширина таблицы в символах. Она больше ``--columns`` Pandoc (72), поэтому
+# ширины столбцов всегда нормируются на всю ширину текста.
+TABLE_WIDTH = 100
+MIN_COLUMN_WIDTH = 6
+
+_BLOCK_PATTERN = re.compile(
+    r"^::app-collapsible[ \t]*\n"
+    r"(?:[ \t]*---[ \t]*\n(?P<meta>.*?)\n[ \t]*---[ \t]*\n)?"
+    r"(?P<body>.*?)"
+    r"^::[ \t]*$",
+    flags=re.DOTALL | re.MULTILINE,
+)
+_BLOCK_MARKER = "::app-collapsible"
+_TABLE_PATTERN = re.compile(r"<table\b.*?</table\s*>", flags=re.DOTALL | re.IGNORECASE)
+_SLOT_PATTERN = re.compile(r"^[ \t]*#[A-Za-z][\w-]*[ \t]*$", flags=re.MULTILINE)
+_CAPTION_PREFIX = re.compile(r"^Таблица\s+[\w.]+\s*[-–—]\s*")
+_ESCAPED = re.compile(r"([\\`*_\[\]<>|@#~^$])")
+_LIST_MARKER = re.compile(r"^(\d*)([-+.)])(?=\s|$)")
+_INLINE_MARKERS = {"em": "*", "i": "*", "strong": "**", "b": "**"}
+
+
+@dataclass(slots=True)
+class _Cell:
+    header: bool
+    rowspan: int = 1
+    colspan: int = 1
+    parts: list[str] = field(default_factory=list)
+    lines: list[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+def convert_collapsible_tables(text: str) -> str:
+    """Заменить все блоки ``::app-collapsible`` в markdown на таблицы Pandoc.
+
+    Блок без HTML-таблицы разворачивается в своё содержимое.
+    """
+
+    if _BLOCK_MARKER not in text:
+        return text
+    return _BLOCK_PATTERN.sub(_convert_block, text)
+
+
+def html_table_to_grid(html: str, caption: str = "") -> str:
+    """Перевести HTML-таблицу в grid table Pandoc с подписью ``caption``.
+
+    Поддерживаются ``rowspan``/``colspan``, заголовок из ``<thead>`` или
+    строк из одних ``<th>``, а в ячейках — ``<br>``, ``<em>``,
+    ``<strong>``, ``<a>`` и ``<img>``.
+    """
+
+    parser = _TableParser()
+    parser.feed(html)
+    parser.close()
+    rows = [row for row in parser.rows if row]
+    if not rows:
+        return ""
+
+    grid = _place_cells(rows)
+    widths = _column_widths(grid)
+    header_rows = _header_row_count(rows, parser.head_rows)
+    table = _draw_grid(grid, widths, header_rows)
+    if caption:
+        table += f"\n\nTable: {_escape(caption)}"
+    return table
+
+
+def _convert_block(match: re.Match[str]) -> str:
+    label = _block_label(match.group("meta") or "")
+    body = _SLOT_PATTERN.sub("", match.group("body"))
+    table = _TABLE_PATTERN.search(body)
+    if table is None:
+        return body.strip("\n")
+    caption = _CAPTION_PREFIX.sub("", label)
+    converted = html_table_to_grid(table.group(0), caption)
+    before = body[: table.start()].strip("\n")
+    after = body[table.end() :].strip("\n")
+    return "\n\n".join(part for part in (before, converted, after) if part)
+
+
+def _block_label(meta: str) -> str:
+    for line in meta.splitlines():
+        key, _, value = line.partition(":")
+        if key.strip() == "label":
+            return value.strip().strip("\"'“”«»").strip()
+    return ""
+
+
+class _TableParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.rows: list[list[_Cell]] = []
+        self.head_rows = 0
+        self._cell: _Cell | None = None
+        self._in_head = False
+        self._href: list[str | None] = []
+        self._opened: list[tuple[str, int]] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        attributes = dict(attrs)
+        if tag == "thead":
+            self._in_head = True
+        elif tag == "tr":
+            self._finish_cell()
+            self.rows.append([])
+            if self._in_head:
+                self.head_rows += 1
+        elif tag in ("td", "th"):
+            self._finish_cell()
+            if not self.rows:
+                self.rows.append([])
+                self.head_rows += int(self._in_head)
+            self._cell = _Cell(
+                header=tag == "th",
+                rowspan=_span(attributes.get("rowspan")),
+                colspan=_span(attributes.get("colspan")),
+            )
+            self.rows[-1].append(self._cell)
+        elif self._cell is None:
+            return
+        elif tag == "br":
+            self._cell.parts.append("\n")
+        elif tag == "img" and attributes.get("src"):
+            alt = _escape(attributes.get("alt") or "")
+            self._cell.parts.append(f"![{alt}]({attributes['src']})")
+        elif tag == "a":
+            self._href.append(attributes.get("href"))
+            self._cell.parts.append("[" if attributes.get("href") else "")
+        elif tag in _INLINE_MARKERS:
+            self._opened.append((tag, len(self._cell.parts)))
+            self._cell.parts.append(_INLINE_MARKERS[tag])
+        elif tag in ("p", "div", "li") and self._cell.text.strip():
+            self._cell.parts.append("\n")
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "thead":
+            self._in_head = False
+        elif tag in ("td", "th", "tr"):
+            self._finish_cell()
+        elif self._cell is None:
+            return
+        elif tag == "a" and self._href:
+            href = self._href.pop()
+            if href:
+                self._cell.parts.append(f"]({href})")
+        elif tag in _INLINE_MARKERS:
+            self._close_inline(tag)
+
+    def handle_data(self, data: str) -> None:
+        if self._cell is not None:
+            self._cell.parts.append(_escape(re.sub(r"\s+", " ", data)))
+
+    def _close_inline(self, tag: str) -> None:
+        assert self._cell is not None
+        for index in range(len(self._opened) - 1, -1, -1):
+            if self._opened[index][0] == tag:
+                start = self._opened.pop(index)[1]
+                break
+        else:
+            return
+        parts = self._cell.parts
+        inner = "".join(parts[start + 1 :])
+        del parts[start:]
+        stripped = inner.strip()
+        if not stripped or "\n" in stripped:
+            parts.append(inner)
+            return
+        # Разметка выделения не может начинаться или кончаться пробелом.
+        lead = inner[: len(inner) - len(inner.lstrip())]
+        trail = inner[len(inner.rstrip()) :]
+        marker = _INLINE_MARKERS[tag]
+        parts.append(f"{lead}{marker}{stripped}{marker}{trail}")
+
+    def _finish_cell(self) -> None:
+        if self._cell is None:
+            return
+        while self._opened:
+            self._close_inline(self._opened[-1][0])
+        lines = [" ".join(line.split()) for line in self._cell.text.split("\n")]
+        while lines and not lines[-1]:
+            lines.pop()
+        lines = [line for line in lines if line] or [""]
+        # Начало ячейки не должно читаться как маркер списка.
+        lines[0] = _LIST_MARKER.sub(r"\1\\\2", lines[0])
+        self._cell.lines = lines
+        self._cell = None
+
+
+def _span(value: str | None) -> int:
+    try:
+        return max(1, int(value or 1))
+    except ValueError:
+        return 1
+
+
+def _escape(text: str) -> str:
+    return _ESCAPED.sub(r"\\\1", text)
+
+
+def _place_cells(rows: list[list[_Cell]]) -> list[list[_Cell]]:
+    """Разложить ячейки по сетке строк и столбцов с учётом объединений."""
+
+    grid: list[list[_Cell | None]] = []
+    for row_index, row in enumerate(rows):
+        while len(grid) <= row_index:
+            grid.append([])
+        column = 0
+        for cell in row:
+            while column < len(grid[row_index]) and grid[row_index][column] is not None:
+                column += 1
+            # Объединение по строкам не выходит за конец таблицы.
+            cell.rowspan = min(cell.rowspan, len(rows) - row_index)
+            for r in range(row_index, row_index + cell.rowspan):
+                while len(grid) <= r:
+                    grid.append([])
+                slots = grid[r]
+                slots.extend([None] * (column + cell.colspan - len(slots)))
+                for c in range(column, column + cell.colspan):
+                    slots[c] = cell
+            column += cell.colspan
+
+    columns = max(len(slots) for slots in grid)
+    placed: list[list[_Cell]] = []
+    for slots in grid:
+        slots.extend([None] * (columns - len(slots)))
+        placed.append(
+            [
+                slot if slot is not None else _Cell(header=False, lines=[""])
+                for slot in slots
+            ]
+        )
+    return placed
+
+
+def _column_widths(grid: list[list[_Cell]]) -> list[int]:
+    """Ширины столбцов в символах, в сумме не меньше :data:`TABLE_WIDTH`.
+
+    Каждый столбец получает не меньше самого длинного слова своих ячеек;
+    оставшееся место делится пропорционально самой длинной строке
+    столбца, а если оно есть у всех, столбцы растягиваются до полной
+    ширины в той же пропорции.
+    """
+
+    columns = len(grid[0])
+    minimum = [MIN_COLUMN_WIDTH] * columns
+    maximum = [MIN_COLUMN_WIDTH] * columns
+    for row in grid:
+        for index, cell in enumerate(row):
+            if cell.colspan != 1:
+                continue
+            for line in cell.lines:
+                minimum[index] = max(minimum[index], _longest_word(line) + 1)
+                maximum[index] = max(maximum[index], len(line) + 1)
+
+    available = TABLE_WIDTH - 3 * columns - 1
+    if sum(minimum) >= available:
+        widths = minimum
+    else:
+        if sum(maximum) <= available:
+            weights, base = maximum, [0] * columns
+            spare = available
+        else:
+            weights = [high - low for low, high in zip(minimum, maximum)]
+            base = minimum
+            spare = available - sum(minimum)
+        total = sum(weights) or 1
+        widths = [low + spare * weight // total for low, weight in zip(base, weights)]
+        widths[-1] += available - sum(widths)
+
+    # Ячейка на несколько столбцов расширяет последний из них, если её
+    # самое длинное слово не помещается.
+    for row in grid:
+        for index, cell in enumerate(row):
+            if cell.colspan == 1 or row[index - 1] is cell and index:
+                continue
+            spanned = range(index, min(index + cell.colspan, columns))
+            room = sum(widths[column] for column in spanned) + 3 * (len(spanned) - 1)
+            need = max(_longest_word(line) for line in cell.lines) + 1
+            widths[spanned[-1]] += max(0, need - room)
+    return widths
+
+
+def _longest_word(line: str) -> int:
+    return max((len(word) for word in line.split()), default=0)
+
+
+def _header_row_count(rows: list[list[_Cell]], head_rows: int) -> int:
+    if head_rows:
+        return min(head_rows, len(rows) - 1) if len(rows) > 1 else 0
+    count = 0
+    for row in rows[:-1]:
+        if not all(cell.header for cell in row):
+            break
+        count += 1
+    return count
+
+
+def _draw_grid(grid: list[list[_Cell]], widths: list[int], header_rows: int) -> str:
+    cells: dict[int, tuple[_Cell, int, int, int, int]] = {}
+    for r, row in enumerate(grid):
+        for c, cell in enumerate(row):
+            first = cells.get(id(cell))
+            if first is None:
+                cells[id(cell)] = (cell, r, c, r, c)
+            else:
+                cells[id(cell)] = (cell, first[1], first[2], r, c)
+
+    x = [0]
+    for width in widths:
+        x.append(x[-1] + width + 3)
+
+    wrapped: dict[int, list[str]] = {}
+    for key, (cell, _, c0, _, c1) in cells.items():
+        wrapped[key] = _wrap(cell.lines, x[c1 + 1] - x[c0] - 3)
+
+    # Высота строки — по ячейкам без объединения; объединённой ячейке
+    # достаются и разделители между её строками, а нехватку добирает
+    # последняя из них.
+    heights = [1] * len(grid)
+    for key, (_, r0, _, r1, _) in cells.items():
+        if r0 == r1:
+            heights[r0] = max(heights[r0], len(wrapped[key]))
+    for key, (_, r0, _, r1, _) in sorted(cells.items(), key=lambda item: item[1][3]):
+        if r0 != r1:
+            room = sum(heights[r0 : r1 + 1]) + (r1 - r0)
+            heights[r1] += max(0, len(wrapped[key]) - room)
+
+    y = [0]
+    for height in heights:
+        y.append(y[-1] + height + 1)
+
+    canvas = [[" "] * (x[-1] + 1) for _ in range(y[-1] + 1)]
+    for cell, r0, c0, r1, c1 in cells.values():
+        top, bottom, left, right = y[r0], y[r1 + 1], x[c0], x[c1 + 1]
+        for line, rule in ((top, r0), (bottom, r1 + 1)):
+            dash = "=" if header_rows and rule == header_rows else "-"
+            for column in range(left + 1, right):
+                canvas[line][column] = dash
+        for line in range(top + 1, bottom):
+            canvas[line][left] = "|"
+            canvas[line][right] = "|"
+    for cell, r0, c0, r1, c1 in cells.values():
+        for line in (y[r0], y[r1 + 1]):
+            canvas[line][x[c0]] = "+"
+            canvas[line][x[c1 + 1]] = "+"
+        for offset, text in enumerate(wrapped[id(cell)]):
+            start = x[c0] + 2
+            canvas[y[r0] + 1 + offset][start : start + len(text)] = text
+    return "\n".join("".join(line).rstrip() for line in canvas)
+
+
+def _wrap(lines: list[str], width: int) -> list[str]:
+    """Перенести строки ячейки по словам; ``<br>`` становятся ``\\`` в конце строки."""
+
+    wrapped: list[str] = []
+    for index, line in enumerate(lines):
+        hard_break = index < len(lines) - 1
+        chunk = textwrap.wrap(
+            line,
+            width - int(hard_break),
+            break_long_words=False,
+            break_on_hyphens=False,
+        ) or [""]
+        if hard_break:
+            chunk[-1] += "\\"
+        wrapped.extend(chunk)
+    return wrapped
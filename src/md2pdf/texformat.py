@@ -0,0 +1,217 @@
+"""Предкомпилированный формат xelatex для статической части преамбулы.
+
+Шаблон отмечает конец статической части строкой
+``\\csname endofdump\\endcsname``. Всё, что выше неё (класс документа и
+загрузка пакетов), один раз прогоняется через ``xelatex -ini`` с
+``mylatexformat.ltx`` и сохраняется в ``.fmt``. При рендере xelatex
+стартует с этим форматом и пропускает преамбулу до маркера, не разбирая
+пакеты заново на каждом проходе.
+
+Формат зависит от шаблона, стиля (класс и размер шрифта документа берутся
+из него) и версий Pandoc и xelatex, поэтому хранится под ключом из их
+хэша. Если собрать формат не удалось, рядом кладётся ``.failed`` с
+причиной, и рендер идёт без формата, пока ключ не сменится.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+from pathlib import Path
+
+FORMAT_VERSION = 1
+FORMAT_DIRNAME = "md2pdf-formats"
+DUMP_MARKER = "\\csname endofdump\\endcsname"
+
+# Сообщения xelatex о несовместимом или повреждённом формате.
+_FORMAT_ERRORS = ("format file", "endofdump")
+
+
+def ensure_format(
+    template: Path,
+    style: Path,
+    format_dir: Path,
+    *,
+    env: Mapping[str, str] | None = None,
+) -> Path | None:
+    """Вернуть путь до формата для ``template`` и ``style``, собрав его при нужде.
+
+    Возвращает ``None``, если Pandoc или xelatex не установлены, в шаблоне
+    нет маркера или сборка формата уже завершалась ошибкой.
+    """
+
+    if shutil.which("pandoc") is None or shutil.which("xelatex") is None:
+        return None
+    try:
+        if DUMP_MARKER not in template.read_text(encoding="utf-8"):
+            return None
+        target = format_path(format_dir, format_key(template, style))
+    except OSError:
+        return None
+
+    if target.exists():
+        return target
+    failed = target.with_suffix(".failed")
+    if failed.exists():
+        return None
+
+    try:
+        build_format(template, style, target, env=env)
+    except (RuntimeError, OSError) as exc:
+        discard_format(target, str(exc))
+        return None
+    return target
+
+
+def format_key(template: Path, style: Path) -> str:
+    """Ключ формата: хэш шаблона, стиля и версий Pandoc и xelatex."""
+
+    digest = hashlib.sha256(f"v{FORMAT_VERSION}".encode())
+    for path in (template, style):
+        digest.update(b"\0")
+        digest.update(path.read_bytes())
+    for version in tool_versions():
+        digest.update(b"\0")
+        digest.update(version.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def format_path(format_dir: Path, key: str) -> Path:
+    return format_dir / f"md2pdf-{key[:16]}.fmt"
+
+
+def build_format(
+    template: Path,
+    style: Path,
+    target: Path,
+    *,
+    env: Mapping[str, str] | None = None,
+) -> None:
+    """Собрать формат из преамбулы ``template`` со стилем ``style``.
+
+    Преамбула получается рендером пустого документа через Pandoc, затем
+    ``xelatex -ini`` сохраняет её часть до маркера в ``target``. Формат
+    собирается во временном каталоге рядом с ``target`` и переносится
+    атомарно, поэтому параллельные рендеры не увидят недописанный файл.
+
+    Raises:
+        RuntimeError: Если Pandoc или xelatex завершились с ошибкой.
+    """
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    process_env = dict(env) if env is not None else None
+    with tempfile.TemporaryDirectory(prefix=".build-", dir=target.parent) as tmp:
+        workdir = Path(tmp)
+        empty = workdir / "empty.md"
+        empty.write_text("", encoding="utf-8")
+        preamble = workdir / "preamble.tex"
+        _run(
+            [
+                "pandoc",
+                str(empty),
+                "--from",
+                "markdown",
+                "--to",
+                "latex",
+                "--standalone",
+                "--template",
+                str(template),
+                "--metadata-file",
+                str(style),
+                "--output",
+                str(preamble),
+            ],
+            workdir,
+            process_env,
+        )
+        if DUMP_MARKER not in preamble.read_text(encoding="utf-8"):
+            raise RuntimeError(f"Template preamble has no {DUMP_MARKER} marker")
+
+        _run(
+            [
+                "xelatex",
+                "-ini",
+                "-interaction=nonstopmode",
+                "-halt-on-error",
+                f"-jobname={target.stem}",
+                "&xelatex",
+                "mylatexformat.ltx",
+                preamble.name,
+            ],
+            workdir,
+            process_env,
+        )
+        produced = workdir / target.name
+        if not produced.exists():
+            raise RuntimeError(f"xelatex did not produce {target.name}")
+        os.replace(produced, target)
+
+
+def format_command(command: Sequence[str], fmt: Path) -> list[str]:
+    """Добавить в команду Pandoc запуск xelatex с форматом ``fmt``."""
+
+    return [*command, f"--pdf-engine-opt=-fmt={fmt.stem}"]
+
+
+def format_env(env: Mapping[str, str], fmt: Path) -> dict[str, str]:
+    """Добавить каталог ``fmt`` в пути поиска форматов kpathsea."""
+
+    updated = dict(env)
+    # Пустой элемент в конце подставляет стандартные пути TeX.
+    updated["TEXFORMATS"] = f"{fmt.parent}{os.pathsep}{env.get('TEXFORMATS', '')}"
+    return updated
+
+
+def is_format_error(output: str) -> bool:
+    """Похожа ли ошибка рендера на проблему с форматом, а не с документом."""
+
+    lowered = output.lower()
+    return any(marker in lowered for marker in _FORMAT_ERRORS)
+
+
+def discard_format(fmt: Path, reason: str) -> None:
+    """Удалить непригодный формат и запомнить причину в ``.failed``."""
+
+    fmt.unlink(missing_ok=True)
+    failed = fmt.with_suffix(".failed")
+    failed.parent.mkdir(parents=True, exist_ok=True)
+    failed.write_text(reason, encoding="utf-8")
+
+
+@lru_cache(maxsize=1)
+def tool_versions() -> tuple[str, ...]:
+    """Первые строки ``--version`` Pandoc и xelatex (пустые, если их нет)."""
+
+    versions = []
+    for tool in ("pandoc", "xelatex"):
+        try:
+            completed = subprocess.run(
+                [tool, "--version"], capture_output=True, text=True, check=False
+            )
+        except OSError:
+            versions.append("")
+            continue
+        versions.append(completed.stdout.partition("\n")[0])
+    return tuple(versions)
+
+
+def _run(command: list[str], cwd: Path, env: dict[str, str] | None) -> None:
+    completed = subprocess.run(
+        command,
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(
+            f"{command[0]} failed with code {completed.returncode}: "
+            f"{completed.stdout.strip()}\nCommand: {' '.join(command)}"
+        )
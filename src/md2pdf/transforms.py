@@ -0,0 +1,244 @@
+"""Python-преобразования Pandoc JSON AST, выполняемые по секциям.
+
+Lua-фильтры (``filters`` конфигурации) Pandoc применяет ко всему
+документу при каждом рендере. Преобразования отсюда (ключ ``transforms``)
+работают с AST отдельной секции сразу после разбора в
+:func:`md2pdf.astcache.build_ast`: результат кэшируется вместе с AST, а
+неизменённые секции повторно не преобразуются.
+
+Преобразование — функция, принимающая документ Pandoc JSON (словарь с
+``meta`` и ``blocks``) и возвращающая его, возможно изменённым на месте.
+В конфигурации указывается имя встроенного преобразования
+(:data:`BUILTIN_TRANSFORMS`), ``модуль:функция`` или
+``путь/к/файлу.py:функция`` относительно корня проекта. Преобразование
+должно зависеть только от AST своей секции.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib
+import importlib.util
+import inspect
+from collections.abc import Callable, Sequence
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+Transform = Callable[[dict[str, Any]], dict[str, Any]]
+
+PICTOGRAM_MARKER = "{pictogram}"
+PICTOGRAM_CLASS = "pictogram"
+
+
+def mark_pictograms(document: dict[str, Any]) -> dict[str, Any]:
+    """Заменить текст ``{pictogram}`` после картинки классом ``pictogram``.
+
+    ``![..](..){pictogram}`` не является атрибутами Pandoc, поэтому маркер
+    иначе попадает в PDF как текст.
+    """
+
+    _rewrite_lists(document["blocks"], _mark_pictograms)
+    return document
+
+
+def dedupe_sign_captions(document: dict[str, Any]) -> dict[str, Any]:
+    """Убрать абзац, повторяющий подпись стоящего перед ним рисунка.
+
+    Подпись ``::sign-image`` становится подписью рисунка, а в исходниках
+    за блоком часто идёт та же строка обычным текстом.
+    """
+
+    _rewrite_lists(document["blocks"], _dedupe_captions)
+    return document
+
+
+BUILTIN_TRANSFORMS: dict[str, Transform] = {
+    "pictogram": mark_pictograms,
+    "sign-caption": dedupe_sign_captions,
+}
+
+
+def resolve_transform_spec(spec: str, base_dir: Path) -> str:
+    """Проверить запись ``transforms`` и привести путь к файлу к абсолютному.
+
+    Raises:
+        ValueError: Если преобразование не найдено.
+    """
+
+    module, _, name = spec.rpartition(":")
+    if module.endswith(".py"):
+        spec = f"{(base_dir / module).resolve()}:{name}"
+    load_transform(spec)
+    return spec
+
+
+@cache
+def load_transform(spec: str) -> Transform:
+    """Найти преобразование по имени, ``модуль:функция`` или ``файл.py:функция``.
+
+    Raises:
+        ValueError: Если модуль, файл или функция не найдены.
+    """
+
+    if spec in BUILTIN_TRANSFORMS:
+        return BUILTIN_TRANSFORMS[spec]
+    module_name, _, name = spec.rpartition(":")
+    if not module_name or not name:
+        known = ", ".join(sorted(BUILTIN_TRANSFORMS))
+        raise ValueError(
+            f"Unknown transform {spec!r}: expected one of {known} or 'module:function'"
+        )
+    if module_name.endswith(".py"):
+        path = Path(module_name)
+        if not path.is_file():
+            raise ValueError(f"Missing file: {path}")
+        module_spec = importlib.util.spec_from_file_location(
+            f"md2pdf_transform_{path.stem}", path
+        )
+        if module_spec is None or module_spec.loader is None:
+            raise ValueError(f"Cannot load transform module: {path}")
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+    else:
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError as exc:
+            raise ValueError(f"Cannot import transform module {module_name}") from exc
+    transform = getattr(module, name, None)
+    if not callable(transform):
+        raise ValueError(f"Transform {name!r} not found in {module_name}")
+    return transform  # type: ignore[no-any-return]
+
+
+def load_transforms(specs: Sequence[str]) -> tuple[Transform, ...]:
+    """Загрузить преобразования в порядке ``specs``."""
+
+    return tuple(load_transform(spec) for spec in specs)
+
+
+def transforms_key(transforms: Sequence[Transform]) -> str:
+    """Ключ цепочки преобразований для кэшей и отпечатков рендера.
+
+    Зависит от имён функций и содержимого файлов их модулей, так что правка
+    кода преобразования инвалидирует закэшированные AST. Пустая цепочка
+    даёт пустую строку.
+    """
+
+    if not transforms:
+        return ""
+    digest = hashlib.sha256()
+    for transform in transforms:
+        digest.update(f"\0{transform.__module__}:{transform.__qualname__}\0".encode())
+        digest.update(_source_digest(transform))
+    return digest.hexdigest()
+
+
+def apply_transforms(
+    document: dict[str, Any], transforms: Sequence[Transform]
+) -> dict[str, Any]:
+    """Последовательно применить ``transforms`` к документу."""
+
+    for transform in transforms:
+        document = transform(document)
+    return document
+
+
+def stringify(node: Any) -> str:
+    """Текст элементов AST без разметки, как ``pandoc.utils.stringify``."""
+
+    if isinstance(node, list):
+        return "".join(stringify(item) for item in node)
+    if not isinstance(node, dict):
+        return ""
+    kind = node.get("t")
+    if kind == "Str":
+        return str(node["c"])
+    if kind in ("Space", "SoftBreak", "LineBreak"):
+        return " "
+    if kind in ("Code", "Math", "RawInline"):
+        return str(node["c"][1])
+    if kind in ("Image", "Link", "Span", "Quoted", "Cite"):
+        return stringify(node["c"][1])
+    return stringify(node.get("c"))
+
+
+# Код преобразования загружается один раз за процесс, поэтому и хэш его
+# файла считается один раз: иначе правка файла во время watch сменила бы
+# ключ, не сменив выполняемый код.
+@cache
+def _source_digest(transform: Transform) -> bytes:
+    try:
+        source = Path(inspect.getfile(transform)).read_bytes()
+    except (OSError, TypeError):
+        source = b""
+    return hashlib.sha256(source).digest()
+
+
+def _rewrite_lists(node: Any, rewrite: Callable[[list[Any]], list[Any]]) -> Any:
+    """Применить ``rewrite`` ко всем спискам элементов AST снизу вверх."""
+
+    if isinstance(node, list):
+        for index, item in enumerate(node):
+            node[index] = _rewrite_lists(item, rewrite)
+        if any(isinstance(item, dict) and "t" in item for item in node):
+            node[:] = rewrite(node)
+        return node
+    if isinstance(node, dict) and "c" in node:
+        node["c"] = _rewrite_lists(node["c"], rewrite)
+    return node
+
+
+def _mark_pictograms(inlines: list[Any]) -> list[Any]:
+    result: list[Any] = []
+    for item in inlines:
+        previous = result[-1] if result else None
+        if (
+            isinstance(previous, dict)
+            and previous.get("t") == "Image"
+            and isinstance(item, dict)
+            and item.get("t") == "Str"
+            and item["c"].startswith(PICTOGRAM_MARKER)
+        ):
+            classes = previous["c"][0][1]
+            if PICTOGRAM_CLASS not in classes:
+                classes.append(PICTOGRAM_CLASS)
+            rest = item["c"][len(PICTOGRAM_MARKER) :]
+            if rest:
+                result.append({"t": "Str", "c": rest})
+            continue
+        result.append(item)
+    return result
+
+
+def _dedupe_captions(blocks: list[Any]) -> list[Any]:
+    result: list[Any] = []
+    caption = ""
+    for block in blocks:
+        if not isinstance(block, dict):
+            result.append(block)
+            caption = ""
+            continue
+        if caption and block.get("t") == "Para" and stringify(block).strip() == caption:
+            caption = ""
+            continue
+        caption = _figure_caption(block)
+        result.append(block)
+    return result
+
+
+def _figure_caption(block: dict[str, Any]) -> str:
+    if block.get("t") == "Figure":
+        return stringify(block["c"][1][1]).strip()
+    # До Pandoc 3 рисунок — абзац из одной картинки с заголовком "fig:".
+    content = block.get("c")
+    if (
+        block.get("t") == "Para"
+        and isinstance(content, list)
+        and len(content) == 1
+        and isinstance(content[0], dict)
+        and content[0].get("t") == "Image"
+        and content[0]["c"][2][1].startswith("fig:")
+    ):
+        return stringify(content[0]).strip()
+    return ""
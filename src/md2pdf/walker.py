@@ -2,15 +2,130 @@
 
 from __future__ import annotations
 
+import json
+import os
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List, Sequence, Tuple
+from typing import Any, Iterable, List, MutableMapping, Sequence, Tuple
 
 from .reporting import StructureWarning
 
 INDEX_NAMES = {"0.index.md", "index.md"}
+_INDEX_PRIORITY = sorted(
+    INDEX_NAMES, key=lambda name: 0 if name.startswith("0.") else 1
+)
+MANIFEST_VERSION = 1
+# A directory changed within this window of being listed may have changed
+# again without a visible mtime change on coarse-grained filesystems.
+_RACY_WINDOW_NS = 2_000_000_000
 
+DirectoryStamp = Tuple[int, int, int]
 
-def walk(md_root: Path) -> Tuple[List[Path], List[StructureWarning]]:
+
+@dataclass(frozen=True, slots=True)
+class DirectoryListing:
+    """Traversal result for a single directory (without its subdirectories).
+
+    ``files`` are in bundle order (index first), ``subdirs`` in traversal
+    order; ``warnings`` cover the directory itself and its direct entries.
+    """
+
+    files: Tuple[Path, ...]
+    subdirs: Tuple[Path, ...]
+    warnings: Tuple[StructureWarning, ...]
+
+
+class WalkManifest:
+    """Directory listings persisted between runs and validated by stamps.
+
+    Every listed directory is stored with its device, inode and mtime. On
+    the next run a directory whose stamp is unchanged is not listed again:
+    adding, removing or renaming an entry updates the mtime of its parent
+    directory, and edits of files never change the walk result. Directories
+    modified shortly before they were listed are always re-listed, since a
+    later change might not move a coarse-grained mtime.
+
+    ``reused`` and ``relisted`` count directories of the current run.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.reused = 0
+        self.relisted = 0
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._used: set[str] = set()
+        self._dirty = False
+        self._load()
+
+    def listing(self, directory: Path) -> DirectoryListing:
+        """Return the listing of ``directory``, re-listing it if it changed."""
+
+        key = str(directory)
+        self._used.add(key)
+        stamp = _stamp(directory)
+        entry = self._entries.get(key)
+        if isinstance(entry, dict) and entry.get("stamp") == list(stamp):
+            listing = _decode_listing(directory, entry)
+            if listing is not None:
+                self.reused += 1
+                return listing
+
+        listed_ns = time.time_ns()
+        listing = _list_directory(directory)
+        self.relisted += 1
+        self._dirty = True
+        if listed_ns - stamp[2] < _RACY_WINDOW_NS:
+            self._entries.pop(key, None)
+        else:
+            self._entries[key] = _encode_listing(directory, stamp, listing)
+        return listing
+
+    def save(self) -> None:
+        """Atomically write the manifest if it changed.
+
+        Directories not visited in the current run are dropped.
+        """
+
+        stale = self._entries.keys() - self._used
+        if not self._dirty and not stale:
+            return
+        for key in stale:
+            del self._entries[key]
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"version": MANIFEST_VERSION, "directories": self._entries}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def _load(self) -> None:
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+
+        if not isinstance(payload, dict) or payload.get("version") != MANIFEST_VERSION:
+            return
+        directories = payload.get("directories")
+        if isinstance(directories, dict):
+            self._entries = directories
+
+
+def manifest_path(cache_dir: Path, md_root: Path) -> Path:
+    """Location of the walk manifest of ``md_root`` inside ``cache_dir``."""
+
+    return cache_dir / f"{md_root.name}.walk.json"
+
+
+def walk(
+    md_root: Path,
+    *,
+    iterative: bool = False,
+    listings: MutableMapping[Path, DirectoryListing] | None = None,
+    manifest: WalkManifest | None = None,
+) -> Tuple[List[Path], List[StructureWarning]]:
     """Return ordered markdown files and collected structure warnings.
 
     The traversal follows the documented hierarchy rules:
@@ -20,6 +135,20 @@ def walk(md_root: Path) -> Tuple[List[Path], List[StructureWarning]]:
 
     Warnings are produced for missing index files, skipped non-md files,
     and files without numeric prefixes (кроме index).
+
+    Directories are listed with ``os.scandir`` so entry types come from the
+    directory listing instead of a ``stat`` per entry. With
+    ``iterative=True`` an explicit stack replaces recursion, which keeps very
+    deep trees clear of the interpreter recursion limit; the order and
+    warnings are identical in both modes.
+
+    ``listings`` memoizes per-directory results between calls: directories
+    present in the mapping are not listed again, new ones are added to it.
+    Callers drop the entries of directories whose contents changed.
+
+    ``manifest`` supplies listings of directories that did not change since
+    a previous run (see :class:`WalkManifest`); only changed directories
+    are listed. The caller saves the manifest after the walk.
     """
 
     if not md_root.exists():
@@ -30,71 +159,146 @@ def walk(md_root: Path) -> Tuple[List[Path], List[StructureWarning]]:
     ordered: List[Path] = []
     warnings: List[StructureWarning] = []
 
-    def recurse(directory: Path) -> None:
-        files, subdirs, skipped = _partition_entries(directory)
-        for skipped_entry in skipped:
-            warnings.append(
-                StructureWarning(
-                    code="SKIPPED_NON_MD",
-                    path=skipped_entry,
-                    message="Пропущен не-markdown файл",
-                )
+    def visit(directory: Path) -> Tuple[Path, ...]:
+        listing = None if listings is None else listings.get(directory)
+        if listing is None:
+            if manifest is None:
+                listing = _list_directory(directory)
+            else:
+                listing = manifest.listing(directory)
+            if listings is not None:
+                listings[directory] = listing
+        ordered.extend(listing.files)
+        warnings.extend(listing.warnings)
+        return listing.subdirs
+
+    if iterative:
+        stack = [md_root]
+        while stack:
+            stack.extend(reversed(visit(stack.pop())))
+    else:
+
+        def recurse(directory: Path) -> None:
+            for subdir in visit(directory):
+                recurse(subdir)
+
+        recurse(md_root)
+
+    return ordered, warnings
+
+
+def _list_directory(directory: Path) -> DirectoryListing:
+    files, subdirs, skipped = _partition_entries(directory)
+    ordered: List[Path] = []
+    warnings: List[StructureWarning] = []
+
+    for skipped_entry in skipped:
+        warnings.append(
+            StructureWarning(
+                code="SKIPPED_NON_MD",
+                path=skipped_entry,
+                message="Пропущен не-markdown файл",
+            )
+        )
+
+    index = _select_index(files)
+    if index is None:
+        warnings.append(
+            StructureWarning(
+                code="MISSING_INDEX",
+                path=directory,
+                message="Отсутствует 0.index.md или index.md",
             )
+        )
+    else:
+        ordered.append(index)
 
-        index = _select_index(files)
-        if index is None:
+    for file in _sort_md(files, index):
+        ordered.append(file)
+        if _numeric_prefix(file.name) is None:
             warnings.append(
                 StructureWarning(
-                    code="MISSING_INDEX",
-                    path=directory,
-                    message="Отсутствует 0.index.md или index.md",
+                    code="NON_NUMERIC_FILE",
+                    path=file,
+                    message="Файл без числового префикса, порядок по алфавиту",
                 )
             )
-        else:
-            ordered.append(index)
-
-        for file in _sort_md(files, index):
-            ordered.append(file)
-            if _numeric_prefix(file.name) is None:
-                warnings.append(
-                    StructureWarning(
-                        code="NON_NUMERIC_FILE",
-                        path=file,
-                        message="Файл без числового префикса, порядок по алфавиту",
-                    )
-                )
 
-        for subdir in _sort_dirs(subdirs):
-            recurse(subdir)
+    return DirectoryListing(
+        files=tuple(ordered),
+        subdirs=tuple(_sort_dirs(subdirs)),
+        warnings=tuple(warnings),
+    )
 
-    recurse(md_root)
-    return ordered, warnings
+
+def _stamp(directory: Path) -> DirectoryStamp:
+    stat = directory.stat()
+    return (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+
+
+def _encode_listing(
+    directory: Path, stamp: DirectoryStamp, listing: DirectoryListing
+) -> dict[str, Any]:
+    return {
+        "stamp": list(stamp),
+        "files": [file.name for file in listing.files],
+        "subdirs": [subdir.name for subdir in listing.subdirs],
+        "warnings": [
+            [warning.code, os.path.relpath(warning.path, directory), warning.message]
+            for warning in listing.warnings
+        ],
+    }
+
+
+def _decode_listing(directory: Path, entry: dict[str, Any]) -> DirectoryListing | None:
+    try:
+        return DirectoryListing(
+            files=tuple(directory / name for name in entry["files"]),
+            subdirs=tuple(directory / name for name in entry["subdirs"]),
+            warnings=tuple(
+                StructureWarning(
+                    code=code,
+                    path=directory if relative == "." else directory / relative,
+                    message=message,
+                )
+                for code, relative, message in entry["warnings"]
+            ),
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
 
 
 def _partition_entries(directory: Path) -> Tuple[List[Path], List[Path], List[Path]]:
     files: List[Path] = []
     dirs: List[Path] = []
     skipped: List[Path] = []
-    for entry in directory.iterdir():
-        if entry.is_dir():
-            if entry.name == "doc":
-                skipped.append(entry)
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            path = directory / entry.name
+            if _is_dir(entry):
+                if entry.name == "doc":
+                    skipped.append(path)
+                    continue
+                dirs.append(path)
                 continue
-            dirs.append(entry)
-            continue
-        if entry.suffix.lower() == ".md":
-            files.append(entry)
-        else:
-            skipped.append(entry)
+            if os.path.splitext(entry.name)[1].lower() == ".md":
+                files.append(path)
+            else:
+                skipped.append(path)
     return files, dirs, skipped
 
 
+def _is_dir(entry: os.DirEntry[str]) -> bool:
+    # Same semantics as Path.is_dir(): follows symlinks, errors mean "no".
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+
 def _select_index(files: Sequence[Path]) -> Path | None:
-    prioritized = sorted(
-        INDEX_NAMES, key=lambda name: 0 if name.startswith("0.") else 1
-    )
     by_name = {file.name: file for file in files}
-    for name in prioritized:
+    for name in _INDEX_PRIORITY:
         if name in by_name:
             return by_name[name]
     return None
@@ -105,18 +309,15 @@ def _numeric_prefix(name: str) -> int | None:
     return int(stem) if stem.isdigit() else None
 
 
-def _sort_md(files: Sequence[Path], index: Path | None) -> List[Path]:
-    def sort_key(path: Path) -> tuple[int, str]:
-        num = _numeric_prefix(path.name)
-        return (0, f"{num:09d}") if num is not None else (1, path.name)
+def _sort_key(path: Path) -> tuple[int, int, str]:
+    num = _numeric_prefix(path.name)
+    return (0, num, "") if num is not None else (1, 0, path.name)
 
+
+def _sort_md(files: Sequence[Path], index: Path | None) -> List[Path]:
     filtered = [file for file in files if file != index]
-    return sorted(filtered, key=sort_key)
+    return sorted(filtered, key=_sort_key)
 
 
 def _sort_dirs(dirs: Iterable[Path]) -> List[Path]:
-    def sort_key(path: Path) -> tuple[int, str]:
-        num = _numeric_prefix(path.name)
-        return (0, f"{num:09d}") if num is not None else (1, path.name)
-
-    return sorted(dirs, key=sort_key)
+    return sorted(dirs, key=_sort_key)
@@ -0,0 +1,308 @@
+"""Watch mode: rebuild a document when its inputs change."""
+
+from __future__ import annotations
+
+import os
+import time
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+
+from . import pipeline
+from .artifacts import BlobStore
+from .metrics import Metrics
+from .walker import DirectoryListing, WalkManifest, manifest_path, walk
+
+Snapshot = dict[Path, tuple[int, int]]
+
+# Directories are recorded with a constant stamp: only their appearance or
+# removal matters, changes of their entries are seen through the entries.
+_DIRECTORY_STAMP = (0, -1)
+
+
+@dataclass(frozen=True, slots=True)
+class ChangeSet:
+    """Изменения между двумя снимками файлов."""
+
+    modified: frozenset[Path] = frozenset()
+    added: frozenset[Path] = frozenset()
+    removed: frozenset[Path] = frozenset()
+
+    def __bool__(self) -> bool:
+        return bool(self.modified or self.added or self.removed)
+
+    def merge(self, other: ChangeSet) -> ChangeSet:
+        return ChangeSet(
+            modified=self.modified | other.modified,
+            added=self.added | other.added,
+            removed=self.removed | other.removed,
+        )
+
+
+def take_snapshot(roots: Iterable[Path], files: Iterable[Path] = ()) -> Snapshot:
+    """Снять ``(mtime_ns, size)`` всех файлов и каталогов под ``roots``.
+
+    Отдельные ``files`` (стиль, шаблон, фильтры) снимаются как есть;
+    отсутствующие пути в снимок не попадают.
+    """
+
+    snapshot: Snapshot = {}
+    for root in roots:
+        if root.is_dir():
+            _scan(root, snapshot)
+    for path in files:
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+def diff_snapshots(old: Mapping[Path, tuple[int, int]], new: Snapshot) -> ChangeSet:
+    """Сравнить два снимка."""
+
+    return ChangeSet(
+        modified=frozenset(
+            path for path, stamp in new.items() if path in old and old[path] != stamp
+        ),
+        added=frozenset(new.keys() - old.keys()),
+        removed=frozenset(old.keys() - new.keys()),
+    )
+
+
+class DocumentWatcher:
+    """Пересобирает документ при изменении его входов.
+
+    Отслеживаются ``md_root``, ``images_root``, стиль, шаблон и фильтры
+    (опросом раз в ``interval`` секунд). Серия сохранений схлопывается в
+    одну пересборку: она стартует, когда изменений не было ``debounce``
+    секунд.
+
+    Пересборка переиспользует всё, что не менялось: заново листаются
+    только каталоги, в которых появились или пропали записи (см.
+    ``listings`` у :func:`md2pdf.walker.walk`), кэш секций рендерит
+    только изменённые файлы, а Pandoc запускается лишь при изменении
+    отпечатка входов. С ``server`` PDF рендерит сервер рендера
+    (см. :mod:`md2pdf.server`), с ``keep_tex`` xelatex запускается в
+    постоянном каталоге сборки и переиспользует ``.aux``/``.toc``,
+    ``artifacts`` — общий кэш готовых PDF (см. :mod:`md2pdf.artifacts`).
+    С ``fail_on_missing_images`` сборка со ссылкой на отсутствующую
+    картинку падает до запуска Pandoc. С ``ast_cache`` Pandoc заново
+    разбирает только изменённые секции (см. :mod:`md2pdf.astcache`).
+    """
+
+    def __init__(
+        self,
+        params: pipeline.PipelineParams,
+        *,
+        use_cache: bool = True,
+        verbose: bool = False,
+        log_file: Path | None = None,
+        metrics_file: Path | None = None,
+        interval: float = 0.5,
+        debounce: float = 0.3,
+        report: Callable[[str], None] = lambda message: None,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+        server: str | None = None,
+        keep_tex: bool = False,
+        artifacts: BlobStore | None = None,
+        fail_on_missing_images: bool = False,
+        ast_cache: bool = False,
+    ) -> None:
+        self.params = params
+        self.use_cache = use_cache
+        self.verbose = verbose
+        self.log_file = log_file
+        self.metrics_file = metrics_file
+        self.interval = interval
+        self.debounce = debounce
+        self.report = report
+        self._sleep = sleep
+        self._clock = clock
+        self.server = server
+        self.keep_tex = keep_tex
+        self.artifacts = artifacts
+        self.fail_on_missing_images = fail_on_missing_images
+        self.ast_cache = ast_cache
+        self._listings: dict[Path, DirectoryListing] = {}
+        self._snapshot = self._take_snapshot()
+
+    def poll(self) -> ChangeSet:
+        """Сравнить файлы с прошлым снимком и запомнить новый."""
+
+        snapshot = self._take_snapshot()
+        changes = diff_snapshots(self._snapshot, snapshot)
+        self._snapshot = snapshot
+        return changes
+
+    def wait_for_changes(self) -> ChangeSet:
+        """Дождаться изменений и паузы ``debounce`` после последнего из них."""
+
+        pending = ChangeSet()
+        last_change = self._clock()
+        while True:
+            self._sleep(self.interval)
+            changes = self.poll()
+            if changes:
+                pending = pending.merge(changes)
+                last_change = self._clock()
+            elif pending and self._clock() - last_change >= self.debounce:
+                return pending
+
+    def build(
+        self, changes: ChangeSet | None = None, *, force: bool = False
+    ) -> tuple[pipeline.PipelineResult, bool]:
+        """Пересобрать бандл и PDF с учётом ``changes``.
+
+        Без ``changes`` выполняется полная сборка. Возвращает результат
+        пайплайна и признак того, был ли запущен Pandoc.
+        """
+
+        params = self.params
+        if changes is None:
+            self._listings.clear()
+        else:
+            self._invalidate(changes)
+
+        # Later rebuilds keep listings in memory; the manifest only spares
+        # the full walk of the first build.
+        manifest = None
+        if changes is None and self.use_cache and params.cache_dir is not None:
+            manifest = WalkManifest(manifest_path(params.cache_dir, params.md_root))
+
+        metrics = Metrics()
+        with metrics.stage("walk"):
+            order, warnings = walk(
+                params.md_root, listings=self._listings, manifest=manifest
+            )
+            if manifest is not None:
+                manifest.save()
+
+        with metrics.stage("bundle"):
+            bundle = pipeline.assemble_bundle(
+                order,
+                params.bundle_path,
+                metadata=params.metadata,
+                images_root=params.images_root,
+                cache_dir=params.cache_dir if self.use_cache else None,
+                lazy_content=True,
+                metrics=metrics,
+                image_prep=params.image_prep,
+                fail_on_missing_images=self.fail_on_missing_images,
+            )
+        with metrics.stage("render"):
+            output_pdf, rendered = pipeline.render_pdf_incremental(
+                bundle.path,
+                style=params.style,
+                template=params.template,
+                output=params.output_pdf,
+                filters=params.filters,
+                verbose=self.verbose,
+                log_file=self.log_file,
+                force=force,
+                server=self.server,
+                build_dir=(pipeline.latex_build_dir(params) if self.keep_tex else None),
+                artifacts=self.artifacts,
+                metrics=metrics,
+                ast_cache=pipeline.section_ast_cache(params, enabled=self.ast_cache),
+                section_lines=bundle.section_lines,
+            )
+
+        if self.metrics_file is not None:
+            metrics.write_jsonl(
+                self.metrics_file,
+                {
+                    "document": str(params.md_root),
+                    "output": str(output_pdf),
+                    "rendered": rendered,
+                    "watch": True,
+                },
+            )
+        result = pipeline.aggregate_result(
+            bundle.path, output_pdf, warnings, bundle.warnings
+        )
+        return result, rendered
+
+    def run(
+        self,
+        *,
+        force: bool = False,
+        max_builds: int | None = None,
+        on_result: Callable[[pipeline.PipelineResult], None] = lambda result: None,
+        on_error: Callable[[Exception], None] = lambda error: None,
+    ) -> None:
+        """Собрать документ и пересобирать его при каждом изменении.
+
+        Ошибки сборки (``ValueError``/``RuntimeError``/``OSError``, например
+        файл удалён посреди обхода) передаются в ``on_error`` и не
+        останавливают наблюдение; следующая сборка после ошибки полная.
+        ``max_builds`` ограничивает число сборок (для тестов).
+        """
+
+        changes: ChangeSet | None = None
+        builds = 0
+        while True:
+            if changes is not None:
+                self.report(f"Changes detected: {_describe(changes)}")
+            try:
+                result, rendered = self.build(changes, force=force and builds == 0)
+            except (ValueError, RuntimeError, OSError) as exc:
+                self._listings.clear()
+                on_error(exc)
+            else:
+                if rendered:
+                    self.report(f"Rendered {result.output_pdf}")
+                else:
+                    self.report(f"PDF is up to date: {result.output_pdf}")
+                on_result(result)
+            builds += 1
+            if max_builds is not None and builds >= max_builds:
+                return
+            self.report("Waiting for changes")
+            changes = self.wait_for_changes()
+
+    def _take_snapshot(self) -> Snapshot:
+        params = self.params
+        return take_snapshot(
+            (params.md_root, params.images_root),
+            (params.style, params.template, *params.filters),
+        )
+
+    def _invalidate(self, changes: ChangeSet) -> None:
+        md_root = self.params.md_root
+        for path in changes.added | changes.removed:
+            if path != md_root and md_root not in path.parents:
+                continue
+            self._listings.pop(path.parent, None)
+            if path in changes.removed:
+                for directory in list(self._listings):
+                    if directory == path or path in directory.parents:
+                        del self._listings[directory]
+
+
+def _scan(directory: Path, snapshot: Snapshot) -> None:
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in entries:
+        path = directory / entry.name
+        try:
+            if entry.is_dir():
+                snapshot[path] = _DIRECTORY_STAMP
+                _scan(path, snapshot)
+                continue
+            stat = entry.stat()
+        except OSError:
+            continue
+        snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+
+
+def _describe(changes: ChangeSet) -> str:
+    paths = sorted(changes.modified | changes.added | changes.removed)
+    shown = ", ".join(str(path) for path in paths[:3])
+    if len(paths) > 3:
+        shown += f" and {len(paths) - 3} more"
+    return shown
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+
+from md2pdf.artifacts import DirectoryStore, artifact_key
+
+
+def _checkout(root: Path, image_bytes: bytes = b"png-v1") -> tuple[Path, Path, Path]:
+    image = root / "images" / "diagram.png"
+    image.parent.mkdir(parents=True)
+    image.write_bytes(image_bytes)
+    bundle = root / "bundle.md"
+    bundle.write_text(f"# Title\n\n![Диаграмма]({image})\n", encoding="utf-8")
+    style = root / "style.yaml"
+    style.write_text("fonts: {}", encoding="utf-8")
+    template = root / "gost.tex"
+    template.write_text("% template", encoding="utf-8")
+    return bundle, style, template
+
+
+def test_artifact_key_ignores_checkout_location(tmp_path: Path) -> None:
+    first = artifact_key(*_checkout(tmp_path / "agent-1"))
+    second = artifact_key(*_checkout(tmp_path / "agent-2"))
+
+    assert first == second
+
+
+def test_artifact_key_tracks_image_bytes_and_toc(tmp_path: Path) -> None:
+    inputs = _checkout(tmp_path / "a")
+    base = artifact_key(*inputs)
+
+    assert artifact_key(*inputs, toc=False) != base
+    assert artifact_key(*_checkout(tmp_path / "b", b"png-v2")) != base
+
+
+def test_directory_store_round_trip_counts_hits(tmp_path: Path) -> None:
+    store = DirectoryStore(tmp_path / "store")
+    source = tmp_path / "report.pdf"
+    source.write_bytes(b"%PDF-1.4")
+    destination = tmp_path / "other" / "report.pdf"
+
+    assert store.get("ab" * 32, destination) is False
+    store.put("ab" * 32, source)
+    assert store.get("ab" * 32, destination) is True
+
+    assert destination.read_bytes() == b"%PDF-1.4"
+    assert (store.hits, store.misses) == (1, 1)
+    assert [path.name for path in (tmp_path / "store").rglob("*.tmp")] == []
+
+
+def test_directory_store_evicts_least_recently_used(tmp_path: Path) -> None:
+    root = tmp_path / "store"
+    store = DirectoryStore(root, max_bytes=25)
+    source = tmp_path / "blob"
+    source.write_bytes(b"x" * 10)
+    store.put("aa" * 32, source)
+    store.put("bb" * 32, source)
+    os.utime(root / "aa" / ("aa" * 32), (1000, 1000))
+    os.utime(root / "bb" / ("bb" * 32), (2000, 2000))
+
+    assert store.get("aa" * 32, tmp_path / "fetched")
+    store.put("cc" * 32, source)
+
+    assert sorted(path.name[:2] for path in root.glob("??/*")) == ["aa", "cc"]
+    assert store.evictions == 1
+
+
+def test_directory_store_rejects_non_positive_size(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="max_bytes"):
+        DirectoryStore(tmp_path, max_bytes=0)
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from md2pdf import texformat
+from md2pdf.astcache import (
+    SectionAstCache,
+    build_ast,
+    merge_documents,
+    split_sections,
+)
+from md2pdf.pipeline import assemble_bundle
+from md2pdf.transforms import mark_pictograms
+
+FAKE_PANDOC = """#!/usr/bin/env python3
+import json, os, re, sys
+
+if sys.argv[1:] == ["--version"]:
+    print("pandoc 3.1")
+    sys.exit(0)
+text = sys.stdin.read()
+with open(os.environ["TOOL_LOG"], "a", encoding="utf-8") as log:
+    log.write(json.dumps(text) + "\\n")
+if "BROKEN" in text:
+    print("parse error", file=sys.stderr)
+    sys.exit(64)
+meta, blocks = {}, []
+for line in text.splitlines():
+    heading = re.match(r"(#+) (.*)", line)
+    if heading:
+        ident = heading.group(2).lower().replace(" ", "-")
+        inlines = [{"t": "Str", "c": heading.group(2)}]
+        blocks.append({"t": "Header", "c": [len(heading.group(1)), [ident, [], []], inlines]})
+    elif line.startswith("title: "):
+        meta["title"] = {"t": "MetaString", "c": line[7:].strip('"')}
+    elif line.strip() and line.strip() != "---":
+        blocks.append({"t": "Para", "c": [{"t": "Str", "c": line}]})
+json.dump({"pandoc-api-version": [1, 23], "meta": meta, "blocks": blocks}, sys.stdout)
+"""
+
+
+@pytest.fixture
+def parses(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    pandoc = bin_dir / "pandoc"
+    pandoc.write_text(FAKE_PANDOC, encoding="utf-8")
+    pandoc.chmod(0o755)
+    log = tmp_path / "parses.log"
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("TOOL_LOG", str(log))
+    texformat.tool_versions.cache_clear()
+    return log
+
+
+def _parsed(log: Path) -> list[str]:
+    if not log.exists():
+        return []
+    return [json.loads(line) for line in log.read_text(encoding="utf-8").splitlines()]
+
+
+def _headers(document: dict[str, Any]) -> list[str]:
+    return [block["c"][1][0] for block in document["blocks"] if block["t"] == "Header"]
+
+
+def _make_document(tmp_path: Path) -> list[Path]:
+    md_root = tmp_path / "content" / "003.cu"
+    md_root.mkdir(parents=True)
+    files = [
+        md_root / "0.index.md",
+        md_root / "010000.first.md",
+        md_root / "020000.second.md",
+    ]
+    files[0].write_text("# Обзор\n\nВступление", encoding="utf-8")
+    files[1].write_text("# Первый\n\n## Details\n\nОдин", encoding="utf-8")
+    files[2].write_text("# Второй\n\n## Details\n\nДва", encoding="utf-8")
+    return files
+
+
+def test_split_sections_follows_bundle_sections(tmp_path: Path) -> None:
+    files = _make_document(tmp_path)
+
+    bundle = assemble_bundle(files, tmp_path / "bundle.md", metadata={"title": "CU"})
+    chunks = split_sections(bundle.content, bundle.section_lines)
+
+    assert len(chunks) == 4
+    assert chunks[0].startswith("---\ntitle:")
+    assert [chunk.splitlines()[0] for chunk in chunks[1:]] == [
+        "# Обзор",
+        "# Первый",
+        "# Второй",
+    ]
+    assert "\n\n".join(chunk.rstrip("\n") for chunk in chunks) + "\n" == bundle.content
+
+
+def test_build_ast_parses_only_changed_sections(tmp_path: Path, parses: Path) -> None:
+    files = _make_document(tmp_path)
+    cache = SectionAstCache(tmp_path / "ast")
+    destination = tmp_path / "bundle.json"
+
+    bundle = assemble_bundle(files, tmp_path / "bundle.md", metadata={"title": "CU"})
+    build_ast(bundle.path, destination, cache, section_lines=bundle.section_lines)
+    first = json.loads(destination.read_text(encoding="utf-8"))
+
+    files[2].write_text("# Второй\n\n## Details\n\nОбновлено", encoding="utf-8")
+    bundle = assemble_bundle(files, tmp_path / "bundle.md", metadata={"title": "CU"})
+    rebuilt = SectionAstCache(tmp_path / "ast")
+    build_ast(bundle.path, destination, rebuilt, section_lines=bundle.section_lines)
+    second = json.loads(destination.read_text(encoding="utf-8"))
+
+    assert (cache.misses, rebuilt.hits, rebuilt.misses) == (4, 3, 1)
+    assert len(_parsed(parses)) == 5
+    assert "Обновлено" in _parsed(parses)[-1]
+    assert first["meta"]["title"]["c"] == "CU"
+    assert _headers(second) == ["обзор", "первый", "details", "второй", "details-1"]
+    assert second["blocks"][-1] == {"t": "Para", "c": [{"t": "Str", "c": "Обновлено"}]}
+
+
+def test_build_ast_reports_pandoc_errors(tmp_path: Path, parses: Path) -> None:
+    bundle = tmp_path / "bundle.md"
+    bundle.write_text("# BROKEN\n", encoding="utf-8")
+
+    with pytest.raises(RuntimeError, match="parse error"):
+        build_ast(bundle, tmp_path / "bundle.json", SectionAstCache(tmp_path / "ast"))
+
+
+def test_build_ast_keeps_repeated_sections_independent(
+    tmp_path: Path, parses: Path
+) -> None:
+    bundle = tmp_path / "bundle.md"
+    bundle.write_text("# Setup\n\n# Setup\n", encoding="utf-8")
+    cache = SectionAstCache(tmp_path / "ast")
+
+    build_ast(bundle, tmp_path / "bundle.json", cache, section_lines=(0, 2))
+    merged = json.loads((tmp_path / "bundle.json").read_text(encoding="utf-8"))
+
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert _headers(merged) == ["setup", "setup-1"]
+
+
+def test_merge_documents_merges_metadata_in_order() -> None:
+    first = {
+        "pandoc-api-version": [1, 23],
+        "meta": {"title": {"t": "MetaString", "c": "A"}},
+        "blocks": [],
+    }
+    second = {
+        "pandoc-api-version": [1, 23],
+        "meta": {"title": {"t": "MetaString", "c": "B"}},
+        "blocks": [{"t": "HorizontalRule"}],
+    }
+
+    merged = merge_documents([first, second])
+
+    assert merged["meta"]["title"]["c"] == "B"
+    assert merged["blocks"] == [{"t": "HorizontalRule"}]
+
+
+def test_build_ast_caches_transformed_sections(tmp_path: Path, parses: Path) -> None:
+    files = _make_document(tmp_path)
+    calls: list[int] = []
+
+    def shout(document: dict[str, Any]) -> dict[str, Any]:
+        calls.append(len(document["blocks"]))
+        for block in document["blocks"]:
+            if block["t"] == "Para":
+                block["c"][0]["c"] = block["c"][0]["c"].upper()
+        return document
+
+    bundle = assemble_bundle(files, tmp_path / "bundle.md", metadata={"title": "CU"})
+    destination = tmp_path / "bundle.json"
+    for _ in range(2):
+        cache = SectionAstCache(tmp_path / "ast", transforms=[shout])
+        build_ast(bundle.path, destination, cache, section_lines=bundle.section_lines)
+    plain = SectionAstCache(tmp_path / "ast", transforms=[mark_pictograms])
+    build_ast(bundle.path, destination, plain, section_lines=bundle.section_lines)
+
+    assert len(calls) == 4
+    assert (cache.hits, cache.misses) == (4, 0)
+    assert (plain.hits, plain.misses) == (0, 4)
+    assert len(_parsed(parses)) == 8
+    assert cache.key("# A\n") != plain.key("# A\n")
@@ -2,7 +2,16 @@ from collections.abc import Callable
 from pathlib import Path
 from textwrap import dedent
 
-from md2pdf.bundle import DEFAULT_BUNDLE_METADATA, build, write_bundle
+import pytest
+
+from md2pdf.bundle import (
+    DEFAULT_BUNDLE_METADATA,
+    build,
+    iter_sections,
+    write_bundle,
+    write_sections,
+)
+from md2pdf.cache import SectionCache
 
 
 def _strip_numeric(stem: str) -> str:
@@ -112,6 +121,87 @@ def test_build_uses_first_heading_when_metadata_missing(tmp_path: Path) -> None:
     assert "Описание раздела." in output
 
 
+def test_build_reads_flat_front_matter_without_yaml(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    md_root = tmp_path / "content" / "003.cu"
+    md_root.mkdir(parents=True)
+    md_file = md_root / "010100.intro.md"
+    md_file.write_text(
+        "---\ntitle: 'Введение'\nauthor: Иванов\n---\n\nТекст\n---\nЕщё",
+        encoding="utf-8",
+    )
+    step = md_root / "010200.step.md"
+    step.write_text("---\ntitle: Шаг #2\nurl:http://x\n---\nТекст", encoding="utf-8")
+
+    def fail_load(*args: object, **kwargs: object) -> None:
+        raise AssertionError("flat front matter must not go through YAML")
+
+    monkeypatch.setattr("yaml.load", fail_load)
+    output = build([md_file], _make_resolver(md_root))
+    step_output = build([step], _make_resolver(md_root))
+
+    assert output.endswith("# Введение\n\nТекст\n---\nЕщё\n")
+    assert step_output.endswith("# Шаг #2\n\nТекст\n")
+
+
+def test_build_parses_structured_front_matter_with_yaml(tmp_path: Path) -> None:
+    md_root = tmp_path / "content" / "003.cu"
+    md_root.mkdir(parents=True)
+    md_file = md_root / "010100.intro.md"
+    md_file.write_text(
+        dedent(
+            """\
+            ---
+            title: >
+              Назначение
+              комплекса
+            tags:
+              - cu
+            ---
+            Текст
+            """
+        ),
+        encoding="utf-8",
+    )
+
+    output = build([md_file], _make_resolver(md_root))
+
+    assert output.endswith("# Назначение комплекса\n\nТекст\n")
+
+
+def test_build_converts_collapsible_tables(tmp_path: Path) -> None:
+    md_root = tmp_path / "content" / "003.cu"
+    md_root.mkdir(parents=True)
+    md_file = md_root / "010100.errors.md"
+    md_file.write_text(
+        dedent(
+            """\
+            # Ошибки
+
+            ::app-collapsible
+            ---
+            label: "Таблица 1 - Коды"
+            ---
+
+            #content
+            <table><tr><th>Код</th></tr><tr><td>E1</td></tr></table>
+            ::
+
+            Текст
+            """
+        ),
+        encoding="utf-8",
+    )
+
+    output = build([md_file], _make_resolver(md_root))
+
+    assert "app-collapsible" not in output
+    assert "#content" not in output
+    assert "+=====" in output
+    assert output.endswith("Table: Коды\n\nТекст\n")
+
+
 def test_write_bundle_creates_parent_directory(tmp_path: Path) -> None:
     target = tmp_path / "nested" / "bundle.md"
     content = "bundle content"
@@ -121,3 +211,61 @@ def test_write_bundle_creates_parent_directory(tmp_path: Path) -> None:
     assert written_path == target
     assert target.exists()
     assert target.read_text(encoding="utf-8") == content
+
+
+def test_iter_sections_yields_front_matter_then_sections() -> None:
+    md_root = Path(__file__).parent / "fixtures" / "bundle" / "003.cu"
+    order = [md_root / "0.index.md", md_root / "010000.overview.md"]
+
+    sections = list(iter_sections(order, _make_resolver(md_root)))
+
+    assert sections[0].startswith("---\ntitle:")
+    assert sections[1].startswith("# Общее описание")
+    assert sections[2].startswith("# Обзор возможностей")
+    assert "\n\n".join(sections) + "\n" == build(order, _make_resolver(md_root))
+
+
+def test_write_sections_matches_joined_bundle(tmp_path: Path) -> None:
+    target = tmp_path / "nested" / "bundle.md"
+
+    write_sections(iter(["---\na: 1\n---", "# One", "# Two"]), target)
+
+    assert target.read_text(encoding="utf-8") == "---\na: 1\n---\n\n# One\n\n# Two\n"
+
+
+def test_build_keeps_heading_levels_of_slice_with_base_root() -> None:
+    md_root = Path(__file__).parent / "fixtures" / "bundle" / "003.cu"
+    chapter = md_root / "01.section" / "010100.chapter.md"
+
+    sliced = build([chapter], _make_resolver(md_root), base_root=md_root)
+
+    assert "\n## Подраздел\n" in sliced
+    assert "\n# Подраздел\n" in build([chapter], _make_resolver(md_root))
+
+
+def test_parallel_build_matches_serial_build(tmp_path: Path) -> None:
+    md_root = tmp_path / "001.guide"
+    md_root.mkdir()
+    (md_root / "0.index.md").write_text("# Guide\n\nIntro\n", encoding="utf-8")
+    for number in range(1, 30):
+        (md_root / f"{number:02d}0000.part-{number}.md").write_text(
+            f"# Part {number}\n\n![Схема](image{number}.png)\n", encoding="utf-8"
+        )
+    (md_root / "300000.empty.md").write_text("\n", encoding="utf-8")
+    order = sorted(md_root.iterdir())
+    resolver = _make_resolver(md_root)
+    cache = SectionCache(tmp_path / "sections.json", {})
+
+    serial = build(order, resolver)
+
+    assert build(order, resolver, jobs=4) == serial
+    assert build(order, resolver, section_cache=cache, jobs=4) == serial
+    assert build(order, resolver, section_cache=cache, jobs=4) == serial
+    assert (cache.misses, cache.hits) == (len(order), len(order))
+
+
+def test_iter_sections_rejects_non_positive_jobs() -> None:
+    md_root = Path(__file__).parent / "fixtures" / "bundle" / "003.cu"
+
+    with pytest.raises(ValueError, match="jobs must be a positive integer"):
+        build([md_root / "0.index.md"], _make_resolver(md_root), jobs=0)
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from md2pdf.cache import SectionCache, section_cache_path
+
+
+def _render_counter(calls: list[str]):  # type: ignore[no-untyped-def]
+    def render(raw: str) -> str:
+        calls.append(raw)
+        return raw.upper()
+
+    return render
+
+
+def test_section_cache_reuses_unchanged_files(tmp_path: Path) -> None:
+    md_file = tmp_path / "010000.file.md"
+    md_file.write_text("text", encoding="utf-8")
+    cache_path = tmp_path / "cache" / "sections.json"
+    calls: list[str] = []
+
+    cache = SectionCache(cache_path, {"images_root": "public/images"})
+    assert cache.get_or_render(md_file, 1, _render_counter(calls)) == "TEXT"
+    cache.save()
+
+    reloaded = SectionCache(cache_path, {"images_root": "public/images"})
+    assert reloaded.get_or_render(md_file, 1, _render_counter(calls)) == "TEXT"
+
+    assert calls == ["text"]
+    assert (reloaded.hits, reloaded.misses) == (1, 0)
+
+
+def test_section_cache_rerenders_changed_content(tmp_path: Path) -> None:
+    md_file = tmp_path / "010000.file.md"
+    md_file.write_text("old", encoding="utf-8")
+    cache = SectionCache(tmp_path / "sections.json", {})
+    calls: list[str] = []
+
+    cache.get_or_render(md_file, 1, _render_counter(calls))
+    md_file.write_text("new content", encoding="utf-8")
+
+    assert cache.get_or_render(md_file, 1, _render_counter(calls)) == "NEW CONTENT"
+    assert calls == ["old", "new content"]
+
+
+def test_section_cache_falls_back_to_content_hash(tmp_path: Path) -> None:
+    md_file = tmp_path / "010000.file.md"
+    md_file.write_text("same", encoding="utf-8")
+    cache = SectionCache(tmp_path / "sections.json", {})
+    calls: list[str] = []
+
+    cache.get_or_render(md_file, 1, _render_counter(calls))
+    stat = md_file.stat()
+    os.utime(md_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000))
+
+    assert cache.get_or_render(md_file, 1, _render_counter(calls)) == "SAME"
+    assert calls == ["same"]
+
+
+def test_section_cache_keys_on_heading_level_and_settings(tmp_path: Path) -> None:
+    md_file = tmp_path / "010000.file.md"
+    md_file.write_text("text", encoding="utf-8")
+    cache_path = tmp_path / "sections.json"
+    calls: list[str] = []
+
+    cache = SectionCache(cache_path, {"images_root": "public/images"})
+    cache.get_or_render(md_file, 1, _render_counter(calls))
+    cache.get_or_render(md_file, 2, _render_counter(calls))
+    cache.save()
+
+    other_root = SectionCache(cache_path, {"images_root": "/images"})
+    other_root.get_or_render(md_file, 2, _render_counter(calls))
+
+    assert len(calls) == 3
+
+
+def test_section_cache_path_uses_bundle_stem(tmp_path: Path) -> None:
+    path = section_cache_path(tmp_path, Path("output/report.bundle.md"))
+
+    assert path == tmp_path / "report.bundle.sections.json"
+
+
+def test_section_cache_stores_bodies_outside_the_index(tmp_path: Path) -> None:
+    first = tmp_path / "010000.first.md"
+    second = tmp_path / "020000.second.md"
+    first.write_text("one", encoding="utf-8")
+    second.write_text("two", encoding="utf-8")
+    cache_path = tmp_path / "cache" / "bundle.sections.json"
+    calls: list[str] = []
+
+    cache = SectionCache(cache_path, {})
+    cache.get_or_render(first, 1, _render_counter(calls))
+    cache.get_or_render(second, 1, lambda raw: "TWO\r\n")
+    cache.save()
+    bodies = sorted(path.read_bytes() for path in cache.bodies_dir.iterdir())
+
+    assert cache.bodies_dir == tmp_path / "cache" / "bundle.sections"
+    assert bodies == [b"ONE", b"TWO\r\n"]
+    assert "ONE" not in cache_path.read_text(encoding="utf-8")
+
+    reloaded = SectionCache(cache_path, {})
+    assert reloaded.get_or_render(second, 1, _render_counter(calls)) == "TWO\r\n"
+    reloaded.save()
+
+    assert calls == ["one"]
+    assert [path.read_bytes() for path in reloaded.bodies_dir.iterdir()] == [b"TWO\r\n"]
+
+
+def test_section_cache_rerenders_when_body_is_missing(tmp_path: Path) -> None:
+    md_file = tmp_path / "010000.file.md"
+    md_file.write_text("text", encoding="utf-8")
+    cache_path = tmp_path / "sections.json"
+    calls: list[str] = []
+    cache = SectionCache(cache_path, {})
+    cache.get_or_render(md_file, 1, _render_counter(calls))
+    cache.save()
+    for body in cache.bodies_dir.iterdir():
+        body.unlink()
+
+    reloaded = SectionCache(cache_path, {})
+
+    assert reloaded.get_or_render(md_file, 1, _render_counter(calls)) == "TEXT"
+    assert calls == ["text", "text"]
+    assert (reloaded.hits, reloaded.misses) == (0, 1)
@@ -1,13 +1,23 @@
 from __future__ import annotations
 
+import json
+import subprocess
+import sys
 from pathlib import Path
 from typing import Mapping
 
 import pytest
 
 import md2pdf.pipeline as pipeline_mod
-from md2pdf import cli
-from md2pdf.pipeline import BundleArtifacts, MarkdownCollection, PipelineParams
+from md2pdf import cli, server, watch
+from md2pdf.metrics import Metrics
+from md2pdf.pipeline import (
+    BatchReport,
+    BundleArtifacts,
+    MarkdownCollection,
+    PipelineParams,
+    PipelineResult,
+)
 from md2pdf.reporting import StructureWarning
 
 
@@ -29,6 +39,7 @@ def test_main_runs_pipeline_and_writes_warnings(
         metadata={"title": "Документ"},
         bundle_path=Path("bundle.md"),
         output_pdf=Path("output/report.pdf"),
+        cache_dir=Path("output/.md2pdf-cache"),
     )
 
     captured: dict[str, object] = {}
@@ -37,8 +48,10 @@ def test_main_runs_pipeline_and_writes_warnings(
         captured["prepare"] = kwargs
         return params
 
-    def fake_collect_markdown(md_root: Path) -> MarkdownCollection:
-        captured["collect"] = md_root
+    def fake_collect_markdown(
+        md_root: Path, *, cache_dir: Path | None
+    ) -> MarkdownCollection:
+        captured["collect"] = (md_root, cache_dir)
         return MarkdownCollection(order=[Path("0.index.md")], warnings=[warning])
 
     def fake_assemble_bundle(
@@ -47,8 +60,25 @@ def test_main_runs_pipeline_and_writes_warnings(
         *,
         metadata: Mapping[str, str],
         images_root: Path,
+        cache_dir: Path | None,
+        lazy_content: bool,
+        metrics: object,
+        image_prep: object,
+        jobs: int,
+        fail_on_missing_images: bool,
     ) -> BundleArtifacts:
-        captured["assemble"] = (order, destination, metadata, images_root)
+        assert metrics is not None
+        assert image_prep is None
+        assert jobs >= 1
+        assert fail_on_missing_images is False
+        captured["assemble"] = (
+            order,
+            destination,
+            metadata,
+            images_root,
+            cache_dir,
+            lazy_content,
+        )
         return BundleArtifacts(path=destination, content="content")
 
     def fake_render_pdf(
@@ -60,7 +90,14 @@ def test_main_runs_pipeline_and_writes_warnings(
         filters: tuple[Path, ...] | list[Path] = (),
         verbose: bool = False,
         log_file: Path | None = None,
-    ) -> Path:
+        force: bool = False,
+        server: str | None = None,
+        build_dir: Path | None = None,
+        artifacts: object = None,
+        metrics: object = None,
+        ast_cache: object = None,
+        section_lines: tuple[int, ...] = (),
+    ) -> tuple[Path, bool]:
         captured["render"] = (
             bundle,
             style,
@@ -69,8 +106,9 @@ def test_main_runs_pipeline_and_writes_warnings(
             tuple(filters),
             verbose,
             log_file,
+            force,
         )
-        return output
+        return output, True
 
     warnings_written: list[StructureWarning] = []
 
@@ -80,7 +118,7 @@ def test_main_runs_pipeline_and_writes_warnings(
     monkeypatch.setattr(pipeline_mod, "prepare_params", fake_prepare_params)
     monkeypatch.setattr(pipeline_mod, "collect_markdown", fake_collect_markdown)
     monkeypatch.setattr(pipeline_mod, "assemble_bundle", fake_assemble_bundle)
-    monkeypatch.setattr(pipeline_mod, "render_pdf", fake_render_pdf)
+    monkeypatch.setattr(pipeline_mod, "render_pdf_incremental", fake_render_pdf)
     monkeypatch.setattr(cli, "write_warnings", fake_write_warnings)
 
     exit_code = cli.main(
@@ -104,12 +142,14 @@ def test_main_runs_pipeline_and_writes_warnings(
         "output_override": None,
         "metadata_overrides": {"title": "Override"},
     }
-    assert captured["collect"] == params.md_root
+    assert captured["collect"] == (params.md_root, params.cache_dir)
     assert captured["assemble"] == (
         [Path("0.index.md")],
         params.bundle_path,
         params.metadata,
         params.images_root,
+        params.cache_dir,
+        True,
     )
     assert captured["render"] == (
         params.bundle_path,
@@ -119,6 +159,7 @@ def test_main_runs_pipeline_and_writes_warnings(
         params.filters,
         True,
         None,
+        False,
     )
 
     assert warnings_written == [warning]
@@ -137,3 +178,239 @@ def test_main_rejects_bad_metadata(
     captured = capsys.readouterr()
     assert exit_code == 1
     assert "metadata overrides must use key=value format" in captured.err
+
+
+def test_main_batch_mode_renders_all_documents(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    warning = StructureWarning(
+        code="NON_NUMERIC_FILE",
+        path=Path("content/003.cu/notes.md"),
+        message="Файл без числового префикса",
+    )
+    batch = [
+        PipelineParams(
+            md_root=Path(f"content/{name}"),
+            images_root=Path("public/images"),
+            style=Path("styles/style.yaml"),
+            template=Path("templates/gost.tex"),
+            filters=(),
+            metadata={},
+            bundle_path=Path(f"output/{name}.bundle.md"),
+            output_pdf=Path(f"output/{name}.pdf"),
+        )
+        for name in ("003.cu", "004.broken")
+    ]
+    captured: dict[str, object] = {}
+
+    def fake_prepare_batch_params(config_path: Path, **kwargs: object) -> list:
+        captured["prepare"] = (config_path, kwargs)
+        return batch
+
+    def fake_run_batch(params: list[PipelineParams], **kwargs: object) -> BatchReport:
+        captured["run"] = (params, kwargs)
+        result = PipelineResult(
+            bundle_path=params[0].bundle_path,
+            output_pdf=params[0].output_pdf,
+            warnings=(warning,),
+        )
+        return BatchReport(
+            results=(result,),
+            failures=((params[1].md_root, "Pandoc failed"),),
+            warnings=(warning,),
+        )
+
+    monkeypatch.setattr(pipeline_mod, "prepare_batch_params", fake_prepare_batch_params)
+    monkeypatch.setattr(pipeline_mod, "run_batch", fake_run_batch)
+    warnings_written: list[StructureWarning] = []
+    monkeypatch.setattr(cli, "write_warnings", warnings_written.extend)
+
+    exit_code = cli.main(["--all", "--jobs", "4", "--output-dir", "dist", "--quiet"])
+
+    err = capsys.readouterr().err
+    assert exit_code == 1
+    assert captured["prepare"] == (
+        Path("config/project.yml"),
+        {"style_override": None, "output_dir": Path("dist"), "metadata_overrides": {}},
+    )
+    assert captured["run"] == (
+        batch,
+        {
+            "jobs": 4,
+            "use_cache": True,
+            "force": False,
+            "log_file": None,
+            "metrics_file": None,
+            "server": None,
+            "keep_tex": False,
+            "artifacts": None,
+            "fail_on_missing_images": False,
+            "ast_cache": False,
+        },
+    )
+    assert warnings_written == [warning]
+    assert "Failed to render content/004.broken: Pandoc failed" in err
+
+
+def test_main_batch_mode_rejects_positional_paths(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    exit_code = cli.main(["--all", "content/003.cu"])
+
+    assert exit_code == 1
+    assert "--all renders every document root" in capsys.readouterr().err
+
+
+def test_main_watch_mode_runs_watcher(monkeypatch: pytest.MonkeyPatch) -> None:
+    params = PipelineParams(
+        md_root=Path("content/003.cu"),
+        images_root=Path("public/images"),
+        style=Path("styles/style.yaml"),
+        template=Path("templates/gost.tex"),
+        filters=(),
+        metadata={},
+        bundle_path=Path("output/cu.bundle.md"),
+        output_pdf=Path("output/cu.pdf"),
+    )
+    captured: dict[str, object] = {}
+
+    class FakeWatcher:
+        def __init__(self, watched: PipelineParams, **kwargs: object) -> None:
+            captured["init"] = (watched, kwargs)
+
+        def run(self, **kwargs: object) -> None:
+            captured["run"] = kwargs
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(pipeline_mod, "prepare_params", lambda **_: params)
+    monkeypatch.setattr(watch, "DocumentWatcher", FakeWatcher)
+
+    exit_code = cli.main(["content/003.cu", "--watch", "--no-cache", "--quiet"])
+
+    assert exit_code == 0
+    watched, options = captured["init"]  # type: ignore[misc]
+    assert watched is params
+    assert options["use_cache"] is False
+    assert options["verbose"] is False
+    assert captured["run"]["force"] is False  # type: ignore[index]
+
+
+@pytest.mark.parametrize(
+    ("argv", "message"),
+    [
+        (["--all", "--watch"], "work with a single document"),
+        (["--all", "--preview", "01.*"], "work with a single document"),
+        (["content/003.cu", "--watch", "--split"], "cannot be combined"),
+        (["content/003.cu", "--keep-tex", "--preview", "01.*"], "cannot be combined"),
+        (["content/003.cu", "--keep-tex", "--server", "http://h:1"], "--server"),
+    ],
+)
+def test_main_rejects_incompatible_modes(
+    argv: list[str], message: str, capsys: pytest.CaptureFixture[str]
+) -> None:
+    exit_code = cli.main(argv)
+
+    assert exit_code == 1
+    assert message in capsys.readouterr().err
+
+
+def test_main_preview_mode_renders_selection(
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+    tmp_path: Path,
+) -> None:
+    params = PipelineParams(
+        md_root=Path("content/003.cu"),
+        images_root=Path("public/images"),
+        style=Path("styles/style.yaml"),
+        template=Path("templates/gost.tex"),
+        filters=(),
+        metadata={},
+        bundle_path=Path("output/cu.bundle.md"),
+        output_pdf=Path("output/cu.pdf"),
+    )
+    captured: dict[str, object] = {}
+
+    def fake_run_preview(
+        preview_params: PipelineParams, patterns: list[str], **kwargs: object
+    ) -> BatchReport:
+        metrics = kwargs.pop("metrics")
+        assert isinstance(metrics, Metrics)
+        metrics.count("files_processed", 2)
+        captured["call"] = (preview_params, patterns, kwargs)
+        return BatchReport(
+            results=(),
+            failures=((Path("output/cu.parts/02.setup.pdf"), "Pandoc failed"),),
+            warnings=(),
+        )
+
+    monkeypatch.setattr(pipeline_mod, "prepare_params", lambda **_: params)
+    monkeypatch.setattr(pipeline_mod, "run_preview", fake_run_preview)
+
+    metrics_file = tmp_path / "metrics.jsonl"
+    exit_code = cli.main(
+        [
+            "content/003.cu",
+            "--preview",
+            "02.*",
+            "--split",
+            "-j",
+            "3",
+            "--quiet",
+            "--metrics-file",
+            str(metrics_file),
+        ]
+    )
+
+    assert exit_code == 1
+    assert captured["call"] == (
+        params,
+        ["02.*"],
+        {
+            "split": True,
+            "jobs": 3,
+            "use_cache": True,
+            "force": False,
+            "log_file": None,
+            "fail_on_missing_images": False,
+        },
+    )
+    assert "Failed to render output/cu.parts/02.setup.pdf" in capsys.readouterr().err
+    records = [json.loads(line) for line in metrics_file.read_text().splitlines()]
+    assert records[-1]["counters"] == {"files_processed": 2}
+    assert records[-1]["document"] == "content/003.cu"
+
+
+def test_help_does_not_import_pipeline() -> None:
+    src = Path(cli.__file__).resolve().parents[1]
+    script = (
+        "import sys\n"
+        "from md2pdf import cli\n"
+        "try:\n"
+        "    cli.main(['--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "heavy = ['md2pdf.pipeline', 'md2pdf.server', 'md2pdf.watch', 'yaml']\n"
+        "print(sorted(name for name in heavy if name in sys.modules))\n"
+    )
+
+    completed = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={"PYTHONPATH": str(src)},
+    )
+
+    assert "--serve" in completed.stdout
+    assert completed.stdout.rstrip().endswith("[]")
+
+
+def test_serve_without_address_uses_server_default(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[str] = []
+    monkeypatch.setattr(server, "serve", lambda address, **_: calls.append(address))
+
+    assert cli.main(["--serve", "--quiet"]) == 0
+    assert calls == [server.DEFAULT_ADDRESS]
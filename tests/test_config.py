@@ -3,6 +3,7 @@ from pathlib import Path
 import pytest
 
 from md2pdf.config import ProjectConfig, load_config
+from md2pdf.imageprep import ImagePrepSettings
 
 
 def _write_default_config(config_path: Path) -> None:
@@ -70,3 +71,45 @@ def test_missing_template_file_raises(tmp_path: Path) -> None:
 
     with pytest.raises(ValueError, match="Missing file"):
         load_config(config_path)
+
+
+def test_load_config_reads_image_prep_settings(tmp_path: Path) -> None:
+    _prepare_project_layout(tmp_path)
+    config_path = tmp_path / "config" / "project.yml"
+    _write_default_config(config_path)
+    with config_path.open("a", encoding="utf-8") as handle:
+        handle.write("\nimage_prep:\n  dpi: 200\n")
+
+    project_config = load_config(config_path)
+
+    assert project_config.image_prep == ImagePrepSettings(dpi=200)
+
+
+def test_load_config_resolves_transforms(tmp_path: Path) -> None:
+    _prepare_project_layout(tmp_path)
+    (tmp_path / "transforms").mkdir()
+    (tmp_path / "transforms" / "local.py").write_text(
+        "def strip(document):\n    return document\n"
+    )
+    config_path = tmp_path / "config" / "project.yml"
+    _write_default_config(config_path)
+    with config_path.open("a", encoding="utf-8") as handle:
+        handle.write("\ntransforms:\n  - pictogram\n  - transforms/local.py:strip\n")
+
+    project_config = load_config(config_path)
+
+    assert project_config.transforms == (
+        "pictogram",
+        f"{tmp_path.resolve() / 'transforms' / 'local.py'}:strip",
+    )
+
+
+def test_unknown_transform_raises(tmp_path: Path) -> None:
+    _prepare_project_layout(tmp_path)
+    config_path = tmp_path / "config" / "project.yml"
+    _write_default_config(config_path)
+    with config_path.open("a", encoding="utf-8") as handle:
+        handle.write("\ntransforms:\n  - md2pdf.transforms:missing\n")
+
+    with pytest.raises(ValueError, match="not found"):
+        load_config(config_path)
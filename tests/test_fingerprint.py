@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from md2pdf.fingerprint import (
+    fingerprint_path,
+    is_up_to_date,
+    render_fingerprint,
+    write_fingerprint,
+)
+
+
+def _render_inputs(tmp_path: Path) -> tuple[Path, Path, Path, Path]:
+    image = tmp_path / "images" / "diagram.png"
+    image.parent.mkdir()
+    image.write_bytes(b"png-v1")
+    bundle = tmp_path / "bundle.md"
+    bundle.write_text(f"# Title\n\n![Диаграмма]({image})\n", encoding="utf-8")
+    style = tmp_path / "style.yaml"
+    style.write_text("fonts: {}", encoding="utf-8")
+    template = tmp_path / "gost.tex"
+    template.write_text("% template", encoding="utf-8")
+    return bundle, style, template, image
+
+
+def test_fingerprint_is_stable_for_same_inputs(tmp_path: Path) -> None:
+    bundle, style, template, _ = _render_inputs(tmp_path)
+    command = ["pandoc", str(bundle)]
+
+    first = render_fingerprint(bundle, style, template, (), command)
+    second = render_fingerprint(bundle, style, template, (), command)
+
+    assert first == second
+
+
+def test_fingerprint_tracks_referenced_images(tmp_path: Path) -> None:
+    bundle, style, template, image = _render_inputs(tmp_path)
+    command = ["pandoc", str(bundle)]
+
+    before = render_fingerprint(bundle, style, template, (), command)
+    image.write_bytes(b"png-v2")
+
+    assert render_fingerprint(bundle, style, template, (), command) != before
+
+
+def test_fingerprint_tracks_style_filters_and_command(tmp_path: Path) -> None:
+    bundle, style, template, _ = _render_inputs(tmp_path)
+    lua_filter = tmp_path / "cleanup.lua"
+    lua_filter.write_text("return {}", encoding="utf-8")
+    command = ["pandoc", str(bundle)]
+
+    base = render_fingerprint(bundle, style, template, (), command)
+    with_filter = render_fingerprint(bundle, style, template, (lua_filter,), command)
+    other_command = render_fingerprint(bundle, style, template, (), [*command, "--toc"])
+    style.write_text("fonts: {main: Roboto}", encoding="utf-8")
+    other_style = render_fingerprint(bundle, style, template, (), command)
+
+    assert len({base, with_filter, other_command, other_style}) == 4
+
+
+def test_is_up_to_date_requires_pdf_and_matching_stamp(tmp_path: Path) -> None:
+    output = tmp_path / "report.pdf"
+
+    write_fingerprint(output, "abc")
+    assert not is_up_to_date(output, "abc")
+
+    output.write_bytes(b"%PDF")
+    assert is_up_to_date(output, "abc")
+    assert not is_up_to_date(output, "def")
+    assert fingerprint_path(output) == tmp_path / "report.pdf.fingerprint"
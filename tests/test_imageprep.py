@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import random
+from pathlib import Path
+
+import pytest
+
+from md2pdf import imageprep
+from md2pdf.imageprep import (
+    ImagePrepSettings,
+    prepare_image,
+    preprocess_images,
+    settings_from_mapping,
+)
+
+
+def test_settings_from_mapping_parses_overrides() -> None:
+    assert settings_from_mapping(None) is None
+    assert settings_from_mapping(False) is None
+    assert settings_from_mapping(True) == ImagePrepSettings()
+    assert settings_from_mapping({"dpi": 200, "convert_photos": False}) == (
+        ImagePrepSettings(dpi=200, convert_photos=False)
+    )
+
+
+@pytest.mark.parametrize(
+    ("raw", "message"),
+    [
+        ("yes", "must be a boolean or a mapping"),
+        ({"dpi": 0}, "dpi must be a positive integer"),
+        ({"jpeg_quality": 100}, "jpeg_quality must be an integer"),
+        ({"jpeg_quality": True}, "jpeg_quality must be an integer"),
+        ({"scale": 2}, "Unknown image_prep keys: scale"),
+    ],
+)
+def test_settings_from_mapping_rejects_invalid_values(
+    raw: object, message: str
+) -> None:
+    with pytest.raises(ValueError, match=message):
+        settings_from_mapping(raw)
+
+
+def test_preprocess_requires_pillow(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setattr(imageprep, "Image", None)
+
+    with pytest.raises(ValueError, match="requires Pillow"):
+        preprocess_images([tmp_path / "a.png"], tmp_path, ImagePrepSettings())
+
+
+def test_prepare_image_passes_through_non_raster_files(tmp_path: Path) -> None:
+    vector = tmp_path / "diagram.svg"
+    vector.write_text("<svg/>", encoding="utf-8")
+
+    assert prepare_image(vector, tmp_path / "cache", ImagePrepSettings()) == vector
+
+
+def test_prepare_image_downscales_to_page_width(tmp_path: Path) -> None:
+    image_module = pytest.importorskip("PIL.Image")
+    source = tmp_path / "screenshot.png"
+    image_module.new("RGB", (3000, 1500), (200, 220, 240)).save(source, dpi=(96, 96))
+    settings = ImagePrepSettings(dpi=100, text_width_mm=254.0)
+    cache_dir = tmp_path / "cache"
+
+    prepared = prepare_image(source, cache_dir, settings)
+
+    assert prepared.parent.parent == cache_dir
+    assert prepared.suffix == ".png"
+    with image_module.open(prepared) as result:
+        assert result.size == (1000, 500)
+        assert result.info["dpi"][0] == pytest.approx(32, abs=0.1)
+    assert prepare_image(source, cache_dir, settings) == prepared
+
+
+@pytest.mark.parametrize("photo", [False, True])
+def test_prepare_image_keeps_physical_size_without_dpi_metadata(
+    tmp_path: Path, photo: bool
+) -> None:
+    image_module = pytest.importorskip("PIL.Image")
+    source = tmp_path / "figure.png"
+    if photo:
+        noise = random.Random(0).randbytes(360 * 180 * 3)
+        image_module.frombytes("RGB", (360, 180), noise).save(source)
+    else:
+        image_module.new("RGB", (360, 180), (200, 220, 240)).save(source)
+    settings = ImagePrepSettings(dpi=36)
+
+    prepared = prepare_image(source, tmp_path / "cache", settings)
+
+    with image_module.open(prepared) as result:
+        # Without metadata xelatex places the source at 72 dpi: 5 inches.
+        assert result.size[0] / result.info["dpi"][0] == pytest.approx(5, abs=0.01)
+
+
+def test_prepare_image_ignores_in_flight_temp_files(tmp_path: Path) -> None:
+    image_module = pytest.importorskip("PIL.Image")
+    source = tmp_path / "screenshot.png"
+    image_module.new("RGB", (3000, 1500), (200, 220, 240)).save(source)
+    cache_dir = tmp_path / "cache"
+    prepared = prepare_image(source, cache_dir, ImagePrepSettings())
+    prepared.unlink()
+    # A half-written temp file must never be returned from the cache.
+    stray = prepared.with_name(f"{prepared.name}.999.tmp")
+    stray.write_bytes(b"partial")
+
+    again = prepare_image(source, cache_dir, ImagePrepSettings())
+
+    assert again == prepared
+    assert again.is_file()
+    assert [path.name for path in again.parent.iterdir() if path != stray] == [
+        prepared.name
+    ]
+
+
+def test_prepare_image_converts_photos_to_jpeg(tmp_path: Path) -> None:
+    image_module = pytest.importorskip("PIL.Image")
+    source = tmp_path / "photo.png"
+    noise = random.Random(0).randbytes(400 * 300 * 3)
+    image_module.frombytes("RGB", (400, 300), noise).save(source)
+
+    prepared = prepare_image(source, tmp_path / "cache", ImagePrepSettings())
+
+    assert prepared.suffix == ".jpg"
+    assert prepared.stat().st_size < source.stat().st_size
+
+
+def test_preprocess_images_maps_sources_to_cached_copies(tmp_path: Path) -> None:
+    image_module = pytest.importorskip("PIL.Image")
+    sources = []
+    for index in range(3):
+        source = tmp_path / f"image{index}.png"
+        image_module.new("RGB", (2400, 800), (index * 40, 0, 0)).save(source)
+        sources.append(source)
+
+    prepared = preprocess_images(
+        [*sources, sources[0], tmp_path / "missing.png"],
+        tmp_path / "cache",
+        ImagePrepSettings(),
+        jobs=2,
+    )
+
+    assert list(prepared) == sources
+    assert len(set(prepared.values())) == 3
@@ -1,8 +1,20 @@
 from pathlib import Path
+from typing import Any
 
 import pytest
 
-from md2pdf.images import resolve_image_path, rewrite_images, strip_numeric
+from md2pdf import images
+from md2pdf.images import (
+    ImageResolver,
+    find_missing_images,
+    iter_text_blocks,
+    referenced_images,
+    referenced_images_in_file,
+    replace_image_targets,
+    resolve_image_path,
+    rewrite_images,
+    strip_numeric,
+)
 
 
 @pytest.mark.parametrize(
@@ -123,3 +135,150 @@ def test_rewrite_images_respects_custom_resolver() -> None:
     result = rewrite_images(md_path, text, resolver=resolver)
 
     assert result == "![Alt](/static/image.png)"
+
+
+def test_referenced_images_lists_local_targets_once() -> None:
+    text = (
+        "![A](public/images/cu/a.png) ![B](https://example.com/b.png)\n"
+        '<img src="public/images/cu/c.png"/> ![A again](public/images/cu/a.png)'
+    )
+
+    assert referenced_images(text) == [
+        "public/images/cu/a.png",
+        "public/images/cu/c.png",
+    ]
+
+
+def test_referenced_images_in_file_scans_blank_line_blocks(tmp_path: Path) -> None:
+    bundle = tmp_path / "bundle.md"
+    text = (
+        "# A\n\n![Wide\nalt](a.png)\n\n\n"
+        '<img\n  src="b.png"/>\n\n![A](a.png) ![C](https://x/c.png)'
+    )
+    bundle.write_text(text, encoding="utf-8")
+
+    assert "".join(iter_text_blocks(bundle)) == text
+    assert referenced_images_in_file(bundle) == ["a.png", "b.png"]
+
+
+def test_rewrite_images_handles_all_forms_in_one_pass() -> None:
+    md_path = Path("content/003.cu/02.section/020100.file.md")
+    text = (
+        "::sign-image\n---\nsrc: /sign.png\nsign: Рисунок 1\n---\n::\n"
+        "![A](a.png) <IMG alt='b' SRC='./b.png'> "
+        "::sign-image src: /c.png\n"
+        "![Remote](https://example.com/r.png)"
+    )
+    calls: list[str] = []
+
+    def resolver(current_md: Path, image: str) -> Path:
+        calls.append(image)
+        return Path("/static") / image
+
+    result = rewrite_images(md_path, text, resolver=resolver)
+
+    assert result == (
+        "![Рисунок 1](/static/sign.png)\n"
+        "![A](/static/a.png) <IMG alt='b' SRC='/static/b.png'> "
+        "![](/static/c.png)\n"
+        "![Remote](https://example.com/r.png)"
+    )
+    assert calls == ["sign.png", "a.png", "b.png", "c.png"]
+
+
+@pytest.mark.parametrize(
+    ("md_path", "image_name", "images_root"),
+    [
+        (Path("content/003.cu/02.section/020100.file.md"), "image1.png", "/images"),
+        (Path("content/003.cu/02.section/0.index.md"), "image1.png", "/images"),
+        (
+            Path("content/002.rosa-hrom/1.cert/010000.section/010100.file.md"),
+            "dir/image-cert.png",
+            "public/images",
+        ),
+        (
+            Path("content/003.cu/02.section/020100.file.md"),
+            "public/images/cu/section/file/image1.png",
+            "public/images",
+        ),
+        (Path("content/003.cu/0.index.md"), "/abs/image.png", "/images"),
+    ],
+)
+def test_image_resolver_matches_resolve_image_path(
+    md_path: Path, image_name: str, images_root: str
+) -> None:
+    resolver = ImageResolver(images_root, [md_path])
+
+    assert resolver(md_path, image_name) == resolve_image_path(
+        md_path, image_name, images_root
+    )
+
+
+def test_image_resolver_caches_repeated_lookups() -> None:
+    md_path = Path("content/003.cu/02.section/020100.file.md")
+    resolver = ImageResolver("public/images", [md_path], maxsize=2)
+
+    for name in ("a.png", "a.png", "b.png", "c.png", "a.png"):
+        resolver(md_path, name)
+
+    info = resolver.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 4, 2)
+
+
+def test_image_resolver_resolves_files_outside_precomputed_list() -> None:
+    resolver = ImageResolver("/images")
+
+    result = resolver(Path("content/003.cu/02.section/020100.file.md"), "x.png")
+
+    assert result == Path("/images/cu/section/file/x.png")
+    with pytest.raises(ValueError, match="Invalid markdown path"):
+        resolver(Path("/tmp/other/020100.file.md"), "image.png")
+
+
+def test_replace_image_targets_swaps_only_listed_paths() -> None:
+    text = (
+        '![Схема](/img/a.png "Заголовок") ![Другая](/img/a.png.bak)\n'
+        '<img class="wide" src="/img/b.png" alt="B"> ![C](/img/c.png)'
+    )
+
+    updated = replace_image_targets(
+        text, {"/img/a.png": "/cache/1.png", "/img/b.png": "/cache/2.jpg"}
+    )
+
+    assert updated == (
+        '![Схема](/cache/1.png "Заголовок") ![Другая](/img/a.png.bak)\n'
+        '<img class="wide" src="/cache/2.jpg" alt="B"> ![C](/img/c.png)'
+    )
+
+
+def test_find_missing_images_lists_each_directory_once(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    (tmp_path / "cu").mkdir()
+    (tmp_path / "cu" / "a.png").write_bytes(b"png")
+    (tmp_path / "cu" / "dir.png").mkdir()
+    listed: list[Path] = []
+    scandir = images.os.scandir
+
+    def counting_scandir(path: Path) -> Any:
+        listed.append(Path(path))
+        return scandir(path)
+
+    monkeypatch.setattr(images.os, "scandir", counting_scandir)
+
+    missing = find_missing_images(
+        [
+            tmp_path / "cu" / "a.png",
+            tmp_path / "cu" / "b.png",
+            tmp_path / "cu" / "a.png",
+            tmp_path / "cu" / "dir.png",
+            tmp_path / "gone" / "c.png",
+        ]
+    )
+
+    assert missing == {
+        tmp_path / "cu" / "b.png",
+        tmp_path / "cu" / "dir.png",
+        tmp_path / "gone" / "c.png",
+    }
+    assert sorted(listed) == [tmp_path / "cu", tmp_path / "gone"]
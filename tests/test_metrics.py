@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from md2pdf.metrics import Metrics
+
+
+def test_stage_records_wall_cpu_and_rss() -> None:
+    metrics = Metrics()
+
+    with metrics.stage("walk"):
+        sum(range(10_000))
+
+    [stage] = metrics.stages
+    assert stage.name == "walk"
+    assert stage.wall_seconds >= 0
+    assert stage.cpu_seconds >= 0
+    assert stage.peak_rss_kb is None or stage.peak_rss_kb > 0
+
+
+def test_accumulated_stages_and_counters_are_reported() -> None:
+    metrics = Metrics()
+
+    for _ in range(3):
+        with metrics.accumulate("image_rewriting"):
+            pass
+    metrics.count("images_rewritten", 2)
+    metrics.count("images_rewritten")
+
+    assert [stage.name for stage in metrics.all_stages()] == ["image_rewriting"]
+    assert metrics.counters == {"images_rewritten": 3}
+
+
+def test_write_jsonl_appends_stage_and_counter_records(tmp_path: Path) -> None:
+    metrics = Metrics()
+    with metrics.stage("bundle"):
+        pass
+    metrics.count("files_processed", 4)
+    target = tmp_path / "metrics" / "build.jsonl"
+
+    metrics.write_jsonl(target, {"document": "content/003.cu"})
+    metrics.write_jsonl(target, {"document": "content/004.other"})
+
+    records = [json.loads(line) for line in target.read_text().splitlines()]
+    assert [record["type"] for record in records] == [
+        "stage",
+        "counters",
+        "stage",
+        "counters",
+    ]
+    assert records[0]["name"] == "bundle"
+    assert records[0]["document"] == "content/003.cu"
+    assert records[1]["counters"] == {"files_processed": 4}
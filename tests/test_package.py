@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import md2pdf
+from md2pdf import pipeline
+
+SRC = Path(md2pdf.__file__).resolve().parents[1]
+
+
+def test_import_loads_no_submodules() -> None:
+    script = (
+        "import sys, md2pdf\n"
+        "print(sorted(name for name in sys.modules if name.startswith('md2pdf.')))\n"
+    )
+
+    completed = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={"PYTHONPATH": str(SRC)},
+    )
+
+    assert completed.stdout.strip() == "[]"
+
+
+def test_public_names_resolve_lazily() -> None:
+    assert md2pdf.run_document is pipeline.run_document
+    assert set(md2pdf.__all__) <= set(dir(md2pdf))
+    for name in md2pdf.__all__:
+        assert getattr(md2pdf, name) is not None
+
+    with pytest.raises(AttributeError, match="no_such_name"):
+        md2pdf.no_such_name  # noqa: B018
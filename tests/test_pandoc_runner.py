@@ -1,10 +1,23 @@
 from pathlib import Path
+import asyncio
 import subprocess
 import io
+import time
 
 import pytest
 
-from md2pdf.pandoc_runner import PANDOC_MARKDOWN_FORMAT, render
+from md2pdf import pandoc_runner
+from md2pdf.metrics import Metrics
+from md2pdf.pandoc_runner import (
+    PANDOC_MARKDOWN_FORMAT,
+    RenderJob,
+    build_command,
+    build_latex_command,
+    render,
+    render_async,
+    render_latex,
+    render_many,
+)
 
 
 class _StubProcess:
@@ -61,6 +74,33 @@ def test_render_invokes_pandoc_with_filters(monkeypatch: pytest.MonkeyPatch) ->
     assert "TEXMFVAR" in captured_env
 
 
+def test_build_command_omits_toc_when_disabled() -> None:
+    command = build_command(
+        Path("bundle.md"), Path("style.yaml"), Path("t.tex"), Path("o.pdf"), toc=False
+    )
+
+    assert "--toc" not in command
+    assert command[-2:] == ["--output", "o.pdf"]
+
+
+def test_build_latex_command_emits_tex_without_pdf_engine() -> None:
+    command = build_latex_command(
+        Path("bundle.md"), Path("style.yaml"), Path("t.tex"), Path("build/o.tex")
+    )
+
+    assert "--pdf-engine" not in command
+    assert command[command.index("--to") + 1] == "latex"
+    assert command[-2:] == ["--output", "build/o.tex"]
+
+
+def test_build_command_reads_json_bundles_as_pandoc_ast() -> None:
+    command = build_command(
+        Path("bundle.json"), Path("style.yaml"), Path("t.tex"), Path("o.pdf")
+    )
+
+    assert command[command.index("--from") + 1] == "json"
+
+
 def test_render_raises_on_failure(monkeypatch: pytest.MonkeyPatch) -> None:
     def fake_popen(*args, **kwargs):  # type: ignore[no-untyped-def]
         return _StubProcess(returncode=1, output="pandoc error")
@@ -113,3 +153,248 @@ def test_render_respects_existing_texmfvar(
     render(Path("bundle.md"), Path("style.yaml"), Path("template.tex"), Path("out.pdf"))
 
     assert captured_env.get("TEXMFVAR") == str(tmp_path / "cache")
+
+
+def _install_fake_pandoc(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, script: str
+) -> None:
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir(exist_ok=True)
+    pandoc = bin_dir / "pandoc"
+    pandoc.write_text("#!/bin/sh\n" + script, encoding="utf-8")
+    pandoc.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}:{Path('/bin')}:{Path('/usr/bin')}")
+    monkeypatch.setenv("TEXMFVAR", str(tmp_path / "texmf-var"))
+
+
+def test_render_async_streams_output_to_log(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    _install_fake_pandoc(monkeypatch, tmp_path, 'echo "pass 1"\necho "pass 2"\n')
+    log_file = tmp_path / "logs" / "render.log"
+
+    asyncio.run(
+        render_async(
+            Path("bundle.md"),
+            Path("style.yaml"),
+            Path("template.tex"),
+            Path("out.pdf"),
+            log_file=log_file,
+        )
+    )
+
+    assert log_file.read_text(encoding="utf-8") == "pass 1\npass 2\n"
+
+
+def test_render_async_raises_on_failure(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    _install_fake_pandoc(monkeypatch, tmp_path, 'echo "xelatex error"\nexit 43\n')
+
+    with pytest.raises(RuntimeError) as excinfo:
+        asyncio.run(
+            render_async(
+                Path("bundle.md"), Path("style.yaml"), Path("t.tex"), Path("o.pdf")
+            )
+        )
+
+    assert "code 43" in str(excinfo.value)
+    assert "xelatex error" in str(excinfo.value)
+
+
+def test_render_async_kills_process_group_on_timeout(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    _install_fake_pandoc(monkeypatch, tmp_path, "sleep 30 &\nwait\n")
+
+    started = time.monotonic()
+    with pytest.raises(RuntimeError, match="timed out"):
+        asyncio.run(
+            render_async(
+                Path("bundle.md"),
+                Path("style.yaml"),
+                Path("t.tex"),
+                Path("o.pdf"),
+                timeout=0.5,
+            )
+        )
+
+    assert time.monotonic() - started < 10
+
+
+def test_render_async_timeout_covers_format_fallback(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    # With the format the fake xelatex rejects it after a while; the retry
+    # without the format hangs and must only get the rest of the timeout.
+    script = (
+        'case "$*" in *-fmt=*) sleep 0.8; echo "bad format file"; exit 1;; esac\n'
+        "sleep 30 &\nwait\n"
+    )
+    _install_fake_pandoc(monkeypatch, tmp_path, script)
+    fmt = tmp_path / "formats" / "preamble.fmt"
+    monkeypatch.setattr(pandoc_runner, "_precompiled_format", lambda *args: fmt)
+
+    started = time.monotonic()
+    with pytest.raises(RuntimeError, match="timed out"):
+        asyncio.run(
+            render_async(
+                Path("bundle.md"),
+                Path("style.yaml"),
+                Path("t.tex"),
+                Path("o.pdf"),
+                timeout=1.2,
+            )
+        )
+
+    assert time.monotonic() - started < 1.9
+    assert fmt.with_suffix(".failed").read_text(encoding="utf-8").strip() == (
+        "bad format file"
+    )
+
+
+def test_render_many_limits_concurrency_and_collects_errors(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    running = tmp_path / "running"
+    running.mkdir()
+    script = (
+        'out="$(eval echo \\${$#})"\n'
+        'marker="' + str(running) + '/$$"\n'
+        'touch "$marker"\n'
+        'ls "' + str(running) + '" | wc -l >> "$out"\n'
+        "sleep 0.2\n"
+        'rm "$marker"\n'
+        'case "$out" in *fail*) exit 1;; esac\n'
+    )
+    _install_fake_pandoc(monkeypatch, tmp_path, script)
+    outputs = [tmp_path / name for name in ("a.txt", "b.txt", "fail.txt", "c.txt")]
+    jobs = [
+        RenderJob(Path("bundle.md"), Path("style.yaml"), Path("t.tex"), output)
+        for output in outputs
+    ]
+
+    results = asyncio.run(render_many(jobs, concurrency=2))
+
+    assert [result is None for result in results] == [True, True, False, True]
+    assert isinstance(results[2], RuntimeError)
+    observed = [int(path.read_text().strip()) for path in outputs]
+    assert max(observed) <= 2
+
+
+# Pandoc copies the bundle into .tex; xelatex writes the headings into .aux
+# and the previous .aux into .toc, so the TOC lags one pass behind.
+_LATEX_PANDOC = """
+while [ $# -gt 0 ]; do
+  case "$1" in --output) out="$2"; shift;; esac
+  bundle="${bundle:-$1}"
+  shift
+done
+cat "$bundle" > "$out"
+"""
+
+_FAKE_XELATEX = """#!/bin/sh
+echo pass >> "$XELATEX_LOG"
+for arg; do tex="$arg"; done
+base="${tex%.tex}"
+if grep -q BROKEN "$tex"; then echo "! Undefined control sequence."; exit 1; fi
+if [ -f "$base.aux" ]; then cp "$base.aux" "$base.toc"; else : > "$base.toc"; fi
+grep '^#' "$tex" > "$base.aux" || true
+printf '%%PDF-1.4\\n' > "$base.pdf"
+"""
+
+
+def _install_fake_latex(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Path:
+    _install_fake_pandoc(monkeypatch, tmp_path, _LATEX_PANDOC)
+    xelatex = tmp_path / "bin" / "xelatex"
+    xelatex.write_text(_FAKE_XELATEX, encoding="utf-8")
+    xelatex.chmod(0o755)
+    passes_log = tmp_path / "passes.log"
+    monkeypatch.setenv("XELATEX_LOG", str(passes_log))
+    return passes_log
+
+
+def _latex_passes(
+    tmp_path: Path, bundle_text: str, build_dir: Path, output: Path
+) -> int:
+    bundle = tmp_path / "bundle.md"
+    bundle.write_text(bundle_text, encoding="utf-8")
+    return render_latex(
+        bundle,
+        Path("style.yaml"),
+        Path("template.tex"),
+        output,
+        build_dir=build_dir,
+        precompiled=False,
+    )
+
+
+def test_render_latex_reruns_until_aux_files_stabilise(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    _install_fake_latex(monkeypatch, tmp_path)
+    build_dir = tmp_path / "build"
+    output = tmp_path / "out" / "guide.pdf"
+
+    first = _latex_passes(tmp_path, "# One\n\ntext\n", build_dir, output)
+    unchanged = _latex_passes(tmp_path, "# One\n\nedited\n", build_dir, output)
+    restructured = _latex_passes(tmp_path, "# One\n\n# Two\n", build_dir, output)
+
+    assert (first, unchanged, restructured) == (3, 1, 3)
+    assert output.read_bytes().startswith(b"%PDF")
+    assert (build_dir / "guide.tex").read_text(encoding="utf-8") == "# One\n\n# Two\n"
+    assert (build_dir / "guide.toc").exists()
+
+
+def test_render_latex_stops_after_max_passes(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    _install_fake_latex(monkeypatch, tmp_path)
+    bundle = tmp_path / "bundle.md"
+    bundle.write_text("# One\n", encoding="utf-8")
+
+    passes = render_latex(
+        bundle,
+        Path("style.yaml"),
+        Path("template.tex"),
+        tmp_path / "guide.pdf",
+        build_dir=tmp_path / "build",
+        precompiled=False,
+        max_passes=2,
+    )
+
+    assert passes == 2
+
+
+def test_render_latex_records_xelatex_stage(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    _install_fake_latex(monkeypatch, tmp_path)
+    bundle = tmp_path / "bundle.md"
+    bundle.write_text("# One\n", encoding="utf-8")
+    metrics = Metrics()
+
+    passes = render_latex(
+        bundle,
+        Path("style.yaml"),
+        Path("template.tex"),
+        tmp_path / "guide.pdf",
+        build_dir=tmp_path / "build",
+        precompiled=False,
+        metrics=metrics,
+    )
+
+    assert [stage.name for stage in metrics.stages] == ["xelatex"]
+    assert metrics.counters == {"xelatex_passes": passes}
+
+
+def test_render_latex_reports_xelatex_errors(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    _install_fake_latex(monkeypatch, tmp_path)
+
+    with pytest.raises(RuntimeError, match="xelatex failed with code 1") as excinfo:
+        _latex_passes(tmp_path, "BROKEN\n", tmp_path / "build", tmp_path / "o.pdf")
+
+    assert "Undefined control sequence" in str(excinfo.value)
+    assert not (tmp_path / "o.pdf").exists()
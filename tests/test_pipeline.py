@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 from collections.abc import Callable
+import os
 import shutil
+import time
+from dataclasses import replace
 from pathlib import Path
 from typing import Any, cast
 
@@ -19,7 +22,16 @@ from md2pdf.pipeline import (
     merge_warnings,
     prepare_params,
     render_pdf,
+    render_pdf_incremental,
+    prepare_batch_params,
+    run_batch,
+    run_preview,
+    select_preview,
+    split_top_level_sections,
 )
+from md2pdf.artifacts import DirectoryStore
+from md2pdf.imageprep import ImagePrepSettings
+from md2pdf.metrics import Metrics
 from md2pdf.reporting import StructureWarning
 
 
@@ -112,6 +124,21 @@ def test_collect_markdown_accumulates_warnings(tmp_path: Path) -> None:
     assert any(w.code == "MISSING_INDEX" for w in collection.warnings[1:])
 
 
+def test_collect_markdown_reuses_walk_manifest(tmp_path: Path) -> None:
+    md_root = tmp_path / "005.rosa-virt"
+    md_root.mkdir()
+    (md_root / "010000.some.md").write_text("content")
+    past = time.time() - 60
+    os.utime(md_root, (past, past))
+    cache_dir = tmp_path / "cache"
+
+    first = collect_markdown(md_root, cache_dir=cache_dir)
+    second = collect_markdown(md_root, cache_dir=cache_dir)
+
+    assert (cache_dir / "005.rosa-virt.walk.json").exists()
+    assert second == first == collect_markdown(md_root)
+
+
 def test_prepare_params_merges_config_and_overrides(tmp_path: Path) -> None:
     md_root, images_root = _prepare_project_layout(tmp_path)
     config_path = tmp_path / "config" / "project.yml"
@@ -128,6 +155,8 @@ def test_prepare_params_merges_config_and_overrides(tmp_path: Path) -> None:
     assert params.images_root == images_root
     assert params.output_pdf == tmp_path / "output" / "report.pdf"
     assert params.bundle_path == tmp_path / "output" / "report.bundle.md"
+    assert params.cache_dir == tmp_path / "output" / ".md2pdf-cache"
+    assert pipeline.latex_build_dir(params) == params.cache_dir / "latex" / "report"
     assert params.metadata["title"] == "Override"
     assert params.metadata["doctype"] == "Черновик"
     assert params.metadata["author"] == "User"
@@ -178,6 +207,295 @@ def test_prepare_params_validates_metadata_override_type(tmp_path: Path) -> None
         )
 
 
+def test_prepare_batch_params_discovers_document_roots(tmp_path: Path) -> None:
+    md_root, _ = _prepare_project_layout(tmp_path)
+    (md_root / "0.index.md").write_text("# CU", encoding="utf-8")
+    second_root = tmp_path / "content" / "02.ekspluatatsiya"
+    second_root.mkdir()
+    (tmp_path / "content" / ".git").mkdir()
+    config_path = tmp_path / "config" / "project.yml"
+    _write_config(config_path)
+
+    batch = prepare_batch_params(config_path, metadata_overrides={"title": "Пакет"})
+
+    assert [params.md_root for params in batch] == [md_root, second_root]
+    assert [params.output_pdf for params in batch] == [
+        tmp_path / "output" / "cu.pdf",
+        tmp_path / "output" / "ekspluatatsiya.pdf",
+    ]
+    assert all(params.metadata["title"] == "Пакет" for params in batch)
+
+
+def test_run_batch_aggregates_results_and_failures(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    md_root, _ = _prepare_project_layout(tmp_path)
+    (md_root / "0.index.md").write_text("# CU", encoding="utf-8")
+    (tmp_path / "content" / "004.broken").mkdir()
+    config_path = tmp_path / "config" / "project.yml"
+    _write_config(config_path)
+
+    def fake_render(
+        bundle_path: Path,
+        style_path: Path,
+        template_path: Path,
+        output_path: Path,
+        *args: object,
+        **kwargs: object,
+    ) -> None:
+        if "broken" in bundle_path.name:
+            raise RuntimeError("Pandoc failed")
+        output_path.write_text("pdf", encoding="utf-8")
+
+    monkeypatch.setattr(pipeline, "_render", fake_render)
+
+    report = run_batch(prepare_batch_params(config_path), jobs=1)
+
+    assert [result.output_pdf for result in report.results] == [
+        tmp_path / "output" / "cu.pdf"
+    ]
+    assert report.failures == ((tmp_path / "content" / "004.broken", "Pandoc failed"),)
+    assert report.warnings == ()
+
+
+def test_run_batch_uses_per_document_logs_and_collects_any_error(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    md_root, _ = _prepare_project_layout(tmp_path)
+    (md_root / "0.index.md").write_text("# CU", encoding="utf-8")
+    (tmp_path / "content" / "004.broken").mkdir()
+    config_path = tmp_path / "config" / "project.yml"
+    _write_config(config_path)
+    log_file = tmp_path / "render.log"
+    stale = tmp_path / "render.cu.log"
+    stale.write_text("previous run\n", encoding="utf-8")
+    logs: list[Path | None] = []
+
+    def fake_run_document(params: PipelineParams, **kwargs: Any) -> PipelineResult:
+        logs.append(kwargs["log_file"])
+        if "broken" in params.md_root.name:
+            raise OSError("disk full")
+        return PipelineResult(params.bundle_path, params.output_pdf, ())
+
+    monkeypatch.setattr(pipeline, "run_document", fake_run_document)
+
+    report = run_batch(prepare_batch_params(config_path), log_file=log_file)
+
+    assert logs == [tmp_path / "render.cu.log", tmp_path / "render.broken.log"]
+    assert not stale.exists()
+    assert len(report.results) == 1
+    assert report.failures == ((tmp_path / "content" / "004.broken", "disk full"),)
+
+
+def _make_preview_tree(md_root: Path) -> None:
+    setup = md_root / "02.setup"
+    setup.mkdir(parents=True)
+    (md_root / "0.index.md").write_text("# Guide\n\nIntro\n", encoding="utf-8")
+    (md_root / "010000.about.md").write_text("# About\n\nText\n", encoding="utf-8")
+    (setup / "0.index.md").write_text("# Setup\n\nSteps\n", encoding="utf-8")
+    (setup / "020100.install.md").write_text(
+        "# Install\n\nRun it\n", encoding="utf-8"
+    )
+
+
+def test_select_preview_matches_subtrees_and_globs(tmp_path: Path) -> None:
+    md_root = tmp_path / "content" / "003.cu"
+    _make_preview_tree(md_root)
+    order = collect_markdown(md_root).order
+
+    assert select_preview(order, md_root, ["02.setup"]) == order[2:]
+    assert select_preview(order, md_root, [str(md_root / "02.setup")]) == order[2:]
+    assert select_preview(order, md_root, ["*/0*.install.md", "010000.*"]) == [
+        order[1],
+        order[3],
+    ]
+    with pytest.raises(ValueError, match="No markdown files match"):
+        select_preview(order, md_root, ["99.*"])
+
+
+def test_select_preview_resolves_relative_paths_against_md_root(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    md_root = tmp_path / "content" / "003.cu"
+    _make_preview_tree(md_root)
+    order = collect_markdown(md_root).order
+    # Одноимённая папка в текущем каталоге не должна уводить за md_root.
+    (tmp_path / "02.setup").mkdir()
+    monkeypatch.chdir(tmp_path)
+
+    assert select_preview(order, md_root, ["02.setup"]) == order[2:]
+    assert select_preview(order, md_root, ["content/003.cu/02.setup"]) == order[2:]
+    with pytest.raises(ValueError, match="outside of"):
+        select_preview(order, md_root, ["../../02.setup"])
+    with pytest.raises(ValueError, match="outside of"):
+        select_preview(order, md_root, [str(tmp_path / "02.setup")])
+
+
+def test_split_top_level_sections_groups_root_files_and_directories(
+    tmp_path: Path,
+) -> None:
+    md_root = tmp_path / "content" / "003.cu"
+    _make_preview_tree(md_root)
+    order = collect_markdown(md_root).order
+
+    assert split_top_level_sections(order, md_root) == [
+        ("index", [order[0]]),
+        ("about", [order[1]]),
+        ("setup", order[2:]),
+    ]
+
+
+def test_run_preview_renders_slice_with_full_document_levels(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    md_root, images_root = _prepare_project_layout(tmp_path)
+    _make_preview_tree(md_root)
+    params = PipelineParams(
+        md_root=md_root,
+        images_root=images_root,
+        style=tmp_path / "styles" / "base.yaml",
+        template=tmp_path / "templates" / "gost.tex",
+        filters=(),
+        metadata={},
+        bundle_path=tmp_path / "output" / "cu.bundle.md",
+        output_pdf=tmp_path / "output" / "cu.pdf",
+    )
+    rendered: list[list[Any]] = []
+
+    async def fake_render_many(jobs: Any, *, concurrency: int) -> list[Any]:
+        jobs = list(jobs)
+        rendered.append(jobs)
+        for job in jobs:
+            job.output.write_text("pdf", encoding="utf-8")
+        return [None] * len(jobs)
+
+    monkeypatch.setattr(pipeline, "render_many", fake_render_many)
+
+    report = run_preview(params, ["02.setup/020100.install.md"])
+
+    preview = tmp_path / "output" / "cu.preview.pdf"
+    bundle_text = preview.with_suffix(".bundle.md").read_text(encoding="utf-8")
+    assert [result.output_pdf for result in report.results] == [preview]
+    assert "\n## Install\n" in bundle_text
+    assert "Intro" not in bundle_text
+    assert rendered[0][0].toc is False
+
+    log_file = tmp_path / "logs" / "render.log"
+    stale = tmp_path / "logs" / "render.02.about.log"
+    stale.parent.mkdir()
+    stale.write_text("old", encoding="utf-8")
+    split_report = run_preview(params, split=True, jobs=2, log_file=log_file)
+    parts = tmp_path / "output" / "cu.parts"
+    assert [result.output_pdf for result in split_report.results] == [
+        parts / "01.index.pdf",
+        parts / "02.about.pdf",
+        parts / "03.setup.pdf",
+    ]
+    assert len(rendered[1]) == 3
+    assert [job.log_file.name for job in rendered[1]] == [
+        "render.01.index.log",
+        "render.02.about.log",
+        "render.03.setup.log",
+    ]
+    assert not stale.exists()
+
+    run_preview(params, split=True, jobs=2)
+    assert len(rendered) == 2
+
+
+def test_run_preview_renders_transformed_ast(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    md_root, images_root = _prepare_project_layout(tmp_path)
+    _make_preview_tree(md_root)
+    params = PipelineParams(
+        md_root=md_root,
+        images_root=images_root,
+        style=tmp_path / "styles" / "base.yaml",
+        template=tmp_path / "templates" / "gost.tex",
+        filters=(),
+        metadata={},
+        bundle_path=tmp_path / "output" / "cu.bundle.md",
+        output_pdf=tmp_path / "output" / "cu.pdf",
+        transforms=("pictogram",),
+    )
+    built: list[Any] = []
+    jobs: list[Any] = []
+
+    def fake_build_ast(bundle: Path, destination: Path, cache: Any, **_: Any) -> Path:
+        built.append(cache)
+        destination.write_text("{}", encoding="utf-8")
+        return destination
+
+    async def fake_render_many(pending: Any, *, concurrency: int) -> list[Any]:
+        jobs.extend(pending)
+        for job in jobs:
+            job.output.write_text("pdf", encoding="utf-8")
+        return [None] * len(jobs)
+
+    monkeypatch.setattr(pipeline, "build_ast", fake_build_ast)
+    monkeypatch.setattr(pipeline, "render_many", fake_render_many)
+
+    metrics = Metrics()
+    run_preview(params, metrics=metrics)
+
+    assert [stage.name for stage in metrics.stages] == ["walk", "bundle", "render"]
+    assert metrics.counters["files_processed"] == 4
+    assert "ast_cache_misses" in metrics.counters
+    assert pipeline.section_ast_cache(replace(params, transforms=())) is None
+    assert [job.bundle.name for job in jobs] == ["cu.preview.bundle.json"]
+    assert built[0].root == tmp_path / "output" / ".md2pdf-cache" / "ast"
+    assert built[0].transforms_key
+
+
+def test_run_preview_rerenders_ast_preview_when_image_changes(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    md_root, images_root = _prepare_project_layout(tmp_path)
+    _make_preview_tree(md_root)
+    (md_root / "0.index.md").write_text(
+        "# Guide\n\n![Экран](shot.png)\n", encoding="utf-8"
+    )
+    (images_root / "cu").mkdir()
+    image = images_root / "cu" / "shot.png"
+    image.write_bytes(b"old")
+    params = PipelineParams(
+        md_root=md_root,
+        images_root=images_root,
+        style=tmp_path / "styles" / "base.yaml",
+        template=tmp_path / "templates" / "gost.tex",
+        filters=(),
+        metadata={},
+        bundle_path=tmp_path / "output" / "cu.bundle.md",
+        output_pdf=tmp_path / "output" / "cu.pdf",
+        transforms=("pictogram",),
+    )
+    rendered: list[list[Any]] = []
+
+    def fake_build_ast(bundle: Path, destination: Path, cache: Any, **_: Any) -> Path:
+        destination.write_text("{}", encoding="utf-8")
+        return destination
+
+    async def fake_render_many(jobs: Any, *, concurrency: int) -> list[Any]:
+        jobs = list(jobs)
+        rendered.append(jobs)
+        for job in jobs:
+            job.output.write_text("pdf", encoding="utf-8")
+        return [None] * len(jobs)
+
+    monkeypatch.setattr(pipeline, "build_ast", fake_build_ast)
+    monkeypatch.setattr(pipeline, "render_many", fake_render_many)
+
+    run_preview(params, ["0.index.md"])
+    run_preview(params, ["0.index.md"])
+    assert len(rendered) == 1
+
+    image.write_bytes(b"new")
+    run_preview(params, ["0.index.md"])
+    assert len(rendered) == 2
+    assert rendered[1][0].bundle.name == "cu.preview.bundle.json"
+
+
 def test_assemble_bundle_builds_and_writes(tmp_path: Path) -> None:
     destination = tmp_path / "bundle.md"
     md_root = Path(__file__).parent / "fixtures" / "bundle" / "003.cu"
@@ -196,6 +514,112 @@ def test_assemble_bundle_builds_and_writes(tmp_path: Path) -> None:
     assert 'title: "Куратор"' in result.content
 
 
+def test_assemble_bundle_streams_lazy_content(tmp_path: Path) -> None:
+    md_root = Path(__file__).parent / "fixtures" / "bundle" / "003.cu"
+    eager = assemble_bundle(
+        _fixture_order(),
+        tmp_path / "eager.md",
+        image_resolver=_fixture_resolver(md_root),
+    )
+
+    lazy = assemble_bundle(
+        _fixture_order(),
+        tmp_path / "lazy.md",
+        image_resolver=_fixture_resolver(md_root),
+        lazy_content=True,
+    )
+
+    assert lazy == BundleArtifacts(path=tmp_path / "lazy.md", warnings=eager.warnings)
+    assert (tmp_path / "lazy.md").read_bytes() == (tmp_path / "eager.md").read_bytes()
+    assert lazy.content == eager.content
+
+
+def test_assemble_bundle_points_links_at_prepared_images(tmp_path: Path) -> None:
+    image_module = pytest.importorskip("PIL.Image")
+    md_root = tmp_path / "content" / "003.cu"
+    md_root.mkdir(parents=True)
+    (md_root / "0.index.md").write_text(
+        "# CU\n\n![Экран](big.png)\n\n![Схема](diagram.svg)\n", encoding="utf-8"
+    )
+    images_root = tmp_path / "public" / "images"
+    (images_root / "cu").mkdir(parents=True)
+    image_module.new("RGB", (4000, 2000), "white").save(images_root / "cu" / "big.png")
+    metrics = Metrics()
+
+    result = assemble_bundle(
+        [md_root / "0.index.md"],
+        tmp_path / "out" / "cu.bundle.md",
+        images_root=images_root,
+        cache_dir=tmp_path / "cache",
+        lazy_content=True,
+        metrics=metrics,
+        image_prep=ImagePrepSettings(),
+    )
+
+    content = result.content
+    prepared = next((tmp_path / "cache" / "images").glob("*/*.png"))
+    assert f"![Экран]({prepared})" in content
+    assert f"![Схема]({images_root / 'cu' / 'diagram.svg'})" in content
+    assert metrics.counters["images_prepared"] == 1
+
+
+def test_assemble_bundle_prepares_images_while_streaming(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    image_module = pytest.importorskip("PIL.Image")
+    md_root = tmp_path / "content" / "003.cu"
+    md_root.mkdir(parents=True)
+    images_root = tmp_path / "public" / "images"
+    (images_root / "cu").mkdir(parents=True)
+    order = []
+    for index in range(40):
+        path = md_root / f"{index + 1:02d}0000.part{index}.md"
+        path.write_text(f"# Part {index}\n\n![Экран](big.png)\n", encoding="utf-8")
+        order.append(path)
+    image_module.new("RGB", (4000, 2000), "white").save(images_root / "cu" / "big.png")
+
+    def no_rewrite(*args: Any, **kwargs: Any) -> Path:
+        raise AssertionError("the bundle must not be written twice")
+
+    monkeypatch.setattr(pipeline, "write_bundle", no_rewrite)
+    result = assemble_bundle(
+        order,
+        tmp_path / "out" / "cu.bundle.md",
+        image_resolver=lambda md_path, target: images_root / "cu" / target,
+        lazy_content=True,
+        image_prep=ImagePrepSettings(),
+    )
+
+    lines = result.path.read_text(encoding="utf-8").split("\n")
+    prepared = next(
+        (tmp_path / "out" / pipeline.CACHE_DIRNAME / "images").glob("*/*.png")
+    )
+    assert result.content.count(f"![Экран]({prepared})") == 40
+    assert [lines[line] for line in result.section_lines[1:]] == [
+        f"# Part {index}" for index in range(40)
+    ]
+
+
+def test_assemble_bundle_records_metrics(tmp_path: Path) -> None:
+    md_root = Path(__file__).parent / "fixtures" / "bundle" / "003.cu"
+    metrics = Metrics()
+
+    result = assemble_bundle(
+        _fixture_order(),
+        tmp_path / "bundle.md",
+        image_resolver=_fixture_resolver(md_root),
+        metrics=metrics,
+    )
+
+    assert metrics.counters == {
+        "images_rewritten": 3,
+        "images_missing": 3,
+        "files_processed": 3,
+        "bundle_bytes": result.path.stat().st_size,
+    }
+    assert [stage.name for stage in metrics.all_stages()] == ["image_rewriting"]
+
+
 def test_assemble_bundle_uses_custom_image_resolver(tmp_path: Path) -> None:
     calls: list[tuple[Path, str]] = []
 
@@ -254,6 +678,104 @@ def test_assemble_bundle_rewrites_sign_image_with_images_root(tmp_path: Path) ->
     assert "(/images/" not in result.content
 
 
+def test_assemble_bundle_reuses_cached_sections(tmp_path: Path) -> None:
+    md_root = tmp_path / "content" / "003.cu"
+    shutil.copytree(Path(__file__).parent / "fixtures" / "bundle" / "003.cu", md_root)
+    order = [
+        md_root / "0.index.md",
+        md_root / "010000.overview.md",
+        md_root / "01.section" / "010100.chapter.md",
+    ]
+    cache_dir = tmp_path / "cache"
+
+    first = assemble_bundle(
+        order, tmp_path / "bundle.md", images_root="public/images", cache_dir=cache_dir
+    )
+    (md_root / "010000.overview.md").write_text(
+        "# Новый заголовок\n\nОбновлено.", encoding="utf-8"
+    )
+    second = assemble_bundle(
+        order, tmp_path / "bundle.md", images_root="public/images", cache_dir=cache_dir
+    )
+    uncached = assemble_bundle(
+        order, tmp_path / "plain.md", images_root="public/images"
+    )
+
+    assert (cache_dir / "bundle.sections.json").exists()
+    assert "Обзор возможностей" in first.content
+    assert "# Новый заголовок" in second.content
+    assert second.content == uncached.content
+
+
+def test_assemble_bundle_counts_images_on_section_cache_hits(tmp_path: Path) -> None:
+    md_root = tmp_path / "content" / "003.cu"
+    shutil.copytree(Path(__file__).parent / "fixtures" / "bundle" / "003.cu", md_root)
+    order = [
+        md_root / "0.index.md",
+        md_root / "010000.overview.md",
+        md_root / "01.section" / "010100.chapter.md",
+    ]
+    counts = []
+    for _ in range(2):
+        metrics = Metrics()
+        assemble_bundle(
+            order,
+            tmp_path / "bundle.md",
+            images_root="public/images",
+            cache_dir=tmp_path / "cache",
+            metrics=metrics,
+        )
+        counts.append(
+            (
+                metrics.counters["images_rewritten"],
+                metrics.counters["section_cache_hits"],
+            )
+        )
+
+    assert counts == [(3, 0), (3, 3)]
+
+
+def test_assemble_bundle_reports_missing_images(tmp_path: Path) -> None:
+    md_root = tmp_path / "content" / "003.cu"
+    md_root.mkdir(parents=True)
+    index = md_root / "0.index.md"
+    index.write_text(
+        '# CU\n\n![Есть](present.png)\n\n<img src="absent.png">\n',
+        encoding="utf-8",
+    )
+    images_root = tmp_path / "public" / "images"
+    (images_root / "cu").mkdir(parents=True)
+    (images_root / "cu" / "present.png").write_bytes(b"png")
+    expected = (
+        StructureWarning(
+            code="MISSING_IMAGE",
+            path=index,
+            message=f"Нет картинки {images_root / 'cu' / 'absent.png'}",
+        ),
+    )
+
+    first = assemble_bundle(
+        [index], tmp_path / "bundle.md", images_root=images_root, cache_dir=tmp_path
+    )
+    cached = assemble_bundle(
+        [index], tmp_path / "bundle.md", images_root=images_root, cache_dir=tmp_path
+    )
+
+    assert first.warnings == expected
+    assert cached.warnings == expected
+    with pytest.raises(ValueError, match="absent.png"):
+        assemble_bundle(
+            [index],
+            tmp_path / "bundle.md",
+            images_root=images_root,
+            fail_on_missing_images=True,
+        )
+    unchecked = assemble_bundle(
+        [index], tmp_path / "bundle.md", images_root=images_root, check_images=False
+    )
+    assert unchecked.warnings == ()
+
+
 def test_render_pdf_invokes_pandoc_runner(
     monkeypatch: pytest.MonkeyPatch, tmp_path: Path
 ) -> None:
@@ -276,6 +798,7 @@ def test_render_pdf_invokes_pandoc_runner(
         filter_paths: tuple[Path, ...] | list[Path] = (),
         verbose: bool = False,
         log_file: Path | None = None,
+        toc: bool = True,
     ) -> None:
         captured["args"] = (
             bundle_path,
@@ -338,6 +861,86 @@ def test_render_pdf_validates_bundle(tmp_path: Path) -> None:
         )
 
 
+def test_render_pdf_incremental_skips_unchanged_inputs(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    bundle = tmp_path / "bundle.md"
+    bundle.write_text("content", encoding="utf-8")
+    style = tmp_path / "style.yaml"
+    style.write_text("", encoding="utf-8")
+    template = tmp_path / "template.tex"
+    template.write_text("", encoding="utf-8")
+    output = tmp_path / "out" / "report.pdf"
+    calls: list[Path] = []
+
+    def fake_render(bundle_path: Path, *args: object, **kwargs: object) -> None:
+        calls.append(bundle_path)
+        output.write_text("pdf", encoding="utf-8")
+
+    monkeypatch.setattr(pipeline, "_render", fake_render)
+
+    def run(force: bool = False) -> tuple[Path, bool]:
+        return render_pdf_incremental(
+            bundle, style=style, template=template, output=output, force=force
+        )
+
+    assert run() == (output, True)
+    assert run() == (output, False)
+    assert run(force=True) == (output, True)
+
+    bundle.write_text("changed", encoding="utf-8")
+    assert run() == (output, True)
+    assert len(calls) == 3
+
+
+def test_render_pdf_incremental_shares_pdfs_through_artifact_store(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    bundle = tmp_path / "bundle.md"
+    bundle.write_text("content", encoding="utf-8")
+    style = tmp_path / "style.yaml"
+    style.write_text("", encoding="utf-8")
+    template = tmp_path / "template.tex"
+    template.write_text("", encoding="utf-8")
+    calls: list[Path] = []
+
+    def fake_render(
+        bundle_path: Path,
+        style_path: Path,
+        template_path: Path,
+        output: Path,
+        *args: object,
+        **kwargs: object,
+    ) -> None:
+        calls.append(output)
+        output.write_text("pdf", encoding="utf-8")
+
+    monkeypatch.setattr(pipeline, "_render", fake_render)
+    store = DirectoryStore(tmp_path / "artifacts")
+    metrics = Metrics()
+
+    def run(output: Path) -> tuple[Path, bool]:
+        return render_pdf_incremental(
+            bundle,
+            style=style,
+            template=template,
+            output=output,
+            artifacts=store,
+            metrics=metrics,
+        )
+
+    first_agent = tmp_path / "agent-1" / "report.pdf"
+    second_agent = tmp_path / "agent-2" / "report.pdf"
+
+    assert run(first_agent) == (first_agent, True)
+    assert run(second_agent) == (second_agent, False)
+    assert run(second_agent) == (second_agent, False)
+
+    assert calls == [first_agent]
+    assert second_agent.read_text(encoding="utf-8") == "pdf"
+    assert metrics.counters == {"artifact_cache_misses": 1, "artifact_cache_hits": 1}
+
+
 def test_merge_warnings_deduplicates_and_preserves_order() -> None:
     first = StructureWarning(
         code="MISSING_INDEX",
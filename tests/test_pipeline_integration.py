@@ -40,6 +40,7 @@ def test_pipeline_runs_end_to_end(
         filter_paths: tuple[Path, ...] | list[Path] = (),
         verbose: bool = False,
         log_file: Path | None = None,
+        toc: bool = True,
     ) -> None:
         render_calls["args"] = (
             bundle_path,
@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import json
+import threading
+import urllib.error
+import urllib.request
+from collections.abc import Iterator
+from dataclasses import replace
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from md2pdf import pipeline
+from md2pdf.pandoc_runner import RenderJob
+from md2pdf.server import (
+    TOKEN_ENV,
+    RenderServer,
+    job_from_payload,
+    job_to_payload,
+    parse_address,
+    read_token,
+    submit_render,
+)
+
+
+class _Renderer:
+    def __init__(self) -> None:
+        self.calls: list[tuple[Path, dict[str, Any]]] = []
+        self.release = threading.Event()
+        self.release.set()
+        self.started = threading.Semaphore(0)
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(
+        self,
+        bundle: Path,
+        style: Path,
+        template: Path,
+        output: Path,
+        filters: tuple[Path, ...],
+        **kwargs: Any,
+    ) -> None:
+        with self._lock:
+            self.calls.append((bundle, kwargs))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        self.started.release()
+        self.release.wait(5)
+        with self._lock:
+            self.active -= 1
+        if bundle.name == "broken.md":
+            raise RuntimeError("Pandoc failed with code 43: boom")
+        if bundle.name == "invalid.md":
+            raise ValueError("Bundle file is empty")
+        if bundle.name == "crash.md":
+            raise LookupError("unexpected")
+        output.write_bytes(b"%PDF-1.4\n")
+
+
+@pytest.fixture
+def renderer() -> _Renderer:
+    return _Renderer()
+
+
+@pytest.fixture
+def running_server(
+    tmp_path: Path, renderer: _Renderer, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[RenderServer]:
+    server = RenderServer(
+        ("127.0.0.1", 0),
+        concurrency=1,
+        max_queue=1,
+        state_dir=tmp_path / "state",
+        roots=(tmp_path,),
+        renderer=renderer,
+    )
+    monkeypatch.setenv(TOKEN_ENV, server.token)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    renderer.release.set()
+    server.shutdown()
+    server.server_close()
+    thread.join(5)
+
+
+def _job(tmp_path: Path, name: str = "bundle.md") -> RenderJob:
+    bundle = tmp_path / name
+    bundle.write_text("# Title\n", encoding="utf-8")
+    return RenderJob(
+        bundle=bundle,
+        style=tmp_path / "style.yaml",
+        template=tmp_path / "template.tex",
+        output=tmp_path / f"{bundle.stem}.pdf",
+        filters=(tmp_path / "filter.lua",),
+        toc=False,
+    )
+
+
+def test_job_payload_round_trip(tmp_path: Path) -> None:
+    job = _job(tmp_path)
+
+    assert job_from_payload(job_to_payload(job)) == job
+
+
+@pytest.mark.parametrize(
+    "relative",
+    [
+        {"bundle": "bundle.md"},
+        {"filters": ["/f.lua", "filters/evil.lua"]},
+        {"log_file": "render.log"},
+    ],
+)
+def test_job_from_payload_rejects_relative_paths(relative: dict[str, Any]) -> None:
+    payload = {
+        "bundle": "/b.md",
+        "style": "/s.yaml",
+        "template": "/t.tex",
+        "output": "/o.pdf",
+        **relative,
+    }
+
+    with pytest.raises(ValueError, match="path must be absolute"):
+        job_from_payload(payload)
+
+
+def test_parse_address() -> None:
+    assert parse_address("localhost:8765") == ("localhost", 8765)
+    with pytest.raises(ValueError, match="HOST:PORT"):
+        parse_address("8765")
+
+
+def test_submit_render_uses_shared_tex_state(
+    tmp_path: Path, running_server: RenderServer, renderer: _Renderer
+) -> None:
+    job = _job(tmp_path)
+
+    output = submit_render(running_server.url, job)
+
+    assert output == job.output
+    assert output.read_bytes().startswith(b"%PDF")
+    ((bundle, kwargs),) = renderer.calls
+    assert bundle == job.bundle
+    assert kwargs["toc"] is False
+    assert kwargs["env"]["TEXMFVAR"] == str(tmp_path / "state" / "texmf-var")
+    assert running_server.stats().completed == 1
+
+
+def test_submit_render_reports_pandoc_errors(
+    tmp_path: Path, running_server: RenderServer
+) -> None:
+    with pytest.raises(RuntimeError, match="Pandoc failed with code 43"):
+        submit_render(running_server.url, _job(tmp_path, "broken.md"))
+
+    assert running_server.stats().failed == 1
+
+
+def test_server_limits_concurrency_and_rejects_overflow(
+    tmp_path: Path, running_server: RenderServer, renderer: _Renderer
+) -> None:
+    renderer.release.clear()
+    errors: list[Exception] = []
+
+    def submit(name: str) -> None:
+        try:
+            submit_render(running_server.url, _job(tmp_path, name))
+        except RuntimeError as exc:
+            errors.append(exc)
+
+    first = threading.Thread(target=submit, args=("first.md",))
+    first.start()
+    assert renderer.started.acquire(timeout=5)
+    second = threading.Thread(target=submit, args=("second.md",))
+    second.start()
+    while running_server.stats().queued < 1:
+        pass
+
+    with pytest.raises(RuntimeError, match="Render queue is full"):
+        submit_render(running_server.url, _job(tmp_path, "third.md"))
+
+    renderer.release.set()
+    first.join(5)
+    second.join(5)
+    assert errors == []
+    assert renderer.peak == 1
+    stats = running_server.stats()
+    assert (stats.completed, stats.rejected, stats.queued) == (2, 1, 0)
+
+
+def test_submit_render_reports_unavailable_server(tmp_path: Path) -> None:
+    with pytest.raises(RuntimeError, match="Render server is unavailable"):
+        submit_render("http://127.0.0.1:9", _job(tmp_path), token="t", timeout=5)
+
+
+def test_submit_render_gives_up_after_timeout(
+    tmp_path: Path, running_server: RenderServer, renderer: _Renderer
+) -> None:
+    renderer.release.clear()
+    try:
+        with pytest.raises(RuntimeError, match="did not answer within 0.5 s"):
+            submit_render(running_server.url, _job(tmp_path), timeout=0.5)
+    finally:
+        renderer.release.set()
+
+
+def test_render_pdf_submits_to_server(
+    tmp_path: Path, running_server: RenderServer, renderer: _Renderer
+) -> None:
+    job = _job(tmp_path)
+
+    output = pipeline.render_pdf(
+        job.bundle,
+        style=job.style,
+        template=job.template,
+        output=tmp_path / "out" / "document.pdf",
+        server=running_server.url,
+    )
+
+    assert output.read_bytes().startswith(b"%PDF")
+    assert renderer.calls[0][1]["toc"] is True
+
+
+def _post(
+    server: RenderServer, body: bytes, headers: dict[str, str]
+) -> tuple[int, dict[str, Any]]:
+    request = urllib.request.Request(
+        f"{server.url}/render", data=body, headers=headers, method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.loads(exc.read())
+
+
+def test_server_rejects_unauthenticated_and_non_json_requests(
+    tmp_path: Path, running_server: RenderServer, renderer: _Renderer
+) -> None:
+    body = json.dumps(job_to_payload(_job(tmp_path))).encode("utf-8")
+    bearer = f"Bearer {running_server.token}"
+
+    status_plain, _ = _post(
+        running_server, body, {"Content-Type": "text/plain", "Authorization": bearer}
+    )
+    status_anonymous, _ = _post(
+        running_server, body, {"Content-Type": "application/json"}
+    )
+    status_forged, _ = _post(
+        running_server,
+        body,
+        {"Content-Type": "application/json", "Authorization": "Bearer nope"},
+    )
+
+    assert (status_plain, status_anonymous, status_forged) == (415, 401, 401)
+    assert renderer.calls == []
+
+
+def test_server_rejects_paths_outside_roots(
+    tmp_path: Path, running_server: RenderServer, renderer: _Renderer
+) -> None:
+    job = _job(tmp_path)
+    outside = replace(job, output=tmp_path.parent / "escaped.pdf")
+
+    with pytest.raises(RuntimeError, match="outside of the server roots"):
+        submit_render(running_server.url, outside)
+
+    assert renderer.calls == []
+
+
+def test_server_replies_to_unexpected_render_errors(
+    tmp_path: Path, running_server: RenderServer
+) -> None:
+    with pytest.raises(RuntimeError, match="Bundle file is empty"):
+        submit_render(running_server.url, _job(tmp_path, "invalid.md"))
+    with pytest.raises(RuntimeError, match="Render failed: unexpected"):
+        submit_render(running_server.url, _job(tmp_path, "crash.md"))
+
+    assert running_server.stats().failed == 2
+
+
+def test_server_refuses_non_loopback_address(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="non-loopback"):
+        RenderServer(("0.0.0.0", 0), state_dir=tmp_path / "state")
+
+
+def test_server_token_is_persisted_for_clients(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.delenv(TOKEN_ENV, raising=False)
+    state_dir = tmp_path / "state"
+    with RenderServer(("127.0.0.1", 0), state_dir=state_dir) as first:
+        token = first.token
+    with RenderServer(("127.0.0.1", 0), state_dir=state_dir) as second:
+        assert second.token == token
+
+    assert read_token(state_dir) == token
+    assert (state_dir / "token").stat().st_mode & 0o077 == 0
+    with pytest.raises(RuntimeError, match="token not found"):
+        read_token(tmp_path / "missing")
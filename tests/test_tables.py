@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from textwrap import dedent
+
+from md2pdf.tables import TABLE_WIDTH, convert_collapsible_tables, html_table_to_grid
+
+
+def test_html_table_to_grid_draws_spans_and_header() -> None:
+    html = """
+    <table>
+      <thead><tr><th>Код</th><th>Действие</th></tr></thead>
+      <tbody>
+        <tr><td>E1</td><td rowspan="2">Перезапустить<br>службу</td></tr>
+        <tr><td>E2</td></tr>
+        <tr><td colspan="2">Прочие ошибки</td></tr>
+      </tbody>
+    </table>
+    """
+
+    lines = html_table_to_grid(html).splitlines()
+    column = lines[0].index("+", 1)
+
+    assert {len(line) for line in lines} == {TABLE_WIDTH}
+    assert [line[0] + line[column] for line in lines] == [
+        "++",
+        "||",
+        "++",
+        "||",
+        "++",
+        "||",
+        "++",
+        "| ",
+        "+-",
+    ]
+    assert lines[2].startswith("+===")
+    assert lines[3].endswith("|") and "| Перезапустить\\ " in lines[3]
+    assert lines[4][column:].startswith("+ службу ")
+    assert lines[7].startswith("| Прочие ошибки ")
+
+
+def test_html_table_to_grid_sizes_columns_by_content() -> None:
+    long_text = " ".join(["описание"] * 40)
+    html = (
+        "<table><tr><td>id</td><td>" + long_text + "</td></tr>"
+        "<tr><td>очень-длинный-идентификатор</td><td>x</td></tr></table>"
+    )
+
+    border = html_table_to_grid(html).splitlines()[0]
+    first, second = (len(part) for part in border.strip("+").split("+"))
+
+    assert first == len("очень-длинный-идентификатор") + 3
+    assert second > first
+
+
+def test_html_table_to_grid_escapes_markdown_in_cells() -> None:
+    html = "<table><tr><td>- <em>a_b</em> <strong> </strong>[x] @user</td></tr></table>"
+
+    table = html_table_to_grid(html)
+
+    assert "| \\- *a\\_b* \\[x\\] \\@user" in table
+
+
+def test_convert_collapsible_tables_adds_caption_and_unwraps() -> None:
+    text = dedent(
+        """\
+        До
+
+        ::app-collapsible
+        ---
+        label: “Таблица 12 - Типовые ошибки”
+        ---
+
+        #content
+        <table><tr><td>E1</td></tr></table>
+        ::
+
+        ::app-collapsible
+        #content
+        Просто текст
+        ::
+
+        После
+        """
+    )
+
+    converted = convert_collapsible_tables(text)
+
+    assert converted.startswith("До\n\n+---")
+    assert "\n\nTable: Типовые ошибки\n\nПросто текст\n\nПосле\n" in converted
+    assert "::" not in converted
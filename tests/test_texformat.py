@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+
+from md2pdf import texformat
+from md2pdf.pandoc_runner import render
+
+FAKE_PANDOC = """#!/bin/sh
+echo "$@" >> "$TOOL_LOG"
+case "$1" in --version) echo "pandoc 3.1"; exit 0;; esac
+out=""; template=""; fmt=""
+while [ $# -gt 0 ]; do
+  case "$1" in
+    --output) out="$2"; shift;;
+    --template) template="$2"; shift;;
+    --pdf-engine-opt=-fmt=*) fmt="${1#--pdf-engine-opt=-fmt=}";;
+  esac
+  shift
+done
+case "$out" in
+  *.tex) cat "$template" > "$out";;
+  *)
+    if [ -n "$fmt" ]; then
+      echo "fmt=$fmt formats=$TEXFORMATS" >> "$TOOL_LOG"
+      if [ -n "$REJECT_FORMAT" ]; then
+        echo "Fatal format file error; I'm stymied"; exit 43
+      fi
+    fi
+    printf '%%PDF-1.4\\n' > "$out";;
+esac
+"""
+
+FAKE_XELATEX = """#!/bin/sh
+echo "xelatex $@" >> "$TOOL_LOG"
+case "$1" in --version) echo "XeTeX 3.141592653"; exit 0;; esac
+if [ -n "$FAIL_INI" ]; then echo "! LaTeX Error: File missing"; exit 1; fi
+for arg in "$@"; do
+  case "$arg" in -jobname=*) name="${arg#-jobname=}";; esac
+done
+echo dumped > "$name.fmt"
+"""
+
+
+@pytest.fixture
+def tools(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for name, script in (("pandoc", FAKE_PANDOC), ("xelatex", FAKE_XELATEX)):
+        tool = bin_dir / name
+        tool.write_text(script, encoding="utf-8")
+        tool.chmod(0o755)
+    log = tmp_path / "tools.log"
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("TOOL_LOG", str(log))
+    monkeypatch.setenv("TEXMFVAR", str(tmp_path / "texmf-var"))
+    monkeypatch.delenv("TEXFORMATS", raising=False)
+    texformat.tool_versions.cache_clear()
+    return log
+
+
+def _inputs(tmp_path: Path, marker: bool = True) -> tuple[Path, Path]:
+    template = tmp_path / "template.tex"
+    dump = f"{texformat.DUMP_MARKER}\n" if marker else ""
+    template.write_text(
+        f"\\documentclass{{article}}\n\\usepackage{{calc}}\n{dump}$body$\n",
+        encoding="utf-8",
+    )
+    style = tmp_path / "style.yaml"
+    style.write_text("fonts: {}\n", encoding="utf-8")
+    return template, style
+
+
+def _ini_runs(log: Path) -> int:
+    return sum("-ini" in line for line in log.read_text(encoding="utf-8").splitlines())
+
+
+def test_ensure_format_builds_once_per_template_and_style(
+    tmp_path: Path, tools: Path
+) -> None:
+    template, style = _inputs(tmp_path)
+    format_dir = tmp_path / "formats"
+
+    first = texformat.ensure_format(template, style, format_dir)
+    second = texformat.ensure_format(template, style, format_dir)
+    style.write_text("fonts: {base_size: 14pt}\n", encoding="utf-8")
+    third = texformat.ensure_format(template, style, format_dir)
+
+    assert first is not None and first.read_text(encoding="utf-8") == "dumped\n"
+    assert second == first
+    assert third is not None and third != first
+    assert _ini_runs(tools) == 2
+    assert [path.name for path in format_dir.iterdir() if path.is_dir()] == []
+
+
+def test_ensure_format_skips_templates_without_marker(
+    tmp_path: Path, tools: Path
+) -> None:
+    template, style = _inputs(tmp_path, marker=False)
+
+    assert texformat.ensure_format(template, style, tmp_path / "formats") is None
+    assert not tools.exists()
+
+
+def test_failed_format_build_is_not_retried(
+    tmp_path: Path, tools: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    template, style = _inputs(tmp_path)
+    format_dir = tmp_path / "formats"
+    monkeypatch.setenv("FAIL_INI", "1")
+
+    assert texformat.ensure_format(template, style, format_dir) is None
+    assert texformat.ensure_format(template, style, format_dir) is None
+
+    assert _ini_runs(tools) == 1
+    (failed,) = format_dir.glob("*.failed")
+    assert "File missing" in failed.read_text(encoding="utf-8")
+
+
+def test_render_uses_precompiled_format(tmp_path: Path, tools: Path) -> None:
+    template, style = _inputs(tmp_path)
+    bundle = tmp_path / "bundle.md"
+    bundle.write_text("# Title\n", encoding="utf-8")
+    output = tmp_path / "out.pdf"
+
+    render(bundle, style, template, output)
+
+    formats = tmp_path / "texmf-var" / texformat.FORMAT_DIRNAME
+    (fmt,) = formats.glob("*.fmt")
+    assert f"fmt={fmt.stem} formats={formats}{os.pathsep}" in tools.read_text(
+        encoding="utf-8"
+    )
+    assert output.read_bytes().startswith(b"%PDF")
+
+
+def test_render_falls_back_when_format_is_rejected(
+    tmp_path: Path, tools: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    template, style = _inputs(tmp_path)
+    bundle = tmp_path / "bundle.md"
+    bundle.write_text("# Title\n", encoding="utf-8")
+    output = tmp_path / "out.pdf"
+    monkeypatch.setenv("REJECT_FORMAT", "1")
+
+    render(bundle, style, template, output)
+
+    formats = tmp_path / "texmf-var" / texformat.FORMAT_DIRNAME
+    assert output.read_bytes().startswith(b"%PDF")
+    assert list(formats.glob("*.fmt")) == []
+    (failed,) = formats.glob("*.failed")
+    assert "Fatal format file error" in failed.read_text(encoding="utf-8")
+
+
+def test_render_without_precompiled_format_skips_format_build(
+    tmp_path: Path, tools: Path
+) -> None:
+    template, style = _inputs(tmp_path)
+    bundle = tmp_path / "bundle.md"
+    bundle.write_text("# Title\n", encoding="utf-8")
+
+    render(bundle, style, template, tmp_path / "out.pdf", precompiled=False)
+
+    assert _ini_runs(tools) == 0
+    assert "fmt=" not in tools.read_text(encoding="utf-8")
+
+
+def test_gost_template_marks_end_of_static_preamble() -> None:
+    content = Path("templates/gost.tex").read_text(encoding="utf-8")
+
+    preamble, marker, rest = content.partition(texformat.DUMP_MARKER)
+
+    assert marker
+    assert "fontspec" not in preamble and "polyglossia" not in preamble
+    assert "\\usepackage{hyperref}" in rest
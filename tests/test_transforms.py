@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from md2pdf.transforms import (
+    apply_transforms,
+    dedupe_sign_captions,
+    load_transform,
+    mark_pictograms,
+    transforms_key,
+)
+
+
+def _str(text: str) -> dict[str, Any]:
+    return {"t": "Str", "c": text}
+
+
+def _image(src: str, caption: str = "", title: str = "") -> dict[str, Any]:
+    alt: list[dict[str, Any]] = []
+    for word in caption.split():
+        alt.extend([{"t": "Space"}, _str(word)] if alt else [_str(word)])
+    return {"t": "Image", "c": [["", [], []], alt, [src, title]]}
+
+
+def _document(*blocks: dict[str, Any]) -> dict[str, Any]:
+    return {"pandoc-api-version": [1, 23], "meta": {}, "blocks": list(blocks)}
+
+
+def test_mark_pictograms_moves_marker_to_image_class() -> None:
+    document = _document(
+        {
+            "t": "BulletList",
+            "c": [
+                [
+                    {
+                        "t": "Plain",
+                        "c": [_image("/a.png"), _str("{pictogram}"), {"t": "Space"}],
+                    }
+                ]
+            ],
+        }
+    )
+
+    mark_pictograms(document)
+
+    (item,) = document["blocks"][0]["c"][0]
+    image, space = item["c"]
+    assert image["c"][0][1] == ["pictogram"]
+    assert space == {"t": "Space"}
+
+
+def test_mark_pictograms_keeps_text_after_marker() -> None:
+    document = _document({"t": "Para", "c": [_image("/a.png"), _str("{pictogram}.")]})
+
+    mark_pictograms(document)
+
+    assert document["blocks"][0]["c"][1] == _str(".")
+
+
+def test_dedupe_sign_captions_drops_repeated_caption() -> None:
+    caption = {"t": "Plain", "c": [_str("Рисунок"), {"t": "Space"}, _str("1")]}
+    figure = {
+        "t": "Figure",
+        "c": [["", [], []], [None, [caption]], [{"t": "Plain", "c": [_image("/a")]}]],
+    }
+    repeated = {"t": "Para", "c": [_str("Рисунок"), {"t": "SoftBreak"}, _str("1")]}
+    other = {"t": "Para", "c": [_str("Текст")]}
+
+    document = dedupe_sign_captions(_document(figure, repeated, other, repeated))
+
+    assert document["blocks"] == [figure, other, repeated]
+
+
+def test_dedupe_sign_captions_handles_legacy_figures() -> None:
+    figure = {"t": "Para", "c": [_image("/a", "Рисунок 2", "fig:")]}
+    repeated = {"t": "Para", "c": [_str("Рисунок"), {"t": "Space"}, _str("2")]}
+
+    document = dedupe_sign_captions(_document(figure, repeated))
+
+    assert document["blocks"] == [figure]
+
+
+def test_load_transform_from_file(tmp_path: Path) -> None:
+    module = tmp_path / "local_transforms.py"
+    module.write_text(
+        "def drop_all(document):\n    document['blocks'] = []\n    return document\n",
+        encoding="utf-8",
+    )
+
+    transform = load_transform(f"{module}:drop_all")
+    document = apply_transforms(
+        _document({"t": "HorizontalRule"}), [mark_pictograms, transform]
+    )
+
+    assert document["blocks"] == []
+    assert transforms_key([transform]) != transforms_key([mark_pictograms])
+    assert transforms_key([]) == ""
+
+
+def test_load_transform_rejects_unknown_names() -> None:
+    with pytest.raises(ValueError, match="Unknown transform"):
+        load_transform("no-such-transform")
+    with pytest.raises(ValueError, match="Cannot import"):
+        load_transform("md2pdf_missing_module:transform")
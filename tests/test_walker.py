@@ -1,6 +1,8 @@
+import os
+import time
 from pathlib import Path
 
-from md2pdf.walker import walk
+from md2pdf.walker import WalkManifest, walk
 
 
 def test_order_with_index(tmp_path: Path) -> None:
@@ -89,3 +91,96 @@ def test_skips_doc_directory(tmp_path: Path) -> None:
 
     assert ordered == [md_root / "0.index.md"]
     assert any(w.path == doc_dir and w.code == "SKIPPED_NON_MD" for w in warnings)
+
+
+def test_numeric_prefixes_sort_as_integers(tmp_path: Path) -> None:
+    md_root = tmp_path / "003.cu"
+    md_root.mkdir()
+    (md_root / "0.index.md").write_text("index")
+    for name in ("10.ten.md", "9.nine.md", "zeta.md", "alpha.md", "100.hundred.md"):
+        (md_root / name).write_text(name)
+    for name in ("2.two", "10.ten", "misc"):
+        (md_root / name).mkdir()
+        (md_root / name / "0.index.md").write_text(name)
+
+    ordered, _ = walk(md_root)
+
+    assert [path.relative_to(md_root).as_posix() for path in ordered] == [
+        "0.index.md",
+        "9.nine.md",
+        "10.ten.md",
+        "100.hundred.md",
+        "alpha.md",
+        "zeta.md",
+        "2.two/0.index.md",
+        "10.ten/0.index.md",
+        "misc/0.index.md",
+    ]
+
+
+def test_iterative_walk_matches_recursive(tmp_path: Path) -> None:
+    md_root = tmp_path / "003.cu"
+    directory = md_root
+    for depth in range(40):
+        directory.mkdir()
+        (directory / "0.index.md").write_text("index")
+        (directory / f"02.second-{depth}.md").write_text("second")
+        (directory / "notes.txt").write_text("skip")
+        sibling = directory / "02.sibling"
+        sibling.mkdir()
+        (sibling / "01.leaf.md").write_text("leaf")
+        directory = directory / "01.nested"
+    directory.mkdir()
+
+    assert walk(md_root, iterative=True) == walk(md_root)
+
+
+def _age(*directories: Path) -> None:
+    past = time.time() - 60
+    for directory in directories:
+        os.utime(directory, (past, past))
+
+
+def test_manifest_relists_only_changed_directories(tmp_path: Path) -> None:
+    md_root = tmp_path / "003.cu"
+    first = md_root / "01.first"
+    second = md_root / "02.second"
+    for directory in (first, second):
+        directory.mkdir(parents=True)
+        (directory / "0.index.md").write_text("index")
+    (md_root / "notes.txt").write_text("skip")
+    _age(md_root, first, second)
+    manifest_file = tmp_path / "cache" / "cu.walk.json"
+
+    expected = walk(md_root)
+
+    initial = WalkManifest(manifest_file)
+    assert walk(md_root, manifest=initial) == expected
+    initial.save()
+    unchanged = WalkManifest(manifest_file)
+    assert walk(md_root, manifest=unchanged) == expected
+    (second / "010000.added.md").write_text("added")
+    changed = WalkManifest(manifest_file)
+    updated = walk(md_root, manifest=changed)
+
+    assert (initial.relisted, unchanged.reused, unchanged.relisted) == (3, 3, 0)
+    assert (changed.reused, changed.relisted) == (2, 1)
+    assert updated == walk(md_root)
+    assert second / "010000.added.md" in updated[0]
+
+
+def test_manifest_does_not_trust_recently_modified_directories(
+    tmp_path: Path,
+) -> None:
+    md_root = tmp_path / "003.cu"
+    md_root.mkdir()
+    (md_root / "0.index.md").write_text("index")
+    manifest_file = tmp_path / "cu.walk.json"
+
+    manifest = WalkManifest(manifest_file)
+    walk(md_root, manifest=manifest)
+    manifest.save()
+    again = WalkManifest(manifest_file)
+    walk(md_root, manifest=again)
+
+    assert again.relisted == 1
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from md2pdf import pipeline, walker
+from md2pdf.artifacts import DirectoryStore
+from md2pdf.pipeline import PipelineParams
+from md2pdf.watch import ChangeSet, DocumentWatcher, diff_snapshots, take_snapshot
+
+
+def _make_project(tmp_path: Path) -> PipelineParams:
+    md_root = tmp_path / "content" / "001.guide"
+    chapter = md_root / "01.chapter"
+    chapter.mkdir(parents=True)
+    (md_root / "0.index.md").write_text("# Guide\n\nIntro\n", encoding="utf-8")
+    (md_root / "010000.first.md").write_text("# First\n\nOne\n", encoding="utf-8")
+    (chapter / "0.index.md").write_text("# Chapter\n\nText\n", encoding="utf-8")
+
+    images_root = tmp_path / "public" / "images"
+    images_root.mkdir(parents=True)
+    style = tmp_path / "style.yaml"
+    style.write_text("fonts: {}\n", encoding="utf-8")
+    template = tmp_path / "template.tex"
+    template.write_text("$body$\n", encoding="utf-8")
+
+    build_dir = tmp_path / "build"
+    return PipelineParams(
+        md_root=md_root,
+        images_root=images_root,
+        style=style,
+        template=template,
+        filters=(),
+        metadata={"title": "Guide"},
+        bundle_path=build_dir / "guide.bundle.md",
+        output_pdf=build_dir / "guide.pdf",
+        cache_dir=build_dir / pipeline.CACHE_DIRNAME,
+    )
+
+
+@pytest.fixture
+def renders(monkeypatch: pytest.MonkeyPatch) -> list[Path]:
+    rendered: list[Path] = []
+
+    def fake_render(bundle: Path, **kwargs: Any) -> tuple[Path, bool]:
+        rendered.append(bundle)
+        return kwargs["output"], True
+
+    monkeypatch.setattr(pipeline, "render_pdf_incremental", fake_render)
+    return rendered
+
+
+def test_diff_snapshots_reports_modified_added_and_removed(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "kept.md").write_text("a", encoding="utf-8")
+    (root / "gone.md").write_text("b", encoding="utf-8")
+    style = tmp_path / "style.yaml"
+    style.write_text("x", encoding="utf-8")
+    before = take_snapshot([root], [style])
+
+    (root / "kept.md").write_text("changed", encoding="utf-8")
+    (root / "gone.md").unlink()
+    (root / "sub").mkdir()
+    (root / "sub" / "new.md").write_text("c", encoding="utf-8")
+
+    changes = diff_snapshots(before, take_snapshot([root], [style]))
+
+    assert changes.modified == {root / "kept.md"}
+    assert changes.added == {root / "sub", root / "sub" / "new.md"}
+    assert changes.removed == {root / "gone.md"}
+
+
+def test_build_rerenders_only_changed_sections(
+    tmp_path: Path, renders: list[Path]
+) -> None:
+    params = _make_project(tmp_path)
+    metrics_file = tmp_path / "metrics.jsonl"
+    watcher = DocumentWatcher(params, metrics_file=metrics_file)
+
+    watcher.build()
+    (params.md_root / "010000.first.md").write_text(
+        "# First\n\nUpdated text\n", encoding="utf-8"
+    )
+    changes = watcher.poll()
+    watcher.build(changes)
+
+    assert changes.modified == {params.md_root / "010000.first.md"}
+    assert "Updated text" in params.bundle_path.read_text(encoding="utf-8")
+    assert renders == [params.bundle_path, params.bundle_path]
+    counters = [
+        json.loads(line)["counters"]
+        for line in metrics_file.read_text(encoding="utf-8").splitlines()
+        if json.loads(line)["type"] == "counters"
+    ]
+    assert counters[-1]["section_cache_misses"] == 1
+    assert counters[-1]["section_cache_hits"] == 2
+
+
+def test_build_passes_artifact_store_to_render(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    params = _make_project(tmp_path)
+    store = DirectoryStore(tmp_path / "artifacts")
+    calls: list[dict[str, Any]] = []
+
+    def fake_render(bundle: Path, **kwargs: Any) -> tuple[Path, bool]:
+        calls.append(kwargs)
+        return kwargs["output"], True
+
+    monkeypatch.setattr(pipeline, "render_pdf_incremental", fake_render)
+
+    DocumentWatcher(params, artifacts=store).build()
+
+    assert calls[0]["artifacts"] is store
+
+
+def test_build_relists_only_changed_directories(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, renders: list[Path]
+) -> None:
+    params = _make_project(tmp_path)
+    watcher = DocumentWatcher(params)
+    watcher.build()
+
+    listed: list[Path] = []
+    list_directory = walker._list_directory
+
+    def counting_list_directory(directory: Path) -> walker.DirectoryListing:
+        listed.append(directory)
+        return list_directory(directory)
+
+    monkeypatch.setattr(walker, "_list_directory", counting_list_directory)
+    chapter = params.md_root / "01.chapter"
+    (chapter / "010100.new.md").write_text("# New\n\nFresh\n", encoding="utf-8")
+
+    result, _ = watcher.build(watcher.poll())
+
+    assert listed == [chapter]
+    assert "Fresh" in params.bundle_path.read_text(encoding="utf-8")
+    assert result.output_pdf == params.output_pdf
+
+
+def test_wait_for_changes_coalesces_bursts(tmp_path: Path) -> None:
+    now = [0.0]
+
+    def fake_sleep(seconds: float) -> None:
+        now[0] += seconds
+
+    watcher = DocumentWatcher(
+        _make_project(tmp_path),
+        interval=0.1,
+        debounce=0.25,
+        sleep=fake_sleep,
+        clock=lambda: now[0],
+    )
+    first = tmp_path / "a.md"
+    second = tmp_path / "b.md"
+    polls = iter(
+        [ChangeSet(), ChangeSet(modified=frozenset({first})), ChangeSet()]
+        + [ChangeSet(added=frozenset({second}))]
+        + [ChangeSet()] * 10
+    )
+    watcher.poll = lambda: next(polls)  # type: ignore[method-assign]
+
+    changes = watcher.wait_for_changes()
+
+    assert changes == ChangeSet(modified=frozenset({first}), added=frozenset({second}))
+    assert now[0] == pytest.approx(0.7)
+
+
+def test_run_keeps_watching_after_failed_build(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    watcher = DocumentWatcher(_make_project(tmp_path))
+    outcomes: list[Any] = [RuntimeError("Pandoc failed with code 43"), None]
+    seen_changes: list[ChangeSet | None] = []
+
+    def fake_build(
+        changes: ChangeSet | None = None, *, force: bool = False
+    ) -> tuple[Any, bool]:
+        seen_changes.append(changes)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return pipeline.aggregate_result(Path("b.md"), Path("o.pdf")), True
+
+    changed = ChangeSet(modified=frozenset({Path("x.md")}))
+    monkeypatch.setattr(watcher, "build", fake_build)
+    monkeypatch.setattr(watcher, "wait_for_changes", lambda: changed)
+    errors: list[Exception] = []
+    results: list[Any] = []
+
+    watcher.run(max_builds=2, on_result=results.append, on_error=errors.append)
+
+    assert [str(error) for error in errors] == ["Pandoc failed with code 43"]
+    assert seen_changes == [None, changed]
+    assert len(results) == 1